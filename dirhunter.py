@@ -17,16 +17,78 @@ import math
 import sys
 import time
 import multiprocessing
+import threading
+import itertools
 import datetime
+import argparse
+import errno
+import platform
+import tempfile
+import shutil
+import pickle
+import collections
+import queue
+import socket
+import multiprocessing.connection
+import fnmatch
+import re
+import bisect
+import heapq
+import shlex
+import json
+import socketserver
+import http.server
+import http.client
+import urllib.parse
+import html
+import concurrent.futures
+import contextlib
+import random
+import asyncio
 
 try:
     import readline
 except ImportError:
     logging.warning('Proceeding without readline functionality. Error during import of this module:\n{}'.format(traceback.format_exc()))
 
+try:
+    import ctypes   # used for setting the I/O priority (optional)
+except ImportError:
+    ctypes = None
+
+try:
+    import numpy    # used for aggregating big info trees (optional)
+except ImportError:
+    numpy = None
+
+try:
+    import sqlite3  # used for the scan history (optional)
+except ImportError:
+    sqlite3 = None
+
 import cmd
 
 
+# dir-fd mode: dirs are opened relative to the file descriptor of their parent dir (like os.fwalk)
+# instead of by their full path, if the platform supports it
+_DIR_FD_SUPPORTED = (os.scandir in os.supports_fd) and (os.open in os.supports_dir_fd) and hasattr(os, 'O_DIRECTORY')
+_DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)     # flags for opening a dir
+_SUBDIR_OPEN_FLAGS = _DIR_OPEN_FLAGS | getattr(os, 'O_NOFOLLOW', 0)     # flags for opening a subdir (don't follow symlinks)
+
+# multi-root analysis: several dirs are analysed together below a virtual root dir, whose subdirs
+# are the root dirs (named by their full paths)
+_VIRTUAL_ROOT = '<roots>'
+
+# aggregation of info trees: min. average number of dirs per level for using NumPy (for narrow levels,
+# the per-level overhead costs more than the vectorisation saves)
+_NUMPY_MIN_LEVEL_WIDTH = 1000
+
+# I/O priority of worker processes (see "_set_process_priority"): ioprio_set system-call numbers and scheduling classes
+_IOPRIO_SYSCALL_NUMBERS = {'x86_64': 251, 'i386': 289, 'i686': 289, 'aarch64': 30, 'riscv64': 30,
+                           'armv7l': 314, 'ppc64': 273, 'ppc64le': 273, 's390x': 282}
+_IOPRIO_CLASSES = {'best-effort': 2, 'idle': 3}
+
+
 
 #===========================================================================
 
@@ -60,43 +122,382 @@ class WorkerError(DirHunterError):
 #===========================================================================
 
 
+def _split_path(base_dir, roots, dir_path):
+    """
+    Splits the path of a dir within a base dir into the names of the dirs on the way
+    from the base dir to it. In a multi-root analysis, the first name is the path of the
+    root dir.
+
+    @param base_dir - string, path of the base dir (or _VIRTUAL_ROOT)
+    @param roots - list of strings, paths of the root dirs of a multi-root analysis (or None)
+    @param dir_path - string, full path of the dir
+    @retval dir_names - list of strings, dir names (empty for the base dir itself);
+        None if the dir is not within the base dir
+    """
+    if base_dir == _VIRTUAL_ROOT:
+        if dir_path == _VIRTUAL_ROOT:
+            return []
+        for root in roots:
+            if (dir_path == root) or dir_path.startswith(os.path.join(root, '')):
+                return [root] + [dir_name for dir_name in dir_path[len(root):].split(os.sep) if dir_name]
+        return None
+
+    if dir_path == base_dir:
+        return []
+
+    prefix = os.path.join(base_dir, '')     # base-dir path with trailing slash
+    if not dir_path.startswith(prefix):
+        return None
+
+    return [dir_name for dir_name in dir_path[len(prefix):].split(os.sep) if dir_name]
+
+
+def _flatten_tree(dir_info):
+    """
+    Numbers the dirs of an info tree in breadth-first order, i.e. level by level (the subdirs
+    of a dir are consecutive and come after it). Iterative, thus no limit for the tree depth.
+
+    @param dir_info - dir-info object (dict), root of the tree
+    @retval infos, names, parents, level_starts - tuple of lists: dir-info objects; dir names (None for the root);
+        numbers of the parent dirs (-1 for the root); numbers of the first dirs of the levels (plus the number of dirs)
+    """
+    infos = [dir_info]
+    names = [None]
+    parents = [-1]
+    level_starts = [0]
+    level_end = 1   # end of the current level
+    node_id = 0
+    while node_id < len(infos):
+        if node_id == level_end:
+            # next level reached  ->  it ends with the subdirs found so far
+            level_starts.append(node_id)
+            level_end = len(infos)
+        for dir_name, subdir_info in infos[node_id]['dirs'].items():
+            infos.append(subdir_info)
+            names.append(dir_name)
+            parents.append(node_id)
+        node_id += 1
+    level_starts.append(len(infos))
+
+    return infos, names, parents, level_starts
+
+
+def _sum_bottom_up(values, parents, level_starts, use_numpy=None):
+    """
+    Sums the values of the dirs of a flattened info tree (see "_flatten_tree") over their subtrees,
+    level by level from the deepest level up.
+    With NumPy, each level is reduced at once: the dirs of a level are grouped by parent (the groups
+    are consecutive), the group sums are added to the parents.
+
+    @param values - list of numbers, values of the dirs (in breadth-first order)
+    @param parents - list (or NumPy array) of ints, numbers of the parent dirs (-1 for the root)
+    @param level_starts - list of ints, numbers of the first dirs of the levels (plus the number of dirs)
+    @param use_numpy - [optional] bool, flag to use NumPy; default: if available and the levels are wide enough
+    @retval sums - list of numbers, values summed over the subtrees
+    """
+    if use_numpy is None:
+        use_numpy = (numpy is not None) and (len(values) >= _NUMPY_MIN_LEVEL_WIDTH * (len(level_starts) - 1))
+
+    if not use_numpy:
+        sums = list(values)
+        for node_id in range(len(sums) - 1, 0, -1):     # reverse breadth-first order: subdirs before their parents
+            sums[parents[node_id]] += sums[node_id]
+        return sums
+
+    sums = numpy.array(values)
+    parents = numpy.asarray(parents)
+    for level in range(len(level_starts) - 2, 0, -1):
+        start, end = level_starts[level], level_starts[level + 1]
+        level_parents = parents[start:end]
+        group_starts = numpy.flatnonzero(numpy.concatenate(([True], level_parents[1:] != level_parents[:-1])))
+        sums[level_parents[group_starts]] += numpy.add.reduceat(sums[start:end], group_starts)
+
+    return sums.tolist()
+
+
+def _squarify(values, x, y, width, height):
+    """
+    Lays out rectangles with areas proportional to the specified values in the specified
+    rectangle, as square as possible (squarified treemap, Bruls et al.): the values are put in
+    rows along the shorter side as long as this improves the worst aspect ratio of the row.
+
+    @param values - list of numbers, positive values, sorted (descending)
+    @param x, y, width, height - numbers, rectangle to fill
+    @retval rects - list of (x, y, width, height) tuples, one per value
+    """
+    rects = []
+    total = sum(values)
+    if (total <= 0) or (width <= 0) or (height <= 0):
+        return [(x, y, 0.0, 0.0) for value in values]
+
+    areas = [value * width * height / total for value in values]
+    i = 0
+    while i < len(areas):
+        # collect a row: add areas as long as the worst aspect ratio does not get worse
+        side = min(width, height)
+        row_sum = areas[i]
+        row_min = row_max = areas[i]
+        worst = max(row_max * side * side / (row_sum * row_sum), row_sum * row_sum / (side * side * row_min))
+        j = i + 1
+        while j < len(areas):
+            new_sum = row_sum + areas[j]
+            new_min = min(row_min, areas[j])
+            new_worst = max(max(row_max, areas[j]) * side * side / (new_sum * new_sum), new_sum * new_sum / (side * side * new_min))
+            if new_worst > worst:
+                break
+            row_sum, row_min, row_max, worst = new_sum, new_min, max(row_max, areas[j]), new_worst
+            j += 1
+
+        # lay out the row along the shorter side, continue in the remaining rectangle
+        thickness = row_sum / side
+        offset = 0.0
+        for area in areas[i:j]:
+            length = area / thickness
+            if width >= height:
+                rects.append((x, y + offset, thickness, length))
+            else:
+                rects.append((x + offset, y, length, thickness))
+            offset += length
+        if width >= height:
+            x += thickness
+            width -= thickness
+        else:
+            y += thickness
+            height -= thickness
+        i = j
+
+    return rects
+
+
+
+def _set_process_priority(niceness=None, io_class=None):
+    """
+    Lowers the CPU and/or I/O scheduling priority of the current process (like "nice" & "ionice";
+    threads started afterwards inherit it). The I/O priority is only supported on Linux, elsewhere
+    a warning is logged.
+
+    @param niceness - [optional] int, increment of the niceness (CPU priority)
+    @param io_class - [optional] string, I/O scheduling class: "idle" (I/O only when no other process
+        needs the disk) or "best-effort" (at the lowest priority level)
+    """
+    if niceness:
+        os.nice(niceness)
+
+    if io_class is not None:
+        try:
+            if (ctypes is None) or (not sys.platform.startswith('linux')):
+                raise OSError('I/O priorities are only supported on Linux (with ctypes).')
+            try:
+                syscall_number = _IOPRIO_SYSCALL_NUMBERS[platform.machine()]
+            except KeyError:
+                raise OSError('ioprio_set system-call number unknown for architecture "{}".'.format(platform.machine()))
+
+            io_priority = (_IOPRIO_CLASSES[io_class] << 13) | (7 if io_class == 'best-effort' else 0)   # class & level
+            libc = ctypes.CDLL(None, use_errno=True)
+            if libc.syscall(syscall_number, 1, 0, io_priority) != 0:    # IOPRIO_WHO_PROCESS, current process
+                error_number = ctypes.get_errno()
+                raise OSError(error_number, os.strerror(error_number))
+
+        except OSError as error:
+            logging.warning('Could not set I/O priority "{}": {}'.format(io_class, error))
+
+
+def _get_filesystem_id(path):
+    """
+    Identifies the file system of the specified path by its mount point and (on Linux) its source
+    and type, which in contrast to the device number are stable across reboots and remounts.
+
+    @param path - string, path of a file or dir
+    @retval file_system_id - string, e.g. "filer:/export/home on /home (nfs4)"
+    """
+    mount_point = os.path.realpath(path)
+    while not os.path.ismount(mount_point):
+        parent_dir = os.path.dirname(mount_point)
+        if parent_dir == mount_point:
+            break
+        mount_point = parent_dir
+
+    source, file_system_type = '?', '?'
+    try:
+        with open('/proc/self/mounts') as mounts_file:
+            for line in mounts_file:
+                fields = line.split()
+                if (len(fields) >= 3) and (fields[1].replace('\\040', ' ') == mount_point):
+                    source, file_system_type = fields[0], fields[2]     # (the last entry is the visible mount)
+    except OSError:
+        pass    # not Linux
+
+    return '{} on {} ({})'.format(source, mount_point, file_system_type)
+
+
+class _TokenBucket:
+    """
+    Rate limiter for file-system operations (opening dirs, stat calls), which can be shared by
+    several processes: the bucket state lives in shared memory, protected by a lock (both must be
+    passed to the processes on their creation, e.g. as arguments of multiprocessing.Process).
+    The bucket fills with "rate" tokens per second up to a small burst. Acquiring tokens takes
+    them at once, possibly running into debt; the caller then sleeps until the debt is paid off,
+    so all callers together stay within the rate.
+    """
+    def __init__(self, rate, burst=None):
+        """
+        Initialisation.
+
+        @param rate - float, max. number of operations per second
+        @param burst - [optional] float, max. number of tokens to accumulate; default: tokens of 0.1 s (at least 1)
+        """
+        self.rate = float(rate)
+        self._burst = float(burst) if burst is not None else max(1.0, self.rate / 10)
+        self._state = multiprocessing.RawArray('d', [self._burst, time.monotonic()])    # tokens, time of last update
+        self._lock = multiprocessing.Lock()
+
+    def acquire(self, n=1):
+        """
+        Takes tokens for the specified number of operations, waits if there are not enough.
+
+        @param n - [optional] int, number of operations
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self._burst, self._state[0] + (now - self._state[1]) * self.rate) - n
+            self._state[0] = tokens
+            self._state[1] = now
+
+        if tokens < 0:
+            time.sleep(-tokens / self.rate)
+
+
+
+#===========================================================================
+
+
+class _DirRef:
+    """
+    Reference to a dir whose subdirs (or file chunks) are queued for analysis.
+    Holds the dir path (once for all its subdirs) and, in dir-fd mode, an open file
+    descriptor of the dir, which allows to open the subdirs relative to it.
+    """
+    __slots__ = ('path', 'fd', 'n_pending', 'dirs')
+
+    def __init__(self, path, fd=None):
+        """
+        Initialisation.
+
+        @param path - string, path of the dir
+        @param fd - [optional] int, open file descriptor of the dir
+        """
+        self.path = path    # store dir path
+        self.fd = fd        # store file descriptor
+        self.n_pending = 0  # init number of queued subdirs & file chunks referring to this dir
+        self.dirs = None    # init attribute for the dir info's container of subdir infos
+
+
+#===========================================================================
+
+
 class Sizer:
     """
     Performs the size analysis for a specified directory and displays the results.
     """
-    def __init__(self, directory=None):
+    def __init__(self, directory=None, progressive=False, max_ops=None, history_db=None, history_depth=3,
+                 sample_fraction=None, cache_nodes=1000000, validate_cache=True, count_only=False):
         """
         Initialisation. If a directory is specified, its analysis is triggered.
 
         @param directory - [optional] string, path of directory to analyse
+        @param progressive - [optional] bool, flag to enable the progressive mode: only the top
+            levels are analysed before returning, the rest of the analysis continues in a
+            background thread (results can be browsed meanwhile, sizes are lower bounds)
+        @param max_ops - [optional] float, max. number of file-system operations (dir openings & stat
+            calls) per second; default: unlimited
+        @param history_db - [optional] string, path of a SQLite database in which the totals of the dirs
+            are recorded after each complete analysis (see ScanHistory)
+        @param history_depth - [optional] int, max. depth of the dirs recorded in the history database
+        @param sample_fraction - [optional] float, fraction of dirs to sample for the estimation mode: only the
+            top levels are analysed completely, the sizes of the dirs below are extrapolated from a random sample
+            of them (sizes with confidence intervals, see "refine"; not in progressive mode); default: complete analysis
+        @param cache_nodes - [optional] int, max. total number of dirs of the previous analysis results kept in memory
+            (least recently used ones are dropped first, the most recent one is always kept); changing to a dir of a
+            cached result needs no new analysis, cached results below a newly analysed dir are re-used
+        @param validate_cache - [optional] bool, flag to re-use a cached result only if the modification times of
+            its top-level dirs are unchanged
+        @param count_only - [optional] bool, flag for the count-only mode: files are only counted (by the entry types
+            reported when reading the dirs), not stat'ed; the "size" of a dir is its number of entries (files,
+            subdirs & other entries, i.e. inodes) including all entries below it
         """
         self._unit_scale = 1000.0   # scaling between unit prefixes
         self._units = 'kMGT'     # list of unit prefixes
+        self._count_only = count_only   # flag for count-only mode (sizes are numbers of entries)
+        self._size_unit = '' if count_only else 'B'     # unit of the displayed sizes
 
-        self.base_dir = None    # init attribute for base-dir path
+        self.base_dir = None    # init attribute for base-dir path (or _VIRTUAL_ROOT for a multi-root analysis)
+        self._roots = None      # init attribute for list of root-dir paths of a multi-root analysis
         self.base_dir_info = None   # init attribute for base-dir-info object
-        self._dir_list = []
+        self._dir_list = collections.deque()    # init queue of dirs to analyse, entries are (parent _DirRef, dir name, dir-info object) triples
+        self._chunk_list = []   # init list of file chunks (of huge dirs) to analyse, entries are (dir _DirRef, file names, dir-info object) triples
+        self._chunk_size = 10000    # number of files per chunk (files of a dir beyond the first chunk are analysed in chunks)
+        self._chunk_threads = 4     # number of threads for analysing file chunks in parallel
         self._info_chain = []    # init attribute for list of current info object and its parent info objects
         self._dir_chain = []    # init attribute for list of current dir name and its parent dir names
-        self._last_info = None     # init internal cache for insertion of dir infos into info tree
-        self._last_path = ''       # init internal cache for insertion of dir infos into info tree
-        self._last_counter = [0, 0]    # just for debugging/info: init counters for insertion cache misses & hits
-
-        self._info_stock = None     # init attribute for dir-info object to integrate/re-use in analysis
-        self._dir_stock = ''        # init attribute for path of dir info to integrate/re-use
+        self._ranking = None    # init attribute for cached size ranking of a dir's subdirs: (dir-info object, list of subdir names sorted by size)
+        self._ls_rows = 100     # default max. number of subdirs listed by "ls" (the largest ones)
+
+        self._dir_stock = {}        # init dict of dir infos to integrate/re-use in analysis, keys are dir paths (values are dir-info
+                                    # objects; in the MultiSizer and its workers handles of the dir infos, which the coordinator holds)
+
+        self._history = {}      # init dict of previous (complete) analysis results, keys are base-dir paths, values are dir-info objects (least recently used first)
+        self._history_nodes = {}    # init dict of numbers of dirs of the previous analysis results, keys are base-dir paths
+        self._history_mtimes = {}   # init dict of modification times of the top-level dirs of the previous analysis results, keys are
+                                    # base-dir paths, values are dicts (keys are dir paths) or None if the result is not re-usable
+        self._cache_nodes = cache_nodes     # max. total number of dirs of the previous analysis results
+        self._validate_cache = validate_cache   # flag to validate cached results by the modification times of their top-level dirs
+        self._cache_levels = 2      # number of dir levels whose modification times are validated
+        self._min_weight = 1000     # min. number of entries (files & dirs) of a subtree to note it in a weight tree
+        self._weight_tree = None    # init attribute for weight tree of the base dir (see "_build_weight_tree")
+        self._tree_index = None     # init attribute for the index of the info tree (TreeIndex object, see "find")
+        self._scan_history = ScanHistory(history_db) if history_db else None     # database of dir totals of previous analyses
+        self._history_depth = history_depth     # max. depth of the dirs recorded in the database
+
+        self._progressive = progressive     # flag for progressive mode (analysis continues in background)
+        self._progressive_levels = 2        # number of dir levels to analyse before returning in progressive mode
+        self._lock = threading.RLock()      # lock protecting the info tree & dir list against the background analysis
+        self._scan_thread = None            # init attribute for thread of a background analysis
+        self._scan_stop = threading.Event()     # event to signalise the background analysis to stop
+        self._active_entry = None           # init attribute for dir-list entry of the dir which is currently being analysed
+        self._n_analysed = 0    # number of analysed entries (dirs & files), for progress reports
+
+        self._sample_fraction = sample_fraction     # fraction of dirs to sample in estimation mode (None -> complete analysis)
+        self._exact_levels = 2      # number of dir levels to analyse completely in estimation mode
+        self._min_samples = 5       # min. number of sampled subdirs per stratum
+        self._confidence_z = 1.96   # z-value of the confidence intervals (95%)
+        self._random = random.Random()  # random generator for sampling the dirs
+        self._strata = None     # init attribute for list of strata of an estimation (see "_init_strata"), None if the analysis is exact
+        self._top_infos = []    # init list of dir-info objects of the completely analysed top levels (parents before children)
+        self._estimates = {}    # init dict of confidence-interval half-widths of the estimated sizes, keys are ids of dir-info objects
+
+        self._streaming = False     # flag for streaming mode (dir records are emitted, dir infos dropped, see "iter_scan")
+        self._records = collections.deque()     # init queue of dir records to emit in streaming mode
+        self._held_records = {}     # init dict of records of dirs with pending file chunks, keys are ids of dir-info objects,
+                                    # values are [record, number of pending chunks] lists
+
+        self._use_dir_fd = _DIR_FD_SUPPORTED    # flag for dir-fd mode (open dirs relative to their parent's file descriptor)
+        self._max_dir_fds = 128     # max. number of dir file descriptors to keep open (for opening subdirs relative to them)
+        self._dir_fd_refs = set()   # init set of dir references which hold an open file descriptor
+        self._throttle = _TokenBucket(max_ops) if max_ops else None     # rate limiter for file-system operations (_TokenBucket object)
 
         if directory is not None:
             # dir specified  ->  change to it
             self.cd(directory)
 
-    def cd(self, directory=None):
+    def cd(self, directory=None, _quiet=False):
         """
         Changes to the specified directory and analyses it.
         If the specified dir is a subdir of the current dir, no file-system access
         is necessary and things will be fast(er).
 
-        @param directory - [optional] string, path of the dir to analyse;
-            if not specified, changes to current base directory
+        @param directory - [optional] string, path of the dir to analyse, or list of paths of several
+            dirs to analyse together (below a virtual root dir); if not specified, changes to
+            current base directory
         """
         if directory is None:
             # no dir specified...
@@ -107,6 +508,38 @@ class Sizer:
                 # base dir set  ->  change to base dir
                 self.cdi()
 
+        if isinstance(directory, (list, tuple)):
+            if len(directory) == 1:
+                directory = directory[0]    # single dir  ->  as usual
+            else:
+                # several dirs  ->  new multi-root analysis
+                self._change_base_dir(directory, _quiet)    # set virtual root dir as new base dir, run analysis
+                self.cdi(_quiet=_quiet)     # init internal dir-change system, poss. display results
+                return
+
+        if self.base_dir == _VIRTUAL_ROOT:
+            # multi-root analysis  ->  the specified dir can only be reached if it's within one of the roots
+            if directory[0] != os.sep:
+                # relative path: relative to the current dir (or to the working dir in the virtual root dir)
+                directory = os.path.abspath(directory if not self._dir_chain else os.path.join(self._get_current_dir(), directory))
+
+            dir_names = self._split_path(directory)
+            if dir_names is None:
+                # not within the roots  ->  new analysis (or cached result)
+                self._change_base_dir(directory, _quiet)    # set specified dir as new base dir, run analysis
+                self.cdi(_quiet=True)   # init internal dir-change system
+            else:
+                # within the roots  ->  use current analysis results, change into the dir starting from the virtual root dir
+                self._info_chain = []
+                self._dir_chain = []
+                for dir_name in dir_names:
+                    self._enter_subdir(dir_name)
+                self._update_current_dir()
+
+            if not _quiet:
+                self.ls()
+            return
+
         # check if the specified dir is a subdir of the base dir or vice versa
         if self.base_dir is None:
             # no base dir set  ->  no common path part possible
@@ -124,11 +557,10 @@ class Sizer:
         # change to the specified dir, depending on the relation between the specified dir and
         # the current dir or base dir, respectively
         if not ((common_prefix == self._get_current_dir()) or (common_prefix == directory)):
-            # no common path part  ->  new dir, complete analysis required
+            # no common path part  ->  new dir, complete analysis required (unless cached)
             logging.debug('no common prefix')
 
-            self._set_base_dir(directory)   # set specified dir as new base dir
-            self._analyse_base_dir()    # run analysis
+            self._change_base_dir(directory, _quiet)    # set specified dir as new base dir, run analysis
             self.cdi(_quiet=True)   # init internal dir-change system
 
         else:
@@ -148,24 +580,23 @@ class Sizer:
                     common_prefix = os.path.commonprefix((self.base_dir, directory))     # update common path part
 
                 # split the incommon part of the specified dir into single dir names
-                # and use index-based change-dir method ("cdi") to reach the target dir
+                # and enter them one after the other to reach the target dir
                 for subdir in directory[len(common_prefix):].split(os.sep):
                     if subdir:  # ignore empty parts (leading & trailing slash)
-                        self.cdi(self._current_subdirs.index(subdir), _quiet=True)
+                        self._enter_subdir(subdir)
+                self._update_current_dir()
 
             else:
                 # base dir is subdir of specified dir
-                # -> trigger new analysis, but re-use analysis of current base dir
-                self._dir_stock = self.base_dir     # store current base-dir path for info re-usage
-                self._info_stock = self.base_dir_info   # store current base-dir info for re-usage
-
-                self._set_base_dir(directory)   # set specified dir as new base dir
-                self._analyse_base_dir()    # run analysis
+                # -> trigger new analysis (unless cached), but re-use analysis of current base dir (it is the most
+                #    recent cached result, unless it's incomplete or estimated)
+                self._change_base_dir(directory, _quiet)    # set specified dir as new base dir, run analysis
                 self.cdi(_quiet=True)   # init internal dir-change system
 
 
         # finally display analysis results of new dir
-        self.ls()
+        if not _quiet:
+            self.ls()
 
     def cdi(self, index=None, _quiet=False):
         """
@@ -197,92 +628,397 @@ class Sizer:
             except IndexError:
                 dir_info = self.base_dir_info
 
-            dir_name = self._current_subdirs[index]
-            self._info_chain.append(dir_info['dirs'][dir_name])
-            self._dir_chain.append(dir_name)
-
-        # epilogue: update list of current subdir names
-        try:
-            dir_info = self._info_chain[-1]
-        except IndexError:
-            dir_info = self.base_dir_info
+            with self._lock:
+                dir_name = self._rank_subdirs(dir_info, index + 1)[index]   # only the ranks up to the index are needed
+            self._enter_subdir(dir_name)
 
-        subdirs = sorted(dir_info['dirs'].items(), key=lambda info : info[1]['size'], reverse=True)
-        self._current_subdirs = [d[0] for d in subdirs]
+        # epilogue: let a background analysis know about the new current dir
+        self._update_current_dir()
 
         # epilogue: call list method
         if not _quiet:
             self.ls()
 
-    def ls(self):
+    def ls(self, n=None, page=1, min_size=None):
         """
         Displays information about the current directory:
-        Lists the subdirectories and their sizes.
+        Lists the subdirectories and their sizes, the largest ones first.
+        Only the (largest) subdirs which are displayed are ranked and formatted, so listing
+        a dir with a huge number of subdirs costs little more than listing a small one.
+        During a progressive analysis, the displayed sizes are lower bounds and subdirs
+        which are still being analysed are flagged with "~". After an estimation (see "sample_fraction"),
+        estimated sizes are followed by the half-width of their 95% confidence interval ("±").
+
+        @param n - [optional] int, max. number of subdirs to list (per page), 0 lists all of them;
+            default: self._ls_rows
+        @param page - [optional] int, page of subdirs to list (1 -> the n largest ones, 2 -> the next n ones, ...)
+        @param min_size - [optional] number, min. size (in bytes) of the subdirs to list
         """
-        # determine current dir-info object
-        try:
-            # try to use the last info object from the path stack
-            dir_info = self._info_chain[-1]
-        except IndexError:
-            # path stack is empty  ->  use base info object
-            dir_info = self.base_dir_info
+        if n is None:
+            n = self._ls_rows
 
-        # assemble the path string for the current directory
-        dir_path = self.base_dir
-        last_info = self.base_dir_info
-        for info in self._info_chain:
-            dir_name = None
-            for lobster, fish in last_info['dirs'].items():
-                if fish is info:
-                    dir_name = lobster
-                    break
-            dir_path = os.path.join(dir_path, dir_name)
-            last_info = info
+        with self._lock:
+            # determine current dir-info object
+            try:
+                # try to use the last info object from the path stack
+                dir_info = self._info_chain[-1]
+            except IndexError:
+                # path stack is empty  ->  use base info object
+                dir_info = self.base_dir_info
 
-        # print the path string and the current directory's size
-        print('{}: {}'.format(dir_path, self._format_size(dir_info['size'], unit_indent=False)))
-        print('[total counts: {} files, {} dirs]\n'.format(*self._get_counts(dir_info)))
+            # path string for the current directory
+            dir_path = self._get_current_dir()
+
+            # check for a running background analysis, update the (preliminary) sizes if so
+            scanning = self._is_scanning()
+            if scanning:
+                self._sum_sizes(dir_info)
+                pending_subdirs = self._get_pending_subdirs(dir_path)
+
+            # print the path string and the current directory's size
+            print('{}: {}{}'.format(dir_path, self._format_size(dir_info['size'], unit_indent=False), self._format_estimate(dir_info)))
+            print('[total counts: {} files, {} dirs]\n'.format(*self._get_counts(dir_info)))
+            if scanning:
+                print('[analysis in progress: sizes & counts are lower bounds, "~" marks dirs still being analysed]\n')
+            if self._count_only:
+                print('[count-only mode: sizes are numbers of entries (files, dirs & other entries)]\n')
+            if self._strata is not None:
+                n_sampled = sum(len(stratum['sampled']) for stratum in self._strata)
+                n_subdirs = n_sampled + sum(len(stratum['unsampled']) for stratum in self._strata)
+                print('[estimation: sizes below level {} extrapolated from {} of {} dirs, "±" marks 95% confidence intervals, '
+                      'counts cover the analysed dirs only; "refine" to sample more]\n'.format(self._exact_levels, n_sampled, n_subdirs))
+
+            # determine the number of listable subdirs (the ones big enough) and the rank range of the requested page
+            if min_size is None:
+                n_listable = len(dir_info['dirs'])
+            else:
+                n_listable = sum(1 for info in dir_info['dirs'].values() if info['size'] >= min_size)
+            first_rank = (page - 1) * n if n > 0 else 0
+            last_rank = min(first_rank + n, n_listable) if n > 0 else n_listable
+
+            # assemble the subdirectories info of the displayed ranks: collect dir names, sizes and incompleteness
+            # (the big-enough subdirs are the top ranks, so the same ranks as for "cdi" apply)
+            subdir_names = self._rank_subdirs(dir_info, last_rank)[first_rank:]
+            if not dir_info['dirs']:
+                print('  no subdirectories')
+            elif not subdir_names:
+                print('  no subdirectories {}'.format('on this page' if n_listable else 'of this size'))
+            else:
+                subdirs = [(d, self._format_size(dir_info['dirs'][d]['size']), dir_info['dirs'][d]['size'],
+                            self._check_incompleteness(dir_info['dirs'][d])) for d in subdir_names]
+
+                # assemble formating pattern for displaying the subdirectories info
+                size_max_width = max([len(d[1]) for d in subdirs])
+                size_steps = 11
+                fish = '{{:>{:.0f}}} '.format(size_max_width+3)  # formating pattern for size value
+                fish += '{} '      # formating pattern for poss. incomplete flag
+                fish += '{{:<{:.0f}}}'.format(size_steps+2)   # formating pattern for size bar
+                fish += '{:>5} '   # formating pattern for size rank
+                fish += '{}'      # formating pattern for dir name
+                fish += '   [{} dirs, {} files]'      # formating pattern for dir & file counts
+                fish += '{}'      # formating pattern for poss. confidence interval of an estimated size
+
+                # display the subdirectories info
+                max_size = dir_info['size']
+                for i, d in enumerate(subdirs, first_rank):
+                    if d[3]:
+                        incomplete_flag = '?'
+                    else:
+                        incomplete_flag = ' '
+                    if scanning:
+                        # add in-progress flag
+                        incomplete_flag += '~' if d[0] in pending_subdirs else ' '
+                    crab = '[{{:-<{:.0f}}}]'.format(size_steps)
+                    if d[2] > 0:
+                        size_bar = crab.format('#' * (1 + int(d[2] / max_size * (size_steps - 1))))
+                    else:
+                        size_bar = crab.format('')
+                    file_count, dir_count = self._get_counts(dir_info['dirs'][d[0]])
+                    print(fish.format(d[1], incomplete_flag, size_bar, '[{:.0f}]'.format(i), d[0], dir_count, file_count,
+                                      self._format_estimate(dir_info['dirs'][d[0]])))
 
-        # assemble the subdirectories info: collect dir names, sizes and incompleteness, sort by size
-        subdirs = sorted(dir_info['dirs'].items(), key=lambda info : info[1]['size'], reverse=True)
-        if not subdirs:
-            print('  no subdirectories')
-        else:
-            subdirs = [(d[0], self._format_size(d[1]['size']), d[1]['size'], self._check_incompleteness(d[1])) for d in subdirs]
-
-            # assemble formating pattern for displaying the subdirectories info
-            size_max_width = max([len(d[1]) for d in subdirs])
-            size_steps = 11
-            fish = '{{:>{:.0f}}} '.format(size_max_width+3)  # formating pattern for size value
-            fish += '{} '      # formating pattern for poss. incomplete flag
-            fish += '{{:<{:.0f}}}'.format(size_steps+2)   # formating pattern for size bar
-            fish += '{:>5} '   # formating pattern for size rank
-            fish += '{}'      # formating pattern for dir name
-            fish += '   [{} dirs, {} files]'      # formating pattern for dir & file counts
-
-            # display the subdirectories info
-            # max_size = max([d[2] for d in subdirs])
-            max_size = dir_info['size']
-            for i, d in enumerate(subdirs):
-                if d[3]:
-                    incomplete_flag = '?'
-                else:
-                    incomplete_flag = ' '
-                crab = '[{{:-<{:.0f}}}]'.format(size_steps)
-                if d[2] > 0:
-                    size_bar = crab.format('#' * (1 + int(d[2] / max_size * (size_steps - 1))))
-                else:
-                    size_bar = crab.format('')
-                file_count, dir_count = self._get_counts(dir_info['dirs'][d[0]])
-                print(fish.format(d[1], incomplete_flag, size_bar, '[{:.0f}]'.format(i), d[0], dir_count, file_count))
+                if (first_rank > 0) or (last_rank < n_listable):
+                    # not all listable subdirs displayed  ->  tell which ones
+                    print('\n[ranks {} to {} of {} listed{}]'.format(first_rank, last_rank - 1, n_listable,
+                                                                  '' if last_rank == n_listable else ', more on page {}'.format(page + 1)))
 
-        print('\n[Unit scale: 1{}B = {:.0f}B]'.format(self._units[0], self._unit_scale))
+        print('\n[Unit scale: 1{0}{1} = {2:.0f}{1}]'.format(self._units[0], self._size_unit, self._unit_scale))
 
     def pwd(self):
         """
         """
         print(self._get_current_dir())
 
+    def refine(self, fraction=None, _quiet=False):
+        """
+        Refines the estimation of the current analysis (see "sample_fraction"): samples more of the
+        not yet analysed dirs and updates the estimated sizes. Without a fraction, all remaining dirs
+        are analysed, which makes the result exact.
+
+        @param fraction - [optional] float, fraction of the dirs of each stratum to sample additionally;
+            default: all remaining dirs
+        @param _quiet - [optional] bool, True to log the status lines instead of printing them
+        @retval exact - bool, True if the result is exact now, False if it is still an estimation
+        """
+        if self._strata is None:
+            # nothing estimated
+            return True
+
+        time_start = datetime.datetime.now()    # just for performance info: note start time
+
+        with self._lock:
+            self._sample_subdirs(fraction)
+            self._ranking = None        # sizes have changed  ->  rank again
+            self._tree_index = None     # dirs have been added  ->  index again
+
+        self._print_status('===== elapsed time:  {}'.format(datetime.datetime.now() - time_start), _quiet)
+        self._print_status('===== total count: {} files,  {} dirs'.format(*self._get_counts(self.base_dir_info)), _quiet)
+
+        return self._strata is None
+
+    def find(self, dir_path=None, **predicates):
+        """
+        Searches the dirs of the analysis result which match the specified predicates.
+        The search uses an index of the info tree (see TreeIndex), which is built once per analysis
+        result (during a progressive analysis for each search).
+
+        @param dir_path - [optional] string, path of the dir to search in (including the dir itself); default: current dir
+        @param predicates - keyword arguments, predicates (and limit) as for TreeIndex.find
+        @retval dirs - list of dicts, summaries of the matching dirs (see TreeIndex.get_summary), sorted by size (descending)
+        """
+        if self.base_dir is None:
+            return []
+
+        if dir_path is None:
+            dir_path = self._get_current_dir()
+        elif dir_path != _VIRTUAL_ROOT:
+            if self._get_current_dir() != _VIRTUAL_ROOT:
+                dir_path = os.path.join(self._get_current_dir(), dir_path)  # relative to the current dir (if absolute, the current dir is ignored)
+            dir_path = os.path.abspath(dir_path)
+
+        with self._lock:
+            if (self._tree_index is None) or (self._tree_index._infos[0] is not self.base_dir_info) or self._is_scanning():
+                self._tree_index = TreeIndex(self.base_dir, self.base_dir_info, self._roots)
+
+            return [self._tree_index.get_summary(node_id) for node_id in self._tree_index.find(dir_path, **predicates)]
+
+    def trend(self, dir_path=None, days=None, children=False, limit=20):
+        """
+        Displays the growth of a dir according to the history database (see ScanHistory): its growth
+        rate (least-squares fit) and its recorded totals, or the growth rates of its subdirs.
+
+        @param dir_path - [optional] string, path of the dir (absolute or relative to the current dir); default: current dir
+        @param days - [optional] float, only consider the records of the last days; default: all records
+        @param children - [optional] bool, flag to display the growth rates of the subdirs (fastest growing first)
+        @param limit - [optional] int, max. number of subdirs to display
+        """
+        if self._scan_history is None:
+            print('  no scan history (see option --history-db)')
+            return
+
+        current_dir = self._get_current_dir()
+        if (current_dir is None) or (current_dir == _VIRTUAL_ROOT):
+            current_dir = os.getcwd()
+        dir_path = os.path.abspath(current_dir if dir_path is None else os.path.join(current_dir, dir_path))
+        since = None if days is None else time.time() - days * 86400
+
+        format_rate = lambda rate : '{}{}/day'.format('-' if rate < 0 else '+', self._format_size(abs(rate) * 86400, unit_indent=False, unit='B').rstrip())
+        format_time = lambda record_time : datetime.datetime.fromtimestamp(record_time).strftime('%Y-%m-%d %H:%M')
+
+        records = self._scan_history.get_trend(dir_path, since)
+        if not records:
+            print('{}: no records'.format(dir_path))
+            return
+        rate = _growth_rate([record[0] for record in records], [record[1] for record in records])
+        print('{}: {}, {} ({} scans, {} to {})\n'.format(dir_path, self._format_size(records[-1][1], unit_indent=False, unit='B'),
+                                                        'growth unknown' if rate is None else format_rate(rate),
+                                                        len(records), format_time(records[0][0]), format_time(records[-1][0])))
+
+        if not children:
+            for record_time, size, file_count, dir_count, incomplete in records:
+                print('  {}   {} {}   [{} files, {} dirs]'.format(format_time(record_time), self._format_size(size, unit='B'), '?' if incomplete else ' ', file_count, dir_count))
+        else:
+            trends = self._scan_history.get_children_trends(dir_path, since)
+            if not trends:
+                print('  no records of subdirectories')
+            for path, rate, size, n_records in trends[:limit]:
+                print('  {:>16}   {}   {}'.format(format_rate(rate), self._format_size(size, unit='B'), os.path.basename(path) or path))
+            if len(trends) > limit:
+                print('\n  [{} fastest growing of {} subdirs]'.format(limit, len(trends)))
+
+    def iter_scan(self, directory):
+        """
+        Analyses the specified dir(s) and yields a record for each dir as soon as it is analysed (depth first).
+        The dir infos are dropped once their records are emitted, so the memory footprint stays flat (apart from
+        the queue of pending dirs); no analysis result remains to browse afterwards. Closing the generator early
+        stops the analysis.
+
+        @param directory - string, path of the dir to analyse; or list of strings, paths of several dirs
+        @retval records - generator of dicts, dir records:
+            key 'path' - string, path of the dir
+            key 'files_size' - float, sum of the sizes of the files in the dir
+            key 'file_count' - int, number of files in the dir
+            key 'subdir_count' - int, number of subdirs of the dir
+            key 'incomplete' - bool, flag to indicate that access to the dir or any of its files was denied
+        """
+        self._stop_scan()   # discard any running background analysis
+        self._dir_stock = {}
+        self._set_base_dir(directory)
+        self._streaming = True
+        try:
+            while self._dir_list or self._chunk_list:
+                self._iterate_dir_list()
+                while self._records:
+                    yield self._records.popleft()
+        finally:
+            self._end_stream()
+
+    def _end_stream(self):
+        """
+        Ends the streaming mode, discards the remains of the streamed analysis.
+        """
+        self._streaming = False
+        self._records.clear()
+        self._held_records = {}
+        self._clear_dir_list()
+        self.base_dir = None
+        self._roots = None
+        self.base_dir_info = None
+        self._info_chain = []
+        self._dir_chain = []
+
+    def export_folded(self, file_path, dir_path=None, min_fraction=0.0001):
+        """
+        Exports the analysis result in the folded-stack format of flame-graph tools (e.g. flamegraph.pl,
+        speedscope): one line per dir, with its path as ";"-separated frames and the size of its own files.
+        The tree is traversed depth first and written on the fly; subtrees smaller than the specified
+        fraction of the exported dir are not descended into, their sizes count as the parent's own size.
+        So the output has less than 1 / min_fraction lines per dir level, whatever the size of the tree.
+
+        @param file_path - string, path of the file to write
+        @param dir_path - [optional] string, path of the dir to export; default: current dir
+        @param min_fraction - [optional] float, min. size of the exported subtrees, relative to the exported dir
+        @retval n_lines - int, number of lines written
+        """
+        dir_info, dir_path = self._get_export_dir(dir_path)
+        min_size = min_fraction * dir_info['size']
+        frame = lambda name : name.replace(';', ':').replace('\n', ' ')     # separator & line breaks are not allowed in frames
+
+        n_lines = 0
+        with open(file_path, 'w', encoding='utf-8', errors='surrogateescape') as out_file, self._lock:
+            stack = [(frame(dir_path), dir_info)]
+            while stack:
+                stack_string, dir_info = stack.pop()
+                own_size = dir_info['files_size']
+                for dir_name, info in dir_info['dirs'].items():
+                    if (info['size'] >= min_size) and (info['size'] > 0):
+                        stack.append((stack_string + ';' + frame(dir_name), info))
+                    else:
+                        own_size += info['size']    # pruned subtree
+                if own_size > 0:
+                    out_file.write('{} {:.0f}\n'.format(stack_string, own_size))
+                    n_lines += 1
+
+        return n_lines
+
+    def export_treemap(self, file_path, dir_path=None, min_fraction=0.0001, width=1600, height=1000):
+        """
+        Exports the analysis result as a self-contained HTML file with an SVG treemap (squarified
+        layout, see "_squarify"): each dir is a rectangle whose area is proportional to its size,
+        containing the rectangles of its subdirs; tooltips show paths and sizes.
+        The tree is traversed breadth first and written on the fly; subtrees smaller than the specified
+        fraction of the exported dir (or too small to be seen) are left out, their area is left empty.
+        So the output has less than 1 / min_fraction rectangles per dir level, whatever the size of the tree.
+
+        @param file_path - string, path of the file to write
+        @param dir_path - [optional] string, path of the dir to export; default: current dir
+        @param min_fraction - [optional] float, min. size of the exported subtrees, relative to the exported dir
+        @param width, height - [optional] int, size of the treemap in pixels
+        @retval n_rects - int, number of rectangles written
+        """
+        dir_info, dir_path = self._get_export_dir(dir_path)
+        min_size = min_fraction * dir_info['size']
+        min_area = 4.0  # min. area of a rectangle (in square pixels)
+        label_height = 14   # height of the label row of a rectangle (if big enough for a label)
+
+        n_rects = 0
+        with open(file_path, 'w', encoding='utf-8', errors='surrogateescape') as out_file, self._lock:
+            title = html.escape('{}: {}'.format(dir_path, self._format_size(dir_info['size'], unit_indent=False)))
+            out_file.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{}</title>\n'.format(title))
+            out_file.write('<style>body {{ font-family: sans-serif; }} rect {{ stroke: #fff; stroke-width: 0.5; }} '
+                           'text {{ font-size: 11px; pointer-events: none; }}</style>\n</head>\n<body>\n<h3>{}</h3>\n'.format(title))
+            out_file.write('<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}">\n'.format(width, height))
+
+            pending = collections.deque([(dir_path, dir_info, 0.0, 0.0, float(width), float(height), 0)])
+            while pending:
+                path, dir_info, x, y, w, h, depth = pending.popleft()
+                out_file.write('<g><title>{}\n{}</title><rect x="{:.1f}" y="{:.1f}" width="{:.1f}" height="{:.1f}" fill="hsl({:.0f},55%,{:.0f}%)"/>'.format(
+                    html.escape(path), self._format_size(dir_info['size'], unit_indent=False), x, y, w, h, (depth * 47) % 360, max(45, 80 - 3 * depth)))
+                n_rects += 1
+
+                # inner rectangle for the subdirs: below a label if there's enough space
+                if (w > 60) and (h > 2 * label_height):
+                    out_file.write('<text x="{:.1f}" y="{:.1f}">{}</text>'.format(x + 2, y + label_height - 3,
+                                                                               html.escape(os.path.basename(path) or path)))
+                    x, y, w, h = x + 1, y + label_height, w - 2, h - label_height - 1
+                else:
+                    x, y, w, h = x + 1, y + 1, w - 2, h - 2
+                out_file.write('</g>\n')
+
+                # lay out the subdirs big enough, and the rest (own files and pruned subtrees) as empty area
+                subdirs = [(name, info) for name, info in dir_info['dirs'].items() if (info['size'] >= min_size) and (info['size'] > 0)]
+                if (not subdirs) or (w <= 0) or (h <= 0):
+                    continue
+                subdirs.sort(key=lambda subdir : subdir[1]['size'], reverse=True)
+                values = [info['size'] for name, info in subdirs]
+                rest = dir_info['size'] - sum(values)
+                if rest > 0:
+                    values.append(rest)
+                    values.sort(reverse=True)
+                    rest_index = values.index(rest)     # position of the empty area in the layout
+                    subdirs.insert(rest_index, None)
+                for subdir, rect in zip(subdirs, _squarify(values, x, y, w, h)):
+                    if (subdir is not None) and (rect[2] * rect[3] >= min_area):
+                        pending.append((os.path.join(path, subdir[0]), subdir[1]) + rect + (depth + 1,))
+
+            out_file.write('</svg>\n</body>\n</html>\n')
+
+        return n_rects
+
+    def _get_export_dir(self, dir_path=None):
+        """
+        Determines the info object of the dir to export, updating the (preliminary) sizes during a
+        progressive analysis.
+
+        @param dir_path - [optional] string, path of the dir (absolute or relative to the current dir); default: current dir
+        @retval dir_info - dict, dir-info object of the dir
+        @retval dir_path - string, absolute path of the dir
+        """
+        if self.base_dir is None:
+            raise DirHunterError('Nothing analysed yet.')
+
+        if dir_path is None:
+            dir_path = self._get_current_dir()
+        elif dir_path != _VIRTUAL_ROOT:
+            if self._get_current_dir() != _VIRTUAL_ROOT:
+                dir_path = os.path.join(self._get_current_dir(), dir_path)
+            dir_path = os.path.abspath(dir_path)
+
+        dir_names = self._split_path(dir_path)
+        with self._lock:
+            dir_info = self.base_dir_info
+            for dir_name in (dir_names or []):
+                dir_info = dir_info['dirs'].get(dir_name)
+                if dir_info is None:
+                    break
+            if (dir_names is None) or (dir_info is None):
+                raise DirHunterError('{} is not part of the analysis result.'.format(dir_path))
+
+            if self._is_scanning():
+                self._sum_sizes(dir_info)
+
+        return dir_info, dir_path
+
     def _get_current_dir(self, full_path=True):
         """
         Returns the current directory of the sizer, i.e. the dir whose size information
@@ -312,103 +1048,665 @@ class Sizer:
                     dir_list = [dir for dir in os.path.split(self.base_dir) if dir]
                     return str(dir_list[-1])
 
+    def _enter_subdir(self, dir_name):
+        """
+        Changes to the specified subdir of the current dir (without any update, see "_update_current_dir").
+
+        @param dir_name - string, name of the subdir
+        """
+        try:
+            dir_info = self._info_chain[-1]
+        except IndexError:
+            dir_info = self.base_dir_info
+
+        self._info_chain.append(dir_info['dirs'][dir_name])
+        self._dir_chain.append(dir_name)
+
+    def _update_current_dir(self):
+        """
+        Lets a running background analysis work on the current dir first and updates its
+        (preliminary) sizes.
+        """
+        with self._lock:
+            if self._is_scanning():
+                try:
+                    dir_info = self._info_chain[-1]
+                except IndexError:
+                    dir_info = self.base_dir_info
+
+                self._prioritise_dir(self._get_current_dir())
+                self._sum_sizes(dir_info)
+
+    def _rank_subdirs(self, dir_info, n=None):
+        """
+        Ranks the subdirs of the specified dir by size.
+        If only the first ranks are requested, they are selected via a heap (costs O(N log n) instead
+        of O(N log N) for N subdirs). The ranking is cached for the dir (unless a background analysis
+        is running, as the sizes still change then), so listing further pages or changing into a subdir
+        by its rank needs no re-ranking.
+        Ties are ranked in insertion order (stable), independent of the number of requested ranks.
+
+        @param dir_info - dict, dir-info object of the dir
+        @param n - [optional] int, number of (top) ranks to determine; default: all
+        @retval dir_names - list of strings, names of the n largest subdirs, sorted by size (descending)
+        """
+        n_subdirs = len(dir_info['dirs'])
+        if (n is None) or (n > n_subdirs):
+            n = n_subdirs
+
+        if (self._ranking is not None) and (self._ranking[0] is dir_info) and (len(self._ranking[1]) >= n):
+            # cached ranking covers the requested ranks
+            return self._ranking[1][:n]
+
+        size_key = lambda item : item[1]['size']
+        if n * 4 < n_subdirs:
+            # few ranks requested  ->  partial selection
+            subdirs = heapq.nlargest(n, dir_info['dirs'].items(), key=size_key)
+        else:
+            subdirs = sorted(dir_info['dirs'].items(), key=size_key, reverse=True)
+        dir_names = [d[0] for d in subdirs]
+
+        if self._is_scanning():
+            self._ranking = None
+        else:
+            self._ranking = (dir_info, dir_names)
+
+        return dir_names[:n]
+
     def _set_base_dir(self, directory):
         """
         Sets the base directory and prepares the size analysis.
+        For several dirs, a virtual root dir is set as base dir, its subdirs are the specified dirs
+        (named by their full paths); all of them are queued for the analysis at once.
 
-        @param directory - string, path of the dir
+        @param directory - string, path of the dir; or list of strings, paths of several dirs
         """
-        self.base_dir = os.path.abspath(directory)   # store full dir path
-        self.base_dir_info = None
-        self._dir_list = [self.base_dir,]    # init list of dir paths (used during analysis)
-        self._last_info = None     # clear insertion cache (used during analysis)
-        self._last_path = ''       # clear insertion cache (used during analysis)
+        self._clear_dir_list()  # clear list of dirs to analyse (poss. left over from an interrupted analysis)
+        self._clear_strata()    # discard any estimation of the previous base dir
+        self.base_dir_info = self._create_info()    # create root of info tree, to be filled by the analysis
+
+        if isinstance(directory, (list, tuple)) and (len(directory) == 1):
+            directory = directory[0]    # single dir  ->  no virtual root dir
+
+        if isinstance(directory, (list, tuple)):
+            # several dirs  ->  virtual root dir; drop duplicates and dirs within other specified dirs
+            roots = sorted(set(os.path.abspath(root) for root in directory))
+            self._roots = []
+            for root in roots:
+                if any(os.path.commonpath((root, other)) == other for other in self._roots):
+                    logging.warning('Skipping {}: already included in another root dir.'.format(root))
+                else:
+                    self._roots.append(root)
+
+            self.base_dir = _VIRTUAL_ROOT
+            self._dir_list = collections.deque()
+            for root in self._roots:
+                root_info = self._create_info()     # placeholder for the root dir's info
+                self.base_dir_info['dirs'][root] = root_info
+                self._dir_list.append((None, root, root_info))     # queue the root dirs for the analysis
+        else:
+            self._roots = None
+            self.base_dir = os.path.abspath(directory)   # store full dir path
+            self._dir_list = collections.deque([(None, self.base_dir, self.base_dir_info)])    # init queue of dirs to analyse (used during analysis)
+
+    def _change_base_dir(self, directory, _quiet=False):
+        """
+        Changes the base directory: re-uses a cached analysis result of the dir if there is one (no new
+        analysis), otherwise analyses the dir, re-using the cached results below it (see "_select_stock").
+
+        @param directory - string, path of the dir; or list of strings, paths of several dirs
+        @param _quiet - [optional] bool, True to log the status lines of the analysis instead of printing them
+        """
+        self._stop_scan()   # discard any running background analysis
+
+        if not isinstance(directory, (list, tuple)):
+            dir_info = self._lookup_cache(os.path.abspath(directory))
+            if dir_info is not None:
+                # cached  ->  use the previous analysis result
+                self._clear_dir_list()
+                self._clear_strata()
+                self.base_dir = os.path.abspath(directory)
+                self._roots = None
+                self.base_dir_info = dir_info
+                logging.info('Re-using cached analysis result of {}'.format(self.base_dir))
+                return
+
+        self._select_stock(directory)
+        self._set_base_dir(directory)   # set specified dir as new base dir
+        self._analyse_base_dir(_quiet)    # run analysis
+
+    def _get_base_dirs(self):
+        """
+        Returns the specification of the base dir, as accepted by "_set_base_dir".
+
+        @retval directory - string, path of the base dir; or list of strings, paths of the root dirs of a multi-root analysis
+        """
+        if self.base_dir == _VIRTUAL_ROOT:
+            return list(self._roots)
+        return self.base_dir
+
+    def _split_path(self, dir_path):
+        """
+        Splits the path of a dir within the base dir into the names of the dirs on the way
+        from the base dir to it. In a multi-root analysis, the first name is the path of the
+        root dir.
+
+        @param dir_path - string, full path of the dir
+        @retval dir_names - list of strings, dir names (empty for the base dir itself);
+            None if the dir is not within the base dir
+        """
+        return _split_path(self.base_dir, self._roots, dir_path)
 
-    def _analyse_base_dir(self):
+    def _analyse_base_dir(self, _quiet=False):
         """
         Starts the analysis of the currently set base dir, iterates over all its subdirs.
+        The analysis can be cancelled from another thread via "_scan_stop" (see AsyncSizer),
+        the incomplete results are discarded then.
+
+        @param _quiet - [optional] bool, True to log the status lines instead of printing them
         """
         time_start = datetime.datetime.now()    # just for performance info: note start time
 
-        # handle re-using of an existing info object
-        if self._dir_stock:
-            # insert the existing info object into the info tree (initialises the tree if necessary)
-            # self._iterate_dir_list()    # perform a single analysis iteration to initialise the info tree
-            self._insert_info(self._info_stock, self._dir_stock)
+        if self._progressive:
+            # progressive mode: analyse the top levels only, leave the rest to a background thread
+            self._iterate_top_levels(self._progressive_levels)
+            if self._scan_stop.is_set():
+                self._discard_analysis()
+                return
+            self._sum_sizes()   # calculate the preliminary dir sizes
+            self._scan_thread = threading.Thread(target=self._scan_background, args=(time_start,), daemon=True)
+            self._scan_thread.start()
+            return
 
-        # iteratively analyse until the list of dirs to analyse is empty
-        while self._dir_list:
+        if self._sample_fraction:
+            # estimation mode: analyse the top levels completely, extrapolate the sizes below from a sample
+            self._iterate_top_levels(self._exact_levels)
+            if not self._scan_stop.is_set():
+                self._init_strata()
+                self._sample_subdirs(self._sample_fraction)
+            if self._scan_stop.is_set():
+                self._discard_analysis()
+                return
+
+            # delete any existing, re-used info object
+            self._dir_stock = {}
+
+            self._print_status('===== elapsed time:  {}'.format(datetime.datetime.now() - time_start), _quiet)
+            self._print_status('===== analysed count: {} files,  {} dirs{}'.format(*self._get_counts(self.base_dir_info),
+                                                                                 ' (estimation)' if self._strata is not None else ''), _quiet)
+            return
+
+        # iteratively analyse until the list of dirs (and file chunks) to analyse is empty
+        # (or the analysis is cancelled from another thread, see AsyncSizer)
+        while (self._dir_list or self._chunk_list) and not self._scan_stop.is_set():
             self._iterate_dir_list()
 
+        if self._scan_stop.is_set():
+            self._discard_analysis()
+            return
+
         self._sum_sizes()   # finally calculate the dir sizes
+        self._record_history()
+        self._record_scan()
 
         # delete any existing, re-used info object
-        self._dir_stock = ''
-        self._info_stock = None
+        self._dir_stock = {}
 
         time_end = datetime.datetime.now()  # just for performance info: note end time
 
-        print('===== elapsed time: ', str(time_end - time_start))
-        print('===== insertion cache: {} hits, {} misses'.format(self._last_counter[1], self._last_counter[0]))
-        print('===== total count: {} files,  {} dirs'.format(*self._get_counts(self.base_dir_info)))
-        self._last_counter = [0, 0]    # just for debugging/info: init counters for insertion cache misses & hits
+        self._print_status('===== elapsed time:  {}'.format(time_end - time_start), _quiet)
+        self._print_status('===== total count: {} files,  {} dirs'.format(*self._get_counts(self.base_dir_info)), _quiet)
 
-    def _iterate_dir_list(self):
+    def _discard_analysis(self):
         """
-        Triggers the size analysis for the first element of the internal dir list.
+        Discards the incomplete results of a cancelled analysis (see "_analyse_base_dir").
         """
-        dir_path = self._dir_list.pop(0)    # fetch the first entry of the dir list
-
-        if self._dir_stock == dir_path:
-            # if an existing info object is re-used, its path is stored in "_dir_stock"
-            # -> skip this path during the current analysis
-            logging.debug('Analysis re-use: Skipping dir: {}'.format(dir_path))
-            self._dir_stock = ''
-            return
-
-        dir_info, subdir_list = self._analyse_dir(dir_path)     # analyse the dir
-        self._insert_info(dir_info, dir_path)       # insert the dir-info object into the info tree
-        self._dir_list = subdir_list + self._dir_list   # prepend any found subdirs to the dir list
+        self._clear_dir_list()
+        self._clear_strata()
+        self.base_dir_info = self._create_info()
 
-    def _analyse_dir(self, dir_path):
+    def _scan_background(self, time_start):
         """
-        Performs the actual analysis for the specified dir.
-        (Analysis means: sum size of files in dir, determine names of subdirs)
+        Continues the analysis of the currently set base dir in a background thread
+        (progressive mode), until the list of dirs to analyse is empty or a stop is requested.
 
-        @param dir_path - string, path of the dir to analyse
-        @retval dir_info, subdir_list - created dir-info object (dict) and list of found subdirs
+        @param time_start - datetime.datetime object, start time of the analysis (just for performance info)
         """
-        # init return values
-        dir_info = self._create_info()      # create new dir-info object
-        subdir_list = []    # create empty list for subdirs
+        while (self._dir_list or self._chunk_list) and not self._scan_stop.is_set():
+            self._iterate_dir_list()
 
-        # process the directory's entries (files / subdirs)
-        try:
-            for dir_entry in os.scandir(dir_path):
-                try:
-                    if dir_entry.is_file(follow_symlinks=False):
-                        # current entry is a file  ->  add its size to dir size
-                        dir_info['file_count'] += 1     # increase file counter
-                        stat = dir_entry.stat(follow_symlinks=False)
-                        dir_info['files_size'] += float(stat.st_size)
-                        # print('\t{}: {}'.format(dir_entry.path, float(stat.st_size)))
+        if self._scan_stop.is_set():
+            # analysis has been interrupted  ->  leave the (incomplete) results as they are
+            return
 
-                    elif dir_entry.is_dir(follow_symlinks=False):
-                        # current entry is a subdir  ->  create a subdir-queue entry with its name & path
-                        subdir_list.append(dir_entry.path)
+        with self._lock:
+            self._sum_sizes()   # finally calculate the dir sizes
+            self._record_history()
+            self._record_scan()
 
-                        # this is the (slower) version for different handling of mount points
-                        # if os.path.ismount(dir_entry.path):
-                        #     logging.info('Ignoring mount point {}'.format(dir_entry.path))
-                        # else:
-                        #     subdir_list.append(dir_entry.path)
+            # delete any existing, re-used info object
+            self._dir_stock = {}
 
-                except OSError:
+        logging.info('Background analysis of {} finished, elapsed time: {}'.format(self.base_dir, datetime.datetime.now() - time_start))
+
+    def _iterate_top_levels(self, n_levels):
+        """
+        Analyses the dirs of the internal dir list level by level (breadth first)
+        for the specified number of levels. The subdirs found in the last level remain
+        in the dir list.
+
+        @param n_levels - int, number of dir levels to analyse
+        """
+        for level in range(n_levels):
+            level_list = self._dir_list     # dirs of the current level
+            next_level_list = []        # collects the subdirs found on the current level
+            for dir_entry in level_list:
+                if self._scan_stop.is_set():
+                    return      # analysis cancelled (see "_analyse_base_dir")
+                self._dir_list = collections.deque([dir_entry])
+                self._iterate_dir_list()
+                while self._chunk_list:
+                    self._iterate_dir_list()    # analyse file chunks of a huge dir
+                next_level_list += self._dir_list
+            self._dir_list = collections.deque(next_level_list)
+
+    def _init_strata(self):
+        """
+        Groups the dirs left in the internal dir list after analysing the top levels into strata
+        for the estimation mode: one stratum per parent dir, as subdirs of the same dir tend to be
+        more alike than arbitrary dirs (which narrows the confidence intervals).
+        Notes the dir infos of the top levels, through which the estimates are propagated.
+        The dirs below the top levels are either in the strata or part of re-used analysis results
+        (see "_dir_stock"), which are complete: their sizes don't change, they are not walked.
+        """
+        strata = {}     # keys are ids of the parents' subdir containers
+        for entry in self._dir_list:
+            stratum = strata.setdefault(id(self._get_entry_dirs(entry)), {'parent': None, 'sampled': [], 'unsampled': []})
+            stratum['unsampled'].append(entry)      # dir-list entries of the dirs not analysed yet
+        self._dir_list = collections.deque()
+
+        # walk the analysed top levels of the info tree (see "_iterate_top_levels"), the parents of the strata are on the last one
+        if self.base_dir == _VIRTUAL_ROOT:
+            self._top_infos = [self.base_dir_info]
+            level = list(self.base_dir_info['dirs'].values())   # the roots are the first analysed level
+        else:
+            self._top_infos = []
+            level = [self.base_dir_info]
+        for i in range(self._exact_levels):
+            self._top_infos += level
+            for info in level:
+                stratum = strata.get(id(info['dirs']))
+                if stratum is not None:
+                    stratum['parent'] = info
+            level = [subdir_info for info in level for subdir_info in info['dirs'].values()]
+
+        self._strata = list(strata.values())
+
+    def _sample_subdirs(self, fraction=None):
+        """
+        Analyses a random sample of the not yet analysed dirs of each stratum (completely, with all
+        their subdirs) and updates the estimated sizes (stratified random sampling).
+        Ends the estimation once all dirs are analysed.
+
+        @param fraction - [optional] float, fraction of the dirs of each stratum to sample (at least
+            self._min_samples dirs per stratum); default: all remaining dirs
+        """
+        for stratum in self._strata:
+            unsampled = stratum['unsampled']
+            if fraction is None:
+                n_samples = len(unsampled)
+            else:
+                n_dirs = len(stratum['sampled']) + len(unsampled)
+                n_samples = min(len(unsampled), max(self._min_samples - len(stratum['sampled']), math.ceil(fraction * n_dirs)))
+
+            self._random.shuffle(unsampled)
+            self._dir_list += unsampled[:n_samples]     # queue the sample for the analysis
+            stratum['sampled'] += [entry[2] for entry in unsampled[:n_samples]]
+            del unsampled[:n_samples]
+
+        while (self._dir_list or self._chunk_list) and not self._scan_stop.is_set():
+            self._iterate_dir_list()
+        if self._scan_stop.is_set():
+            return      # analysis cancelled (see "_analyse_base_dir")
+
+        self._sum_sizes()   # calculate the sizes of the analysed dirs
+
+        if any(stratum['unsampled'] for stratum in self._strata):
+            self._update_estimates()
+        else:
+            # all dirs analysed  ->  exact result
+            self._clear_strata()
+            self._record_history()
+            self._record_scan()
+
+    def _update_estimates(self):
+        """
+        Extrapolates the sizes of the dirs which have not been sampled and propagates them up through
+        the top levels of the info tree, along with their variances.
+        Within a stratum of N dirs of which n are sampled (mean size m, sample variance s^2), each missing
+        dir is estimated by m; the sum of the N - n missing dirs has the variance (N - n)^2 * s^2 / n
+        (uncertainty of the mean) + (N - n) * s^2 (spread of the single dirs). The variances of
+        different strata add up. The estimated sizes replace the sizes in the info tree, the half-widths
+        of their confidence intervals are stored in "_estimates".
+        """
+        variances = {}      # variances of the estimated sizes, keys are ids of dir-info objects
+        for stratum in self._strata:
+            n_missing = len(stratum['unsampled'])
+            if not n_missing:
+                continue    # completely analysed
+
+            sizes = [info['size'] for info in stratum['sampled']]
+            n_sampled = len(sizes)
+            mean = sum(sizes) / n_sampled
+            if n_sampled > 1:
+                variance = sum((size - mean) ** 2 for size in sizes) / (n_sampled - 1)
+            else:
+                variance = mean ** 2    # no spread measurable  ->  assume it to be as large as the mean
+
+            for entry in stratum['unsampled']:
+                entry[2]['size'] = mean
+                variances[id(entry[2])] = variance * (1.0 + 1.0 / n_sampled)
+            variances[id(stratum['parent'])] = n_missing * variance * (n_missing / n_sampled + 1.0)
+
+        # sum the sizes & variances of the top levels from the bottom up (children are noted after their parents)
+        parent_ids = set(id(stratum['parent']) for stratum in self._strata)
+        for info in reversed(self._top_infos):
+            info['size'] = info['files_size'] + sum(subdir_info['size'] for subdir_info in info['dirs'].values())
+            if id(info) not in parent_ids:
+                subdir_variances = [variances[id(subdir_info)] for subdir_info in info['dirs'].values() if id(subdir_info) in variances]
+                if subdir_variances:
+                    variances[id(info)] = sum(subdir_variances)
+
+        self._estimates = {key: self._confidence_z * math.sqrt(variance) for key, variance in variances.items()}
+
+    def _clear_strata(self):
+        """
+        Discards the estimation state, releases the dir references of the not sampled dirs.
+        """
+        if self._strata is not None:
+            for stratum in self._strata:
+                while stratum['unsampled']:
+                    self._release_dir_ref(stratum['unsampled'].pop()[0])
+        self._strata = None
+        self._top_infos = []
+        self._estimates = {}
+
+    def _is_scanning(self):
+        """
+        Checks whether a background (progressive) analysis is running.
+
+        @retval scanning - bool, True if the background analysis is running, False otherwise
+        """
+        return (self._scan_thread is not None) and self._scan_thread.is_alive()
+
+    def _stop_scan(self):
+        """
+        Stops a running background (progressive) analysis.
+
+        @retval complete - bool, True if the analysis of the base dir is complete,
+            False if a running analysis had to be interrupted
+        """
+        if self._scan_thread is None:
+            # no background analysis started  ->  nothing to stop
+            return True
+
+        self._scan_stop.set()
+        self._scan_thread.join()
+        self._scan_thread = None
+        self._scan_stop.clear()
+
+        complete = not (self._dir_list or self._chunk_list)
+        self._clear_dir_list()      # release the dir references of any remaining dirs
+
+        return complete
+
+    def _prioritise_dir(self, dir_path):
+        """
+        Moves the dirs below the specified dir to the front of the internal dir list,
+        so that a running background analysis continues with them.
+
+        @param dir_path - string, path of the dir to prioritise
+        """
+        if dir_path == _VIRTUAL_ROOT:
+            return  # all dirs are below the virtual root dir
+
+        prefix = os.path.join(dir_path, '')     # dir path with trailing slash
+        with self._lock:
+            priority_flags = [self._get_entry_path(entry).startswith(prefix) for entry in self._dir_list]
+            if any(priority_flags):
+                self._dir_list = collections.deque([entry for entry, flag in zip(self._dir_list, priority_flags) if flag] +
+                                                   [entry for entry, flag in zip(self._dir_list, priority_flags) if not flag])
+
+    def _get_pending_subdirs(self, dir_path):
+        """
+        Determines the subdirs of the specified dir which are not yet completely analysed,
+        i.e. which contain dirs that are still in the internal dir list.
+
+        @param dir_path - string, path of the dir
+        @retval pending_subdirs - set of strings, names of the pending subdirs
+        """
+        prefix = os.path.join(dir_path, '')     # dir path with trailing slash
+        pending_subdirs = set()
+        with self._lock:
+            dir_list = list(self._dir_list)
+            if self._active_entry is not None:
+                dir_list.append(self._active_entry)
+            paths = [self._get_entry_path(entry) for entry in dir_list] + [chunk[0].path for chunk in self._chunk_list]
+            for path in paths:
+                if dir_path == _VIRTUAL_ROOT:
+                    pending_subdirs.add(self._split_path(path)[0])     # subdirs of the virtual root dir are the root dirs
+                elif path.startswith(prefix):
+                    pending_subdirs.add(path[len(prefix):].split(os.sep, 1)[0])
+
+        return pending_subdirs
+
+    def _iterate_dir_list(self):
+        """
+        Triggers the size analysis for the first element of the internal dir list.
+        Pending file chunks (of huge dirs) are analysed first.
+        """
+        if self._chunk_list:
+            self._iterate_chunk_list()
+            return
+
+        with self._lock:
+            entry = self._dir_list.popleft()    # fetch the first entry of the dir list
+            parent_ref, dir_name, tree_info = entry
+
+            stock = self._dir_stock.pop(self._get_entry_path(entry), None) if self._dir_stock else None
+            if stock is not None:
+                # if existing info objects are re-used, their paths are stored in "_dir_stock"
+                # -> skip this path during the current analysis
+                logging.debug('Analysis re-use: Skipping dir: {}'.format(self._get_entry_path(entry)))
+                self._reuse_stock(entry, stock)
+                self._release_dir_ref(parent_ref)
+                return
+
+            self._active_entry = entry      # note the dir under analysis
+
+        dir_info, subdir_list, chunk_list = self._analyse_dir(parent_ref, dir_name)     # analyse the dir (without holding the lock)
+        self._release_dir_ref(parent_ref)
+
+        with self._lock:
+            self._graft_info(tree_info, dir_info)       # put the dir-info object into its place in the info tree
+            self._dir_list.extendleft(reversed(subdir_list))    # prepend any found subdirs to the dir list (in their order)
+            self._chunk_list += [(dir_ref, file_names, tree_info) for dir_ref, file_names in chunk_list]
+            self._active_entry = None
+            self._n_analysed += 1 + dir_info['file_count']
+            if self._streaming:
+                self._stream_dir(entry, len(chunk_list))
+
+    def _iterate_chunk_list(self):
+        """
+        Triggers the analysis of the first elements of the internal list of file chunks,
+        as many chunks in parallel as there are chunk threads.
+        """
+        with self._lock:
+            chunk_list = self._chunk_list[:self._chunk_threads]    # fetch the first entries of the chunk list
+            del self._chunk_list[:self._chunk_threads]
+
+        # analyse the chunks (without holding the lock)
+        if len(chunk_list) > 1:
+            # (a thread pool per batch: starting its threads is negligible compared to the chunks' stat calls,
+            # and no idle threads are kept after the huge dirs have been analysed)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(chunk_list)) as executor:
+                chunk_infos = list(executor.map(self._analyse_chunk, chunk_list))
+        else:
+            chunk_infos = [self._analyse_chunk(chunk) for chunk in chunk_list]
+
+        with self._lock:
+            for (dir_ref, file_names, tree_info), chunk_info in zip(chunk_list, chunk_infos):
+                self._add_info(tree_info, chunk_info)   # add the chunk's file sizes & counts to its dir's info
+                self._release_dir_ref(dir_ref)
+                self._n_analysed += chunk_info['file_count']
+                if self._streaming:
+                    held_record = self._held_records[id(tree_info)]
+                    held_record[1] -= 1
+                    if not held_record[1]:
+                        # last chunk of the dir  ->  its record is complete
+                        del self._held_records[id(tree_info)]
+                        self._emit_record(held_record[0], tree_info)
+
+    def _stream_dir(self, entry, n_chunks):
+        """
+        Streaming mode (see "iter_scan"): notes the record of an analysed dir and removes the dir's info from
+        the info tree (its subdirs still refer to it via their parent _DirRef until they are analysed).
+        The record of a dir with file chunks is held back until the chunks are analysed.
+
+        @param entry - dir-list entry of the analysed dir
+        @param n_chunks - int, number of file chunks of the dir which are still to analyse
+        """
+        parent_ref, dir_name, tree_info = entry
+        record = {'path': self._get_entry_path(entry), 'subdir_count': len(tree_info['dirs'])}
+        if (parent_ref is not None) or (self.base_dir == _VIRTUAL_ROOT):
+            self._get_entry_dirs(entry).pop(dir_name, None)     # (the base dir itself remains the root of the info tree)
+
+        if n_chunks:
+            self._held_records[id(tree_info)] = [record, n_chunks]
+        else:
+            self._emit_record(record, tree_info)
+
+    def _emit_record(self, record, dir_info):
+        """
+        Completes the record of an analysed dir with the file sizes & counts and queues it for emission.
+
+        @param record - dict, record of the dir (path & number of subdirs)
+        @param dir_info - dir-info object (dict) of the dir
+        """
+        record['files_size'] = dir_info['files_size']
+        record['file_count'] = dir_info['file_count']
+        record['incomplete'] = dir_info['incomplete']
+        self._records.append(record)
+
+    def _analyse_chunk(self, chunk):
+        """
+        Analyses a file chunk of a huge dir, i.e. sums the sizes of the files.
+
+        @param chunk - (dir _DirRef, file names, dir-info object) triple
+        @retval chunk_info - dir-info object (dict) with the files' sizes & counts
+        """
+        dir_ref, file_names = chunk[0], chunk[1]
+        chunk_info = self._create_info()
+        chunk_info['file_count'] = len(file_names)
+        throttle = self._throttle
+        for file_name in file_names:
+            if throttle is not None:
+                throttle.acquire()
+            try:
+                if dir_ref.fd is not None:
+                    stat = os.stat(file_name, dir_fd=dir_ref.fd, follow_symlinks=False)
+                else:
+                    stat = os.stat(os.path.join(dir_ref.path, os.fsdecode(file_name)), follow_symlinks=False)
+                chunk_info['files_size'] += float(stat.st_size)
+
+            except OSError:
+                # file could not be accessed
+                logging.info('Access denied to {}'.format(os.path.join(dir_ref.path, os.fsdecode(file_name))))
+                chunk_info['incomplete'] = True
+
+        return chunk_info
+
+    def _reuse_stock(self, entry, stock):
+        """
+        Puts a stored dir-info object to re-use into its place in the info tree.
+
+        @param entry - dir-list entry of the dir info to re-use
+        @param stock - dir-info object to re-use (value of "_dir_stock")
+        """
+        self._graft_info(entry[2], stock)
+
+    def _analyse_dir(self, parent_ref, dir_name):
+        """
+        Performs the actual analysis for the specified dir.
+        (Analysis means: sum size of files in dir, determine names of subdirs)
+
+        @param parent_ref - _DirRef object of the parent dir or None (then dir_name is the full path)
+        @param dir_name - string, name (or path, see above) of the dir to analyse
+        @retval dir_info, subdir_list, chunk_list - created dir-info object (dict), list of found subdirs
+            and list of file chunks (for huge dirs: files which are to be analysed separately);
+            subdir-list entries are (_DirRef of analysed dir, subdir name, placeholder dir-info object) triples,
+            chunk-list entries are (_DirRef of analysed dir, file names) pairs
+        """
+        # init return values
+        dir_info = self._create_info()      # create new dir-info object
+        subdir_list = []    # create empty list for subdirs
+        chunk_list = []     # create empty list for file chunks
+
+        dir_path = dir_name if parent_ref is None else os.path.join(parent_ref.path, dir_name)
+        dir_ref = _DirRef(dir_path)     # reference to the dir for the subdir-queue entries
+        dir_ref.dirs = dir_info['dirs']
+        dir_fd = None
+        chunk_names = []    # names of the files beyond the first chunk
+        throttle = self._throttle
+
+        # process the directory's entries (files / subdirs)
+        try:
+            dir_iterator, dir_fd = self._scan_dir(parent_ref, dir_name, dir_path)
+            count_only = self._count_only
+            for dir_entry in dir_iterator:
+                if count_only:
+                    dir_info['files_size'] += 1.0   # count-only mode: each entry counts as size 1
+                try:
+                    if dir_entry.is_file(follow_symlinks=False):
+                        if count_only:
+                            # count-only mode  ->  no stat call
+                            dir_info['file_count'] += 1
+                            continue
+
+                        if dir_info['file_count'] >= self._chunk_size:
+                            # huge dir  ->  leave the files beyond the first chunk to the chunk analysis
+                            chunk_names.append(dir_entry.name)
+                            continue
+
+                        # current entry is a file  ->  add its size to dir size
+                        dir_info['file_count'] += 1     # increase file counter
+                        if throttle is not None:
+                            throttle.acquire()
+                        stat = dir_entry.stat(follow_symlinks=False)
+                        dir_info['files_size'] += float(stat.st_size)
+                        # print('\t{}: {}'.format(dir_entry.path, float(stat.st_size)))
+
+                    elif dir_entry.is_dir(follow_symlinks=False):
+                        # current entry is a subdir  ->  create a placeholder info object (lists the subdir
+                        # before its analysis) and a subdir-queue entry with its name & placeholder
+                        subdir_info = self._create_info()
+                        dir_info['dirs'][dir_entry.name] = subdir_info
+                        subdir_list.append((dir_ref, dir_entry.name, subdir_info))
+
+                        # this is the (slower) version for different handling of mount points
+                        # if os.path.ismount(dir_entry.path):
+                        #     logging.info('Ignoring mount point {}'.format(dir_entry.path))
+                        # else:
+                        #     subdir_list.append(dir_entry.path)
+
+                except OSError:
                     # entry could not be accessed
-                    logging.info('Access denied to {}'.format(dir_entry.path))
+                    logging.info('Access denied to {}'.format(os.path.join(dir_path, dir_entry.name)))
                     dir_info['incomplete'] = True
 
         except FileNotFoundError:
+            if dir_fd is not None:
+                os.close(dir_fd)
             raise
 
         except OSError:
@@ -416,7 +1714,130 @@ class Sizer:
             logging.info('Access denied to {}'.format(dir_path))
             dir_info['incomplete'] = True
 
-        return dir_info, subdir_list
+        # split the remaining files into chunks
+        for i in range(0, len(chunk_names), self._chunk_size):
+            chunk_list.append((dir_ref, chunk_names[i:(i + self._chunk_size)]))
+
+        # keep the file descriptor open for opening the subdirs (and files of the chunks) relative to it
+        # (as long as the number of open descriptors is within its limit)
+        dir_ref.n_pending = len(subdir_list) + len(chunk_list)
+        if dir_fd is not None:
+            if dir_ref.n_pending and (len(self._dir_fd_refs) < self._max_dir_fds):
+                dir_ref.fd = dir_fd
+                self._dir_fd_refs.add(dir_ref)
+            else:
+                os.close(dir_fd)
+
+        return dir_info, subdir_list, chunk_list
+
+    def _get_scan_options(self):
+        """
+        Returns the options which control the scanning of dirs (to be passed to background workers).
+
+        @retval options - dict, scan options
+        """
+        return {'stream': self._streaming, 'count_only': self._count_only}
+
+    def _set_scan_options(self, options):
+        """
+        Applies scan options as returned by "_get_scan_options".
+
+        @param options - dict, scan options
+        """
+        self._streaming = options.get('stream', False)
+        self._count_only = options.get('count_only', False)
+
+    def _scan_dir(self, parent_ref, dir_name, dir_path):
+        """
+        Opens the specified dir for iterating over its entries.
+        In dir-fd mode, the dir is opened relative to the file descriptor of the parent
+        dir if there is one. Falls back to opening by path if the limit of open file
+        descriptors has been reached: all kept dir file descriptors are closed then and
+        the number of kept descriptors is limited to half of them.
+
+        @param parent_ref - _DirRef object of the parent dir or None
+        @param dir_name - string, name of the dir (or path if there is no parent_ref)
+        @param dir_path - string, full path of the dir
+        @retval dir_iterator, dir_fd - os.scandir iterator over the dir entries and file
+            descriptor of the opened dir (None if the dir has been opened by path)
+        """
+        if self._throttle is not None:
+            self._throttle.acquire()
+
+        if self._use_dir_fd:
+            dir_fd = None
+            try:
+                if (parent_ref is not None) and (parent_ref.fd is not None):
+                    dir_fd = os.open(dir_name, _SUBDIR_OPEN_FLAGS, dir_fd=parent_ref.fd)
+                else:
+                    dir_fd = os.open(dir_path, _DIR_OPEN_FLAGS)
+                return os.scandir(dir_fd), dir_fd
+
+            except OSError as error:
+                if dir_fd is not None:
+                    os.close(dir_fd)
+                if error.errno not in (errno.EMFILE, errno.ENFILE):
+                    raise
+
+                # limit of open file descriptors reached  ->  release the kept dir descriptors, reduce their limit
+                logging.warning('Limit of open files reached with {} open dirs, falling back to opening dirs by path.'.format(len(self._dir_fd_refs)))
+                self._max_dir_fds = len(self._dir_fd_refs) // 2
+                while self._dir_fd_refs:
+                    dir_ref = self._dir_fd_refs.pop()
+                    os.close(dir_ref.fd)
+                    dir_ref.fd = None
+
+        return os.scandir(dir_path), None
+
+    def _release_dir_ref(self, dir_ref):
+        """
+        Notes that a queued subdir of the referenced dir has been taken from the dir list.
+        Closes the dir's file descriptor when no more subdirs refer to it.
+
+        @param dir_ref - _DirRef object or None
+        """
+        if dir_ref is None:
+            return
+
+        dir_ref.n_pending -= 1
+        if (dir_ref.n_pending <= 0) and (dir_ref.fd is not None):
+            os.close(dir_ref.fd)
+            dir_ref.fd = None
+            self._dir_fd_refs.discard(dir_ref)
+
+    def _clear_dir_list(self):
+        """
+        Empties the internal dir list (and chunk list), releases the dir references of their entries.
+        """
+        while self._dir_list:
+            self._release_dir_ref(self._dir_list.pop()[0])
+        while self._chunk_list:
+            self._release_dir_ref(self._chunk_list.pop()[0])
+
+    def _get_entry_dirs(self, entry):
+        """
+        Returns the container of the dir infos of the parent dir of a dir-list entry,
+        i.e. the container which the entry's dir info is part of.
+
+        @param entry - dir-list entry (parent _DirRef, dir name, dir-info object)
+        @retval dirs - dict, container of the parent's subdir infos (keys are dir names)
+        """
+        if entry[0] is None:
+            return self.base_dir_info['dirs']  # root dir of a multi-root analysis  ->  part of the virtual root dir
+        return entry[0].dirs
+
+    def _get_entry_path(self, entry):
+        """
+        Returns the full path of a dir-list entry.
+
+        @param entry - (parent _DirRef, dir name, dir-info object) triple
+        @retval dir_path - string, path of the dir
+        """
+        parent_ref, dir_name = entry[0], entry[1]
+        if parent_ref is None:
+            return dir_name
+        else:
+            return os.path.join(parent_ref.path, dir_name)
 
     def _create_info(self):
         """
@@ -434,121 +1855,47 @@ class Sizer:
 
         return dir_info
 
-    def _insert_info(self, dir_info, dir_path):
+    def _add_info(self, tree_info, dir_info):
         """
-        Inserts the specified dir-info object into the internal dir-info tree according
-        to the specified dir path.
+        Adds the file sizes & counts of a partial dir-info object (analysis result of a
+        file chunk) to a dir info of the internal dir-info tree.
 
-        @param dir_info - dir-info object (dict), dir info to insert
-        @param dir_path - string, path of the dir to which the dir info belongs
+        @param tree_info - dir-info object (dict), dir info in the info tree
+        @param dir_info - dir-info object (dict), partial dir info to add
         """
-        if dir_path == self.base_dir:
-            # specified dir path is the base dir  ->  store dir info as base info (i.e. tree root)
-            if self.base_dir_info is None:
-                self.base_dir_info = dir_info
-            else:
-                self._merge_info(self.base_dir_info, dir_info)
-
-        else:
-            # ensure that the root of the info tree exists
-            if self.base_dir_info is None:
-                self.base_dir_info = self._create_info()
+        tree_info['files_size'] += dir_info['files_size']   # add file sizes
+        tree_info['incomplete'] |= dir_info['incomplete']   # add incomplete flags
+        tree_info['file_count'] += dir_info['file_count']   # add file counters
 
-            # insert the dir info into the internal info tree
-            try:
-                # try using the internal cache, which holds the last inserted dir info
-                # (works if the analysis (caller) is working down a dir branch)
-                # reason is to speed things up
-                if not self._last_path or (len(dir_path) < len(self._last_path)):
-                    # last path is not yet set or current path too short to be a potential subdir
-                    # -> cache cannot be used
-                    raise ValueError
-
-                if dir_path[:len(self._last_path)] != self._last_path:
-                    # specified dir path is not a subdir of last path
-                    # -> cache cannot be used
-                    raise ValueError
-
-                # check if the specified dir is exactly a subdir of the last dir (and not e.g. a sub-subdir)
-                path_remainder = dir_path[len(self._last_path):].split(os.sep)     # split remainder of specified dir
-                path_remainder = [p for p in path_remainder if p]   # remove split "artifacts" (from initial or trailing slashes)
-                if len(path_remainder) != 1:
-                    # TODO: remove this condition? should work without
-                    # specified dir is a deeper-level subdir of last path
-                    # -> cache cannot be used
-                    raise ValueError
-
-                # cache check was positive  ->  use the cache
-                dir_list = path_remainder   # use subdir remainder as final dir list
-                parent_dir_info = self._last_info  # use cache's info object as parent object for insertion
-
-                self._last_counter[1] += 1     # just used for debugging info: count the cache "hits"
-
-            except ValueError:
-                # cache "miss"  ->  set insertion start at root of dir-info tree
-                dir_list = dir_path[len(self.base_dir):].split(os.sep)   # split path part after base-dir part into dir names
-                parent_dir_info = self.base_dir_info     # use base-dir info as starting point for insertion
-
-                self._last_counter[0] += 1     # just used for debugging info: count the cache "misses"
-
-
-            # locate the parent info object for the insertion of the specified dir info into the info tree,
-            # loop over list of subdir names leading to target dir
-            for dir_name in dir_list:
-                if not dir_name:    # skip path-splitting "artifacts" (from initial or trailing slashes)
-                    continue
-
-                # expand the tree branch if necessary (i.e. insert any missing info objects between
-                # the current tree-branch end and the dir info to insert)
-                if dir_name not in parent_dir_info['dirs']:
-                    parent_dir_info['dirs'][dir_name] = self._create_info()
-
-                # jump to the current subdir's info object
-                parent_dir_info = parent_dir_info['dirs'][dir_name]
-
-            # the actual insertion of the specified dir info into the info tree
-            self._merge_info(parent_dir_info, dir_info)
-
-            # update cache for poss. next insertion
-            self._last_path = dir_path
-            self._last_info = parent_dir_info
-
-    def _merge_info(self, dir_info_main, dir_info_add):
+    def _graft_info(self, tree_info, dir_info):
         """
-        Merges the dir_info_add object into the dir_info_main object.
+        Grafts the specified dir-info object into the internal dir-info tree by filling
+        the placeholder info object which was created for it in the tree (the "handle").
+        No path parsing or tree walking necessary.
 
-        @param dir_info_main - dir-info object (dict), dir info to update (merge into)
-        @param dir_info_add - dir-info object (dict), dir info to add to the main info
+        @param tree_info - dir-info object (dict), placeholder in the info tree
+        @param dir_info - dir-info object (dict), dir info to graft
         """
-        dir_info_main['files_size'] += dir_info_add['files_size']   # add file sizes
-        dir_info_main['incomplete'] |= dir_info_add['incomplete']   # add incomplete flags
-        dir_info_main['file_count'] += dir_info_add['file_count']   # add file counters
-
-        # merge the subdirs, i.e. the "dirs" part of the info objects
-        for subdir in dir_info_add['dirs']:
-            if subdir in dir_info_main['dirs']:
-                # recursively merge if current subdir is present in both info objects
-                self._merge_info(dir_info_main['dirs'][subdir], dir_info_add['dirs'][subdir])
-            else:
-                # new dir  ->  just copy over
-                dir_info_main['dirs'][subdir] = dir_info_add['dirs'][subdir]
+        tree_info.update(dir_info)
 
     def _sum_sizes(self, dir_info=None):
         """
-        Adds up the sizes of the specified dir-info object.
-        Recursively processes all subdir infos.
+        Adds up the sizes of the specified dir-info object and all its subdir infos.
+        Processes the info tree level by level from the bottom up (see "_sum_bottom_up").
 
         @param dir_info - [optional] DirInfo, info object (with complete subdir info),
             if not specified, the class' dir_info attribute will be used
         @retval size - float, summed size of the dir-info object
         """
         if dir_info is None:
-            # no info object specified (top-level call in the recursion)  ->  use base info
+            # no info object specified  ->  use base info
             dir_info = self.base_dir_info
 
-        # calculate the dir's size: sum the sizes of its subdirs and add sizes of files in the dir
-        subdirs_size = sum([self._sum_sizes(info) for info in dir_info['dirs'].values()])
-        dir_info['size'] = dir_info['files_size'] + subdirs_size
+        # calculate the dirs' sizes: sum the sizes of their subdirs and add sizes of files in the dirs
+        infos, names, parents, level_starts = _flatten_tree(dir_info)
+        sizes = _sum_bottom_up([info['files_size'] for info in infos], parents, level_starts)
+        for info, size in zip(infos, sizes):
+            info['size'] = size
 
         return dir_info['size']
 
@@ -560,23 +1907,40 @@ class Sizer:
         @param dir_info - DirInfo, info object (with subdir info)
         @retval incompleteness - bool, True if info is incomplete, False otherwise
         """
-        incompleteness = dir_info['incomplete']
-        if not incompleteness:
-            for info in dir_info['dirs'].values():
-                incompleteness = self._check_incompleteness(info)
-                if incompleteness:
-                    break
+        # walk the tree iteratively, stop at the first incomplete dir
+        pending_infos = [dir_info]
+        while pending_infos:
+            info = pending_infos.pop()
+            if info['incomplete']:
+                return True
+            pending_infos.extend(info['dirs'].values())
+
+        return False
 
-        return incompleteness
+    def _print_status(self, line, _quiet=False):
+        """
+        Prints a status line of an analysis (elapsed time, counts). In quiet mode, i.e. when embedded
+        in a service, the line is logged instead (level INFO), so that it doesn't clutter stdout.
+
+        @param line - string, status line
+        @param _quiet - [optional] bool, True for logging instead of printing
+        """
+        if _quiet:
+            logging.info(line.strip())
+        else:
+            print(line)
 
-    def _format_size(self, size, unit_indent=True):
+    def _format_size(self, size, unit_indent=True, unit=None):
         """
         Converts numerical size value into displayable string.
         Automatically determines which unit to use (B, kB, MB, GB etc.)
 
         @param size float
+        @param unit - [optional] string, unit of the size; default: self._size_unit (no unit in count-only mode)
         @retval size_string string
         """
+        if unit is None:
+            unit = self._size_unit
         # units = 'KMGTP'     # list of unit prefixes
 
         # determine order of magnitude of specified size
@@ -592,11 +1956,11 @@ class Sizer:
                 crab = ' ' * (order + 1)
             else:
                 crab = ' '
-            fish = '{{:.{:.0f}f}}{}{}B'.format(order+1, crab, self._units[order-1])
+            fish = '{{:.{:.0f}f}}{}{}{}'.format(order+1, crab, self._units[order-1], unit)
             fish = fish.format(size / math.pow(self._unit_scale, order))
         else:
             # no prefix required (size in Bytes)
-            fish = '{:.0f} B '.format(size)
+            fish = '{:.0f} {} '.format(size, unit)
 
         if unit_indent:
             fish += ' ' * (len(self._units) - order)
@@ -604,6 +1968,34 @@ class Sizer:
         return fish
 
 
+    def _format_estimate(self, dir_info):
+        """
+        Converts the confidence interval of an estimated dir size into a displayable string.
+
+        @param dir_info - dict, dir-info object
+        @retval estimate_string - string, half-width of the confidence interval ("± ..."), empty if the size is exact
+        """
+        half_width = self._estimates.get(id(dir_info))
+        if half_width is None:
+            return ''
+        return '   ± {}'.format(self._format_size(half_width, unit_indent=False).rstrip())
+
+    def _parse_size(self, size_string):
+        """
+        Converts a size string (with optional unit prefix, like displayed, e.g. "100G" or "1.5 TB")
+        into a numerical size value.
+
+        @param size_string - string
+        @retval size - float, size in Bytes
+        """
+        size_string = size_string.strip().rstrip('Bb').strip()
+        order = 0
+        if size_string and (size_string[-1].lower() in self._units.lower()):
+            order = self._units.lower().index(size_string[-1].lower()) + 1
+            size_string = size_string[:-1]
+
+        return float(size_string) * math.pow(self._unit_scale, order)
+
     def _get_counts(self, dir_info):
         """
         Determines the total numbers of directories and files in the directory
@@ -614,144 +2006,598 @@ class Sizer:
         @retval file_count, dir_count - (int, int) tuple, total number of files
             and total number of dirs
         """
-        file_count = dir_info['file_count'] # init file count with number of files in dir_info's dir
-        dir_count = len(dir_info['dirs'])   # init dir count with number of subdirs in dir_info's dir
+        file_count = 0
+        dir_count = -1  # (the dir itself is not counted)
 
-        # iterate down the dir hierarchy and add file & dir counts
-        for subdir_info in dir_info['dirs'].values():
-            sub_file_count, sub_dir_count = self._get_counts(subdir_info)   # subdir recursion
-            file_count += sub_file_count
-            dir_count += sub_dir_count
+        # walk the dir hierarchy iteratively and add file & dir counts
+        pending_infos = [dir_info]
+        while pending_infos:
+            info = pending_infos.pop()
+            file_count += info['file_count']
+            dir_count += 1
+            pending_infos.extend(info['dirs'].values())
 
         return file_count, dir_count
 
+    def save_snapshot(self, file_path):
+        """
+        Saves the analysis result of the current base dir to a file, so that a later
+        analysis of the same dir can use it for scheduling the work (see "load_snapshot").
 
+        @param file_path - string, path of the snapshot file
+        """
+        if self.base_dir_info is None:
+            raise SizerError('No analysis result to save.')
 
-#===========================================================================
-
+        with open(file_path, 'wb') as snapshot_file:
+            pickle.dump({'dir': self.base_dir, 'info': self.base_dir_info}, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
 
-class _BackgroundSizer(Sizer):
-    """
-    Wraps the "Sizer" class for usage in a seperate process.
-    Adds communication abilities.
-    Allows to run the sizer until a quit message is sent.
-    """
-    def __init__(self, connection, worker_id=None):
+    def load_snapshot(self, file_path):
         """
-        Initialisation.
+        Loads an analysis result saved by "save_snapshot" into the history of previous
+        analysis results. The result is not displayed, it is only used for scheduling the
+        work of later analyses of its dir (or subdirs): the biggest subtrees are handed out first.
 
-        @param connection - multiprocessing.Connection object
-        @param worker_id - [optional] arbitrary object to use as ID in any displayed messages
+        @param file_path - string, path of the snapshot file
         """
-        super().__init__()      # init base class
-        self.id = worker_id     # store worker ID
-        self._connection = connection   # store connection object (pipe end)
-        self.is_idle = True     # init idle flag
+        with open(file_path, 'rb') as snapshot_file:
+            snapshot = pickle.load(snapshot_file)
 
-    def run(self):
+        self._record_history(snapshot['dir'], snapshot['info'], reusable=False)
+
+    def _record_history(self, dir_path=None, dir_info=None, reusable=True):
         """
-        Main method of the class.
-        Handles messaging via the class' connection object:
-            - Receives "process" messages, which trigger the analysis of a dir
-            - Sends "done" messages when an analyis is finished
-            - Receives and responds to "share" messages, which allow to "source out"
-              a part of the current analysis
-            - Exits when "quit" message is received
+        Stores a (complete) analysis result in the history of previous analysis results (the cache).
+        Least recently used results are dropped when the total number of dirs exceeds "_cache_nodes".
+
+        @param dir_path - [optional] string, path of the analysed dir; default: current base dir
+        @param dir_info - [optional] dir-info object (dict) of the analysed dir; default: current base-dir info
+        @param reusable - [optional] bool, flag to allow re-using the result instead of a new analysis
+            (False: only used for scheduling, see "_get_weight_tree")
         """
-        time_start = datetime.datetime.now()    # init start time object (just for debugging / performance measurment)
+        if dir_path is None:
+            dir_path, dir_info = self.base_dir, self.base_dir_info
+
+        self._drop_history(dir_path)    # re-insert to mark the result as most recent
+        if reusable:
+            self._drop_covered_history(dir_path, dir_info)
+        self._history[dir_path] = dir_info
+        self._history_nodes[dir_path] = self._get_counts(dir_info)[1] + 1
+        if not reusable:
+            self._history_mtimes[dir_path] = None
+        elif self._validate_cache:
+            self._history_mtimes[dir_path] = self._get_top_mtimes(dir_path, dir_info)
+        else:
+            self._history_mtimes[dir_path] = {}     # nothing to validate
 
-        while True:     # main loop
+        while (len(self._history) > 1) and (sum(self._history_nodes.values()) > self._cache_nodes):
+            self._drop_history(next(iter(self._history)))   # drop the least recently used result
 
-            # define waiting time for messages depending on idleness
-            if self.is_idle:
-                polling_time = 0.2      # wait longer if idle
-            else:
-                polling_time = 0
+    def _drop_covered_history(self, dir_path, dir_info):
+        """
+        Removes the previous analysis results within a new analysis result from the history: they
+        are outdated, and the parts of them which have been re-used in the new analysis are part of
+        its info tree now (so their dirs would be counted twice). Of a previous multi-root result
+        which is covered partly, the covered root dirs are not counted anymore.
 
-            # check for and handle any messages
-            if self._connection.poll(polling_time):
+        @param dir_path - string, path of the analysed dir of the new result (or _VIRTUAL_ROOT)
+        @param dir_info - dir-info object (dict) of the analysed dir of the new result
+        """
+        roots = list(dir_info['dirs']) if dir_path == _VIRTUAL_ROOT else [dir_path]
+        is_covered = lambda path : any((path == root) or path.startswith(os.path.join(root, '')) for root in roots)
+
+        for history_path, history_info in list(self._history.items()):
+            if history_path != _VIRTUAL_ROOT:
+                if is_covered(history_path):
+                    self._drop_history(history_path)
+                continue
+
+            covered_roots = [root_path for root_path in history_info['dirs'] if is_covered(root_path)]
+            if len(covered_roots) == len(history_info['dirs']):
+                self._drop_history(history_path)
+            else:
+                for root_path in covered_roots:
+                    self._history_nodes[history_path] -= self._get_counts(history_info['dirs'][root_path])[1] + 1
 
-                message = self._connection.recv()      # fetch message from connection
+    def _drop_history(self, dir_path):
+        """
+        Removes an analysis result from the history of previous analysis results (if it is there).
 
-                #-------- quit request
-                if message['type'] == 'quit':
-                    return      # exit
+        @param dir_path - string, path of the analysed dir
+        """
+        self._history.pop(dir_path, None)
+        self._history_nodes.pop(dir_path, None)
+        self._history_mtimes.pop(dir_path, None)
 
-                #-------- request to analyse a dir
-                elif message['type'] == 'process':
-                    dir_path = message['dir']   # unpack requested dir from message
-                    dir_exclude_path = message['dir_exclude']   # unpack poss. dir to exclude from message
+    def _find_history(self, dir_path, reusable_only=False, skip=()):
+        """
+        Looks up the specified dir in the history of previous analysis results (the most recent
+        result containing the dir is used).
+
+        @param dir_path - string, path of the dir
+        @param reusable_only - [optional] bool, flag to ignore the results which are not re-usable
+        @param skip - [optional] container of strings, paths of the analysed dirs of results to ignore
+        @retval history_path, dir_info - path of the analysed dir of the result (key of the history) &
+            dir-info object of the specified dir; (None, None) if the dir is not in the history
+        """
+        for history_path, history_info in reversed(list(self._history.items())):
+            if reusable_only and (self._history_mtimes[history_path] is None):
+                continue
+            if history_path in skip:
+                continue
+
+            if history_path == _VIRTUAL_ROOT:
+                roots = history_info['dirs'].items()    # previous multi-root analysis  ->  look into each root dir
+            else:
+                roots = [(history_path, history_info)]
+
+            for root_path, root_info in roots:
+                prefix = os.path.join(root_path, '')    # root path with trailing slash
+                if dir_path == root_path:
+                    dir_info = root_info
+                elif dir_path.startswith(prefix):
+                    # walk down from the root of the previous result to the dir
+                    dir_info = root_info
+                    for dir_name in dir_path[len(prefix):].split(os.sep):
+                        dir_info = dir_info['dirs'].get(dir_name)
+                        if dir_info is None:
+                            break
+                else:
+                    continue
 
-                    if not self.is_idle:
-                        # a busy worker cannot be assigned to another dir
-                        raise WorkerError('Worker [{}] is currently busy. Could not assign worker to new dir "{}".'.format(self.id, dir_path))
+                if dir_info is not None:
+                    return history_path, dir_info
 
-                    # start analysis
-                    self.is_idle = False    # set state flag to busy
-                    self._set_base_dir(dir_path)   # set specified dir as new base dir
-                    time_start = datetime.datetime.now()    # just for performance info: note start time
+        return None, None
 
-                    # self._iterate_dir_list()    # perform a single analysis iteration to initialise the info tree
-                    # if self._dir_stock:
-                    #     # handle re-using of an existing info object
-                    #     self._insert_info(self._info_stock, self._dir_stock)    # insert the existing info object into the info tree
+    def _lookup_cache(self, dir_path):
+        """
+        Looks up the specified dir in the re-usable previous analysis results. If validation is enabled,
+        results in which the modification times of the dir or its top-level subdirs have changed since
+        are dropped. Results in which the dir lies below the validated levels are not used then (its
+        modifications can't be detected), unless they have been recorded without validation.
 
-                    self._dir_stock = dir_exclude_path
+        @param dir_path - string, path of the dir
+        @retval dir_info - dir-info object (dict) of the dir or None if there is no valid cached result
+        """
+        prefix = os.path.join(dir_path, '')     # dir path with trailing slash
+        too_deep = set()    # paths of the results in which the dir lies below the validated levels
+        while True:
+            history_path, dir_info = self._find_history(dir_path, reusable_only=True, skip=too_deep)
+            if history_path is None:
+                return None
+
+            mtimes = self._history_mtimes[history_path]
+            if mtimes and (dir_path not in mtimes):
+                logging.debug('Cached analysis result of {} not used for {}: dir is below the validated levels.'.format(history_path, dir_path))
+                too_deep.add(history_path)
+                continue
+
+            if all(self._get_mtime(path) == mtime for path, mtime in mtimes.items() if (path == dir_path) or path.startswith(prefix)):
+                self._history[history_path] = self._history.pop(history_path)   # mark the result as most recently used
+                return dir_info
+
+            logging.info('Dropping cached analysis result of {}: dirs have been modified.'.format(history_path))
+            self._drop_history(history_path)
+
+    def _select_stock(self, directory):
+        """
+        Selects the valid cached analysis results below the specified dir (or one of the specified dirs
+        of a multi-root analysis, including themselves) for re-use in its analysis (see "_dir_stock").
+        Larger results are preferred: a result within (or around) an already selected one is skipped.
 
+        @param directory - string, path of the dir; or list of strings, paths of several dirs
+        """
+        self._dir_stock = {}
+        if isinstance(directory, (list, tuple)):
+            roots = [os.path.abspath(root) for root in directory]
+            is_below = lambda path : any((path == root) or path.startswith(os.path.join(root, '')) for root in roots)     # the roots themselves count as well
+        else:
+            prefix = os.path.join(os.path.abspath(directory), '')
+            is_below = lambda path : path.startswith(prefix)
+
+        candidates = []     # (number of dirs, dir path) pairs
+        for history_path, history_info in self._history.items():
+            if self._history_mtimes[history_path] is None:
+                continue    # not re-usable
+            if history_path == _VIRTUAL_ROOT:
+                for root_path, root_info in history_info['dirs'].items():
+                    candidates.append((self._get_counts(root_info)[1] + 1, root_path))
+            else:
+                candidates.append((self._history_nodes[history_path], history_path))
 
-                #-------- request to hand over some of the dirs from the queue of the current analysis
-                elif message['type'] == 'share':
-                    if datetime.datetime.now() < message['expiration']:     # ignore request if it has expired
-                        if self.is_idle:
-                            # worker is idle  ->  nothing to share, send empty list
-                            # raise WorkerError('Worker [{}] is idle. Hand-over impossible.'.format(self.id))
-                            logging.warning('Worker [{}] is idle. Hand-over impossible.'.format(self.id))
-                            dir_list = []
-                        else:
-                            # worker is busy  ->  try to remove requested number of dirs from current analysis
-                            n_dirs = message['n_dirs']      # requested number of dirs
-                            if len(self._dir_list) > 1:
-                                split_index = max(1, (len(self._dir_list) - n_dirs))    # don't cut off more dirs than available
-                                dir_list = self._dir_list[split_index:]     # copy hand-over dirs from analysis queue
-                                self._dir_list = self._dir_list[:split_index]   # shorten analysis queue to remove hand-over dirs
-                            else:
-                                # worker has only a single dir in its analysis queue  ->  nothing to share, send empty list
-                                dir_list = []
+        for n_dirs, dir_path in sorted(candidates, reverse=True):
+            if not is_below(dir_path):
+                continue
+            if any(os.path.commonpath((dir_path, stock_path)) in (dir_path, stock_path) for stock_path in self._dir_stock):
+                continue    # overlaps with a selected (larger) result
 
-                        # finally hand over the dirs by sending back a share message with the dir list
-                        self._connection.send({'type': 'share', 'dirs': dir_list})
+            dir_info = self._lookup_cache(dir_path)
+            if dir_info is not None:
+                self._dir_stock[dir_path] = dir_info    # store dir info for re-usage
+                logging.info('Re-using cached analysis result of {}'.format(dir_path))
 
-                else:
-                    #---- unknown message type  ->  guru meditation
-                    raise WorkerError('Worker [{}]: Received unhandled message: "{}".'.format(worker.worker_id, message))
+    def _get_top_mtimes(self, dir_path, dir_info):
+        """
+        Determines the modification times of the top-level dirs of an analysis result, for validating
+        the result when it is re-used (a dir's modification time changes when entries are added, removed
+        or renamed in it).
+
+        @param dir_path - string, path of the analysed dir (or _VIRTUAL_ROOT)
+        @param dir_info - dir-info object (dict) of the analysed dir
+        @retval mtimes - dict, modification times (in ns, None if inaccessible) of the dirs of the top
+            "_cache_levels" levels, keys are dir paths
+        """
+        if dir_path == _VIRTUAL_ROOT:
+            level = list(dir_info['dirs'].items())  # the roots are the top level
+        else:
+            level = [(dir_path, dir_info)]
 
+        mtimes = {}
+        for i in range(self._cache_levels):
+            next_level = []
+            for path, info in level:
+                mtimes[path] = self._get_mtime(path)
+                next_level += [(os.path.join(path, name), subdir_info) for name, subdir_info in info['dirs'].items()]
+            level = next_level
 
-            # advance current analysis if there is any
-            if not self.is_idle:
-                # iterate analysis for a certain number of steps or until the list of dirs to analyse is empty
-                n_iterations = 20   # number of iteration steps to perform at most until next message checking
-                while n_iterations and self._dir_list:
-                    self._iterate_dir_list()
-                    n_iterations -= 1
+        return mtimes
 
-                # send results and signalise idleness if analyis is complete
-                if not self._dir_list:
-                    # # delete any existing, re-used info object
-                    # self._dir_stock = ''
-                    # self._info_stock = None
+    def _get_mtime(self, dir_path):
+        """
+        Determines the modification time of the specified dir.
+
+        @param dir_path - string, path of the dir
+        @retval mtime - int, modification time in ns; None if the dir cannot be accessed
+        """
+        try:
+            return os.stat(dir_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _record_scan(self):
+        """
+        Records the totals of the dirs of the current (complete) analysis result in the history
+        database, if there is one. Failures are logged only (the analysis result remains usable).
+        """
+        if (self._scan_history is None) or self._count_only:
+            return  # (count-only results have no sizes to record)
+
+        time_start = time.perf_counter()
+        try:
+            n_dirs = self._scan_history.record(self.base_dir, self.base_dir_info, self._roots, self._history_depth)
+        except sqlite3.Error as error:
+            logging.warning('Could not record the analysis in the scan history: {}'.format(error))
+            return
+        logging.info('Recorded {} dirs in the scan history, elapsed time: {:.2f} s'.format(n_dirs, time.perf_counter() - time_start))
+
+    def _get_weight_tree(self, dir_path):
+        """
+        Looks up the specified dir in the history of previous analysis results (the most recent
+        result containing the dir is used) and builds its weight tree.
+
+        @param dir_path - string, path of the dir (or _VIRTUAL_ROOT for the roots of the current multi-root analysis)
+        @retval weight_tree - weight tree of the dir (see "_build_weight_tree") or None if the dir is not in the history
+        """
+        if dir_path == _VIRTUAL_ROOT:
+            # virtual root dir  ->  combine the weight trees of the root dirs
+            subtrees = {root: self._get_weight_tree(root) for root in self._roots}
+            subtrees = {root: subtree for root, subtree in subtrees.items() if subtree is not None}
+            if not subtrees:
+                return None
+            return sum(subtree[0] for subtree in subtrees.values()) + len(self._roots), subtrees
+
+        history_path, dir_info = self._find_history(dir_path)
+        if dir_info is None:
+            return None
+
+        return self._build_weight_tree(dir_info)
+
+    def _build_weight_tree(self, dir_info):
+        """
+        Builds the weight tree of the specified dir info: the weight of a dir is its total number
+        of entries (files & dirs) below it, i.e. a measure for the time it takes to analyse it.
+        Only subtrees with at least "_min_weight" entries are noted (to keep the tree small enough
+        for sending it to the workers).
+        Processes the info tree level by level from the bottom up (see "_sum_bottom_up").
+
+        @param dir_info - dir-info object (dict) with complete subdir info
+        @retval weight_tree - (weight, subtrees) pair: int, number of entries of the dir & dict of
+            the subdirs' weight trees (keys are dir names)
+        """
+        infos, names, parents, level_starts = _flatten_tree(dir_info)
+        weights = _sum_bottom_up([info['file_count'] + len(info['dirs']) for info in infos], parents, level_starts)
+
+        # assemble the weight trees bottom-up
+        weight_trees = [(int(weight), {}) for weight in weights]
+        for node_id in range(len(weight_trees) - 1, 0, -1):
+            if weight_trees[node_id][0] >= self._min_weight:
+                weight_trees[parents[node_id]][1][names[node_id]] = weight_trees[node_id]
+
+        return weight_trees[0]
+
+    def _find_weight_tree(self, dir_path):
+        """
+        Fetches the weight tree of the specified dir from the weight tree of the base dir.
+
+        @param dir_path - string, path of the dir (the base dir or one of its subdirs)
+        @retval weight_tree - weight tree of the dir (see "_build_weight_tree") or None if unknown
+        """
+        weight_tree = self._weight_tree
+        dir_names = self._split_path(dir_path)
+        if (weight_tree is None) or (dir_names is None):
+            return None
+
+        for dir_name in dir_names:
+            weight_tree = weight_tree[1].get(dir_name)
+            if weight_tree is None:
+                break
+
+        return weight_tree
+
+    def _get_weight(self, dir_path):
+        """
+        Determines the weight (number of entries in a previous analysis) of the specified dir.
+
+        @param dir_path - string, path of the dir
+        @retval weight - int, weight of the dir; 0 if unknown (or below "_min_weight")
+        """
+        weight_tree = self._find_weight_tree(dir_path)
+        if weight_tree is None:
+            return 0
+        return weight_tree[0]
+
+
+
+#===========================================================================
+
+
+class _BackgroundSizer(Sizer):
+    """
+    Wraps the "Sizer" class for usage in a seperate process.
+    Adds communication abilities.
+    Allows to run the sizer until a quit message is sent.
+    """
+    def __init__(self, connection, worker_id=None):
+        """
+        Initialisation.
+
+        @param connection - multiprocessing.Connection object
+        @param worker_id - [optional] arbitrary object to use as ID in any displayed messages
+        """
+        super().__init__()      # init base class
+        self.id = worker_id     # store worker ID
+        self._connection = connection   # store connection object (pipe end)
+        self.is_idle = True     # init idle flag
+
+        self._handle = None     # init attribute for handle of the current task (node in the coordinator's info tree)
+        self._grafts = {}       # init dict of graft points for handed-over dirs & file chunks (keys are handles, see "run")
+        self._handle_counter = itertools.count()    # counter for creating unique handles for handed-over dirs
+        self._reused_stock = []     # init list of paths of the excluded dirs which have been encountered (see "_reuse_stock")
+        self._report_progress = False   # flag to report the number of analysed entries regularly (set per task by the coordinator)
+        self._progress_interval = 1.0   # time between progress reports (in seconds)
+        self._progress_time = 0.0   # init attribute for time of the last progress report
+        self._n_reported = 0    # number of analysed entries at the last progress report
+        self._time_slice = 0.005    # time to analyse dirs between checks for messages (in seconds)
+
+    def run(self):
+        """
+        Main method of the class.
+        Handles messaging via the class' connection object:
+            - Receives "process" messages, which trigger the analysis of a dir
+            - Sends "done" messages when an analyis is finished
+            - Receives and responds to "share" messages, which allow to "source out"
+              a part of the current analysis (the response carries the request's ID)
+            - Exits when "quit" message is received
+
+        Every analysed or handed-over dir carries a handle (unique ID). The "done" message
+        includes the handle of the analysed dir and the graft points of all handed-over
+        (or excluded) dirs, keyed by their handles. This allows the coordinator to graft
+        the result of each dir directly into its info tree.
+        Graft points of dirs are (container of the parent's subdir infos, dir name) pairs.
+        File chunks of huge dirs can be handed over as well ("process" messages with a
+        "files" list); their graft points are the infos of their dirs, to which the chunk
+        results are added.
+        If the "process" message includes the weight tree of the dir (entry counts of its
+        subtrees in a previous analysis), the biggest subtrees are handed over first.
+        """
+        time_start = datetime.datetime.now()    # init start time object (just for debugging / performance measurment)
+
+        while True:     # main loop
+
+            # define waiting time for messages depending on idleness
+            if self.is_idle:
+                polling_time = None     # wait for the next message if idle
+            else:
+                polling_time = 0
+
+            # check for and handle all pending messages (in a batch)
+            while self._connection.poll(polling_time):
+                polling_time = 0    # (further messages only if already pending)
+
+                message = self._connection.recv()      # fetch message from connection
+
+                #-------- quit request
+                if message['type'] == 'quit':
+                    return      # exit
+
+                #-------- request to analyse a dir
+                elif message['type'] == 'process':
+                    dir_path = message['dir']   # unpack requested dir from message
+                    dir_exclude = message['dir_exclude']    # unpack dirs to exclude from message (handles of their infos, keyed by path)
+                    self._handle = message['handle']    # unpack handle of requested dir
+                    self._set_scan_options(message['options'])  # unpack scan options
+                    weight_tree = message.get('weights')    # unpack poss. weight tree of requested dir
+                    self._report_progress = message.get('report_progress', False)     # unpack flag for progress reports
+
+                    if not self.is_idle:
+                        # a busy worker cannot be assigned to another dir
+                        raise WorkerError('Worker [{}] is currently busy. Could not assign worker to new dir "{}".'.format(self.id, dir_path))
+
+                    # start analysis
+                    self.is_idle = False    # set state flag to busy
+                    self._set_base_dir(dir_path)   # set specified dir as new base dir
+                    self._weight_tree = weight_tree
+                    self._grafts = {}   # clear graft points
+                    self._n_reported = self._n_analysed
+                    self._progress_time = time.perf_counter()
+                    if message.get('files') is not None:
+                        # file chunk of a huge dir  ->  only analyse the specified files
+                        chunk_ref = _DirRef(dir_path)
+                        chunk_ref.n_pending = 1
+                        self._dir_list = collections.deque()
+                        self._chunk_list = [(chunk_ref, message['files'], self.base_dir_info)]
+                    time_start = datetime.datetime.now()    # just for performance info: note start time
+
+                    self._dir_stock = dict(dir_exclude)
+                    self._reused_stock = []
+
+
+                #-------- request to hand over some of the dirs from the queue of the current analysis
+                elif message['type'] == 'share':
+                    # (the coordinator decides on the expiration of its requests, the clocks of remote agents may differ;
+                    # a late response is matched to its request by the echoed ID)
+                    if self.is_idle:
+                        # worker is idle  ->  nothing to share, send empty list
+                        # raise WorkerError('Worker [{}] is idle. Hand-over impossible.'.format(self.id))
+                        logging.warning('Worker [{}] is idle. Hand-over impossible.'.format(self.id))
+                        dir_list = []
+                    else:
+                        # worker is busy  ->  try to remove requested number of dirs from current analysis
+                        n_dirs = message['n_dirs']      # requested number of dirs
+                        dir_list = []   # hand-over list, entries are (dir path, handle, file names) triples
+
+                        # hand over file chunks of huge dirs first (not in streaming mode: a dir's record comprises all its files)
+                        while self._chunk_list and (len(dir_list) < n_dirs) and not self._streaming:
+                            dir_ref, file_names, tree_info = self._chunk_list.pop()
+                            handle = (self.id, next(self._handle_counter))
+                            self._grafts[handle] = tree_info
+                            dir_list.append((dir_ref.path, handle, file_names))
+                            self._release_dir_ref(dir_ref)
+
+                        if (len(self._dir_list) > 1) and (len(dir_list) < n_dirs):
+                            n_share = min(n_dirs - len(dir_list), len(self._dir_list) - 1)  # don't cut off more dirs than available
+                            if self._weight_tree is not None:
+                                # weights of a previous analysis are known  ->  hand over the biggest subtrees (longest
+                                # processing time first) of all dirs but the first, prefer the tail for equal weights (sorting is stable)
+                                entries = list(self._dir_list)
+                                share_indices = sorted(range(len(entries) - 1, 0, -1), key=lambda index: self._get_weight(self._get_entry_path(entries[index])), reverse=True)
+                                share_indices = set(share_indices[:n_share])
+                                share_entries = [entries[index] for index in sorted(share_indices)]
+                                self._dir_list = collections.deque(entry for index, entry in enumerate(entries) if index not in share_indices)   # remove hand-over dirs from analysis queue
+                            else:
+                                # no weights  ->  hand over the tail of the queue (remove the hand-over dirs from it)
+                                share_entries = [self._dir_list.pop() for i in range(n_share)][::-1]
+
+                            for entry in share_entries:
+                                # create a handle for each hand-over dir, keep its place in the parent dir as graft point
+                                handle = (self.id, next(self._handle_counter))
+                                self._grafts[handle] = (self._get_entry_dirs(entry), entry[1])
+                                dir_list.append((self._get_entry_path(entry), handle, None))
+                                self._release_dir_ref(entry[0])
+
+                    # finally hand over the dirs by sending back a share message with the dir list
+                    self._connection.send({'type': 'share', 'id': message.get('id'), 'dirs': dir_list})
+
+                else:
+                    #---- unknown message type  ->  guru meditation
+                    raise WorkerError('Worker [{}]: Received unhandled message: "{}".'.format(worker.worker_id, message))
+
+
+            # advance current analysis if there is any
+            if not self.is_idle:
+                # iterate analysis for a time slice or until the list of dirs to analyse is empty
+                # (messages are checked after each slice, independent of how fast the dirs are analysed)
+                slice_end = time.perf_counter() + self._time_slice
+                while self._dir_list or self._chunk_list:
+                    self._iterate_dir_list()
+                    if time.perf_counter() >= slice_end:
+                        break
+
+                # streaming mode: send the records of the analysed dirs
+                if self._records:
+                    self._connection.send({'type': 'records', 'records': list(self._records)})
+                    self._records.clear()
+
+                # report the progress if requested (for measuring the throughput during long tasks)
+                if self._report_progress and (self._dir_list or self._chunk_list) and (time.perf_counter() - self._progress_time >= self._progress_interval):
+                    self._connection.send({'type': 'progress', 'n_entries': self._n_analysed - self._n_reported})
+                    self._n_reported = self._n_analysed
+                    self._progress_time = time.perf_counter()
+
+                # send results and signalise idleness if analyis is complete
+                if not (self._dir_list or self._chunk_list):
+                    # # delete any existing, re-used info object
+                    # self._dir_stock = {}
 
                     time_end = datetime.datetime.now()  # just for performance info: note end time
 
                     # print('===== worker [{}]: analysis finished'.format(self.id))
                     # print('===== elapsed time: ', str(time_end - time_start))
-                    # print('===== insertion cache: {} hits, {} misses'.format(self._last_counter[1], self._last_counter[0]))
-                    self._last_counter = [0, 0]    # just for debugging/info: init counters for insertion cache misses & hits
 
                     # finally propagate the analysis result
-                    self._connection.send({'type': 'done', 'info': self.base_dir_info, 'dir': self.base_dir, 'dir_exclude': self._dir_stock})
+                    # (info tree and graft points are sent together, thus the graft points still refer to the tree's objects at the receiver)
+                    message = {'type': 'done', 'info': self.base_dir_info, 'dir': self.base_dir, 'handle': self._handle,
+                               'grafts': self._grafts, 'reused': self._reused_stock,
+                               'n_entries': self._n_analysed - self._n_reported}     # entries since the last progress report
+                    self._connection.send(message)
+                    self._grafts = {}
 
                     self.is_idle = True     # set worker state to idle
 
+    def _reuse_stock(self, entry, stock):
+        """
+        Overloaded from base class.
+        The info object to re-use is held by the coordinator, so the place of the dir is
+        just registered as graft point (under the info's handle).
+
+        @param entry - dir-list entry of the dir info to re-use
+        @param stock - handle of the dir info to re-use (value of "_dir_stock")
+        """
+        self._grafts[stock] = (self._get_entry_dirs(entry), entry[1])
+        self._reused_stock.append(self._get_entry_path(entry))
+
+
+class _RemoteWorker:
+    """
+    Counterpart of a worker agent which is connected via a socket (see "run_worker_agent"),
+    used by the MultiSizer like a local worker process: provides the parts of the
+    multiprocessing.Process interface which are used for the local workers.
+    """
+    def __init__(self, connection):
+        """
+        Initialisation.
+
+        @param connection - multiprocessing.connection.Connection object (accepted socket connection)
+        """
+        self.connection = connection    # store connection object (socket)
+
+    def is_alive(self):
+        """
+        Checks whether the connection to the worker agent is still open.
+
+        @retval alive - bool, True if the connection is open, False otherwise
+        """
+        return not self.connection.closed
+
+    def start(self):
+        """
+        Nothing to start: the worker agent is already running.
+        """
+        pass
+
+    def join(self, timeout=None):
+        """
+        Nothing to wait for: the worker agent keeps running after it quits its work for this coordinator.
+        """
+        pass
+
+    def terminate(self):
+        """
+        Closes the connection to the worker agent.
+        """
+        self.connection.close()
+
 
 class MultiSizer(Sizer):
     """
@@ -760,315 +2606,1629 @@ class MultiSizer(Sizer):
     Performs the size analysis for a specified directory and displays the results.
     Runs the analysis in background processes to distribute and speed up the work.
     Can/should be used as a context manager for automatic clean-up of background processes.
+
+    Optionally, worker agents on other hosts (see "run_worker_agent") can join the analysis
+    via socket connections: the MultiSizer listens on the specified address, the agents
+    connect to it and authenticate with the shared authentication key. Remote and local
+    workers speak the same protocol. Tasks of lost workers are re-queued.
+    """
+    def __init__(self, n_workers=None, address=None, authkey=None,
+                 max_ops=None, niceness=None, io_class=None, autotune=False, min_workers=1, max_workers=None, autotune_file=None,
+                 history_db=None, history_depth=3, cache_nodes=1000000, validate_cache=True, count_only=False):
+        """
+        Initialisation.
+
+        @param n_workers - [optional] int, number of local worker processes to start for an analysis;
+            default: multiprocessing.cpu_count(), or 0 if an address to listen on is specified
+        @param address - [optional] (host, port) tuple, address to listen on for worker agents
+        @param authkey - [optional] bytes, authentication key of the worker agents (required with address)
+        @param max_ops - [optional] float, max. number of file-system operations (dir openings & stat calls)
+            per second of all local workers together (they share a token bucket); default: unlimited
+        @param niceness - [optional] int, niceness increment of the local worker processes
+        @param io_class - [optional] string, I/O scheduling class of the local worker processes, "idle" or
+            "best-effort" (see "_set_process_priority")
+        @param autotune - [optional] bool, flag to adapt the number of local workers during an analysis (see
+            "_tune_workers"); the best number is saved per file system and used as start value next time
+        @param min_workers, max_workers - [optional] int, bounds of the number of local workers for the autotuning;
+            default max.: 4 * multiprocessing.cpu_count()
+        @param autotune_file - [optional] string, path of the file for saving the tuned numbers of workers;
+            default: ~/.dirhunter_autotune.json
+        @param history_db, history_depth - [optional] database for recording the dir totals of each analysis, see Sizer
+        @param cache_nodes, validate_cache - [optional] cache of previous analysis results, see Sizer
+        @param count_only - [optional] bool, flag for the count-only mode (the workers count entries only), see Sizer
+        """
+        super().__init__(max_ops=max_ops, history_db=history_db, history_depth=history_depth,
+                         cache_nodes=cache_nodes, validate_cache=validate_cache, count_only=count_only)  # init Sizer (base class), the token bucket is handed to the local workers
+        self._workers = []  # init list of background workers
+        self._n_workers = n_workers     # number of local workers
+        self._worker_counter = itertools.count()    # counter for creating unique worker IDs (IDs are part of the handles)
+        self._task_queue = collections.deque()  # init queue of tasks ("process" messages) waiting for an idle worker
+        self._task_failures = {}    # init dict of counters of lost workers per task (keys are handles)
+        self._max_task_failures = 3     # max. number of lost workers per task before the analysis is cancelled
+        self._share_request_timeout = 5.0   # time span after which an unanswered share request expires (in seconds)
+        self._niceness = niceness   # niceness increment of the local workers
+        self._io_class = io_class   # I/O scheduling class of the local workers
+
+        self._autotune = autotune   # flag for adapting the number of local workers during an analysis
+        self._min_workers = min_workers     # min. number of local workers for the autotuning
+        self._max_workers = max_workers or 4 * multiprocessing.cpu_count()     # max. number of local workers for the autotuning
+        self._autotune_file = autotune_file or os.path.join(os.path.expanduser('~'), '.dirhunter_autotune.json')
+        self._tune_interval = 5.0   # time span of a throughput measurement, i.e. between adaptations (in seconds)
+        self._max_saturation = 0.8  # max. fraction of time the coordinator may spend on handling results before workers are removed
+        self._tuning = None     # init attribute for the state of the autotuning (see "_tune_workers")
+        self._n_retiring = 0    # number of local workers to stop as soon as they are idle
+        self._retired_workers = []  # init list of local workers which have been told to quit (autotuning) but not reaped yet
+
+        self._track_progress = False    # flag to let the workers report their progress regularly (counted in "_n_analysed")
+
+        self._stream_queue = None   # init attribute for the queue handing record batches over to the consumer in streaming mode
+        self._stream_queue_size = 100   # max. number of record batches in the queue (a slow consumer slows the analysis down)
+        self._stream_error = None   # init attribute for an exception raised by the analysis in streaming mode
+
+        self._listener = None   # init attribute for the listener for worker agents
+        self._new_connections = queue.Queue()   # init queue of connections of newly joined worker agents
+        if address is not None:
+            if not authkey:
+                raise SizerError('An authentication key is required for accepting worker agents.')
+            self._listener = multiprocessing.connection.Listener(address, authkey=authkey)
+            threading.Thread(target=self._accept_agents, daemon=True).start()
+            logging.info('Accepting worker agents on {}:{}.'.format(*self._listener.address))
+
+        self._handles = {}  # init dict of graft points in the info tree (keys are handles, see _BackgroundSizer.run)
+        self._root_dirs = {}    # init container for the root of the info tree (graft point of the base dir)
+        self._orphans = {}  # init dict of results whose graft point is not yet known (keys are handles, values are dir infos)
+        self._handle_counter = itertools.count()    # counter for creating unique handles
+
+    def __del__(self):
+        """
+        Deconstruction.
+        Stops any running background workers.
+        """
+        self._stop_workers()
+        self._close_listener()
+        # super().__del__()
+
+    def __enter__(self):
+        """
+        Context-manager initialisation:
+        Nothing special here, just returns itself.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Context-manager exit:
+        Stops any running background workers.
+        Passes any exception.
+        """
+        self._stop_workers()    # stop workers
+        self._close_listener()  # stop accepting worker agents
+        return False        # signalise to raise any exception
+
+    def _init_worker(self, worker, worker_id, connection):
+        """
+        Sets the attributes of a worker which are used by the coordinator.
+
+        @param worker - multiprocessing.Process or _RemoteWorker object
+        @param worker_id - arbitrary object, used as identifier in any messages (debug, error, etc.)
+        @param connection - multiprocessing.Connection object, coordinator's end of the connection to the worker
+        @retval worker - the specified worker, with added attributes
+        """
+        worker.worker_id = worker_id    # store ID (used in any messages)
+        worker.connection = connection     # store one end of the communication pipe/socket
+        worker.is_idle = True   # set flag for indicating whether worker is idle
+        worker.task = None      # set attribute for the current task ("process" message), re-queued if the worker is lost
+        worker.task_count = 0   # set info counter for number of accomplished tasks
+        worker.task_weight = 0  # set estimated number of entries of the current task (see "_run")
+
+        return worker
+
+    def _create_worker(self, worker_id):
+        """
+        Creates a new worker: a process prepared to run a _BackgroundSizer.
+
+        @param worker_id - arbitrary object, used as identifier in any messages (debug, error, etc.)
+            and as part of the handles created by the worker (must be unique)
+        @retval worker - multiprocessing.Process object with added attributes
+        """
+        # create pipe for communication with worker process
+        connection_here, connection_there = multiprocessing.Pipe()
+
+        # create a new worker
+        worker = multiprocessing.Process(target=_worker_main, args=(connection_there, worker_id, self._throttle, self._niceness, self._io_class))
+
+        # set worker attributes
+        self._init_worker(worker, worker_id, connection_here)
+        # worker.start()
+
+        return worker
+
+    def _start_workers(self, n_workers=None):
+        """
+        Starts the background workers, i.e. the local worker processes, and adds the worker
+        agents which have joined meanwhile.
+
+        @param n_workers - [optional] int, number of local workers to start, default: see "__init__"
+        """
+        self._stop_workers()    # stop any running workers at first
+
+        if n_workers is None:
+            n_workers = self._n_workers
+        if (n_workers is None) and self._autotune and (self._listener is None):
+            # start with the number of workers tuned for the file system in a previous analysis
+            n_workers = self._load_worker_count()
+        if n_workers is None:
+            if self._listener is not None:
+                # worker agents only
+                n_workers = 0
+            else:
+                # number of workers not specified  ->  use number of processors/cores
+                try:
+                    n_workers = multiprocessing.cpu_count()
+                except:
+                    n_workers = 2
+
+        if self._autotune:
+            n_workers = min(max(n_workers, self._min_workers), self._max_workers)
+            self._tuning = {'time': time.perf_counter(), 'entries': 0, 'busy': 0.0, 'idle': 0.0, 'rate': None, 'change': 0,
+                            'best_rate': 0.0, 'best_n_workers': n_workers, 'sample_time': time.perf_counter()}
+        self._n_retiring = 0
+
+        # create & start the workers
+        for i in range(n_workers):
+            self._start_local_worker()
+
+        self._add_agents()
+
+    def _start_local_worker(self):
+        """
+        Creates and starts a new local worker process.
+
+        @retval worker - multiprocessing.Process object as created by "_create_worker"
+        """
+        worker = self._create_worker(next(self._worker_counter))     # create new worker
+        worker.start()      # start the worker's process
+        self._workers.append(worker)    # store worker in internal list
+        logging.debug('Started background worker [{}].'.format(worker.worker_id))
+
+        return worker
+
+    def _get_local_workers(self):
+        """
+        Returns the local worker processes (i.e. not the worker agents).
+
+        @retval local_workers - list of multiprocessing.Process objects as created by "_create_worker"
+        """
+        return [worker for worker in self._workers if not isinstance(worker, _RemoteWorker)]
+
+    def _retire_workers(self):
+        """
+        Stops idle local workers as long as workers are to be removed (see "_tune_workers").
+        The workers are told to quit without waiting for them (which would stall the coordinator),
+        they are reaped by later calls once they have ended (the remaining ones by "_stop_workers").
+        """
+        # reap the retired workers which have ended meanwhile
+        for worker in [worker for worker in self._retired_workers if not worker.is_alive()]:
+            self._retired_workers.remove(worker)
+            worker.join()   # (returns at once, the process has ended)
+            logging.debug('Stopped background worker [{}] (autotuning), task count: {}.'.format(worker.worker_id, worker.task_count))
+
+        for worker in self._get_idle_workers():
+            if self._n_retiring <= 0:
+                break
+            if isinstance(worker, _RemoteWorker):
+                continue
+
+            self._workers.remove(worker)
+            self._n_retiring -= 1
+            try:
+                worker.connection.send({'type': 'quit'})
+            except OSError:
+                pass    # connection already lost
+            self._retired_workers.append(worker)
+
+    def _tune_workers(self):
+        """
+        Adapts the number of local workers to the measured throughput (autotuning), once per measurement
+        time span (see "__init__"), by hill climbing:
+            - If the coordinator has been busy handling results for most of the time, it is the bottleneck:
+              workers are removed.
+            - If the number has been changed after the previous measurement, the change is evaluated: if
+              the throughput (analysed entries per second) has improved noticeably, the number is changed
+              further in the same direction; otherwise the change is reverted (added workers which don't
+              help are not worth their costs).
+            - Otherwise, more workers are tried if the workers have been busy for most of the time (more workers
+              can't help if they are waiting for work).
+        The number is changed by a quarter (at least 1), within the bounds. Removed workers are stopped
+        as soon as they are idle.
+        """
+        tuning = self._tuning
+        now = time.perf_counter()
+        elapsed = now - tuning['time']
+        if elapsed < self._tune_interval:
+            return
+
+        rate = tuning['entries'] / elapsed
+        saturation = tuning['busy'] / elapsed
+        idleness = tuning['idle'] / elapsed
+        if rate > tuning['best_rate']:
+            tuning['best_rate'] = rate
+            tuning['best_n_workers'] = len(self._get_local_workers())   # (including workers to be removed, they still work)
+
+        change = tuning['change']
+        reverting = False
+        if saturation > self._max_saturation:
+            direction = -1      # coordinator saturated
+        elif change and (rate >= 1.1 * tuning['rate']):
+            direction = change      # the last change has helped  ->  continue
+        elif change:
+            direction = -change     # the last change has not helped  ->  revert
+            reverting = True
+        else:
+            direction = 1 if idleness < 0.5 else 0     # try more workers if the workers have had work
+
+        n_workers = len(self._get_local_workers()) - self._n_retiring
+        new_n_workers = min(max(n_workers + direction * max(1, n_workers // 4), self._min_workers), self._max_workers)
+        if new_n_workers > n_workers:
+            n_cancelled = min(self._n_retiring, new_n_workers - n_workers)     # keep workers which were to be removed
+            self._n_retiring -= n_cancelled
+            for i in range(new_n_workers - n_workers - n_cancelled):
+                self._start_local_worker()
+        elif new_n_workers < n_workers:
+            self._n_retiring += n_workers - new_n_workers
+        logging.info('Autotuning: {:.0f} entries/s, coordinator {:.0%} busy, workers {:.0%} idle  ->  {} workers'.format(rate, saturation, idleness, new_n_workers))
+
+        # note the change for evaluating it after the next measurement (not reversions and forced removals)
+        tuning['change'] = 0 if (reverting or (saturation > self._max_saturation) or (new_n_workers == n_workers)) else direction
+        tuning.update({'time': now, 'entries': 0, 'busy': 0.0, 'idle': 0.0, 'rate': rate})
+
+    def _load_worker_count(self):
+        """
+        Looks up the tuned number of local workers for the file system of the base dir (see "_save_worker_count").
+
+        @retval n_workers - int, number of workers, None if not known
+        """
+        try:
+            with open(self._autotune_file) as tuning_file:
+                worker_counts = json.load(tuning_file)
+        except (OSError, ValueError):
+            return None
+
+        entry = worker_counts.get(_get_filesystem_id(self._roots[0] if self._roots else self.base_dir))
+        return None if entry is None else entry['workers']
+
+    def _save_worker_count(self):
+        """
+        Saves the number of local workers with the best throughput of the last analysis for the file system
+        of the base dir, if the analysis has lasted long enough for measuring the throughput.
+        """
+        if (self._tuning is None) or (self._tuning['best_rate'] <= 0):
+            return
+
+        try:
+            with open(self._autotune_file) as tuning_file:
+                worker_counts = json.load(tuning_file)
+        except (OSError, ValueError):
+            worker_counts = {}
+
+        worker_counts[_get_filesystem_id(self._roots[0] if self._roots else self.base_dir)] = {
+            'workers': self._tuning['best_n_workers'], 'rate': round(self._tuning['best_rate']),
+            'time': datetime.datetime.now().isoformat(timespec='seconds')}
+        try:
+            temp_path = self._autotune_file + '.tmp'
+            with open(temp_path, 'w') as tuning_file:
+                json.dump(worker_counts, tuning_file, indent=2, sort_keys=True)
+            os.replace(temp_path, self._autotune_file)
+        except OSError as error:
+            logging.warning('Could not save the tuned number of workers: {}'.format(error))
+
+    def _stop_workers(self):
+        """
+        Stops (ends) any running background workers.
+        Worker agents are only told to quit their current work, they can join again.
+        """
+        # send quit signal
+        for worker in self._workers:
+            if worker.is_alive():
+                try:
+                    worker.connection.send({'type': 'quit'})
+                except OSError:
+                    pass    # connection already lost
+
+        # ensure workers have quit, terminate if still running
+        while self._workers:
+            worker = self._workers.pop()
+            if worker.is_alive():
+                worker.join(3)
+                worker.terminate()
+
+            logging.debug('Stopped background worker [{}], task count: {}.'.format(worker.worker_id, worker.task_count))
+
+        # ensure retired workers (autotuning) have quit as well
+        while self._retired_workers:
+            worker = self._retired_workers.pop()
+            worker.join(3)
+            worker.terminate()
+            logging.debug('Stopped background worker [{}] (autotuning), task count: {}.'.format(worker.worker_id, worker.task_count))
+
+        self._task_queue.clear()    # the tasks of an interrupted analysis are obsolete
+
+    def _close_listener(self):
+        """
+        Stops accepting worker agents, closes the connections of agents which have not been added yet.
+        """
+        if self._listener is not None:
+            self._listener.close()      # ends the accepting thread
+            self._listener = None
+
+        while not self._new_connections.empty():
+            self._new_connections.get().close()
+
+    def _accept_agents(self):
+        """
+        Accepts connections of worker agents (run in a thread as long as the listener is open).
+        The connections are authenticated and then queued until they are added as workers.
+        """
+        listener = self._listener
+        while True:
+            try:
+                connection = listener.accept()
+            except multiprocessing.AuthenticationError:
+                logging.warning('Rejected worker agent from {}: authentication failed.'.format(listener.last_accepted))
+                continue
+            except OSError:
+                return      # listener has been closed
+
+            logging.debug('Worker agent connected from {}.'.format(listener.last_accepted))
+            self._new_connections.put(connection)
+
+    def _add_agents(self):
+        """
+        Adds the worker agents which have joined since the last call as (idle) workers.
+        """
+        while not self._new_connections.empty():
+            connection = self._new_connections.get()
+            worker = _RemoteWorker(connection)
+            self._init_worker(worker, next(self._worker_counter), connection)
+            self._workers.append(worker)
+            logging.debug('Added worker agent [{}].'.format(worker.worker_id))
+
+    def _drop_worker(self, worker):
+        """
+        Removes a lost worker (crashed process or lost connection). Its current task is
+        re-queued; a lost local worker is replaced by a new one.
+
+        @param worker - worker object (see "_init_worker")
+        @retval success - bool, False if the task of the worker has been lost too often
+            (the analysis has to be cancelled), True otherwise
+        """
+        self._workers.remove(worker)
+        worker.terminate()
+
+        if isinstance(worker, _RemoteWorker):
+            logging.warning('Lost connection to worker agent [{}].'.format(worker.worker_id))
+        else:
+            logging.warning('Worker [{}] has terminated unexpectedly.'.format(worker.worker_id))
+            self._start_local_worker()
+
+        task = worker.task
+        if task is not None:
+            n_failures = self._task_failures.get(task['handle'], 0) + 1
+            self._task_failures[task['handle']] = n_failures
+            if n_failures >= self._max_task_failures:
+                logging.error('Lost {} workers on dir {}. Cancelling analysis.'.format(n_failures, task['dir']))
+                return False
+
+            # re-queue the task (update the dirs to exclude, dir infos to re-use may have been handed out meanwhile)
+            # results of dirs which the lost worker has handed over remain orphans, the task covers them again
+            task['dir_exclude'] = dict(self._dir_stock)
+            self._task_queue.appendleft(task)
+            logging.info('Re-queued dir {}.'.format(task['dir']))
+
+        return True
+
+    def _assign_tasks(self):
+        """
+        Assigns the queued tasks to idle workers.
+        """
+        for worker in self._get_idle_workers():
+            if not self._task_queue:
+                break
+
+            task = self._task_queue.popleft()
+            task['report_progress'] = (self._tuning is not None) or self._track_progress     # progress reports for the autotuning (or AsyncSizer)
+            try:
+                worker.connection.send(task)
+            except OSError:
+                self._task_queue.appendleft(task)   # worker has been lost, it is dropped when checking its messages
+                continue
+
+            worker.is_idle = False
+            worker.task = task
+            worker.task_weight = 0 if task.get('weights') is None else task['weights'][0]
+            file_names = task.get('files')
+            logging.debug('Worker [{}] assigned to dir: {}{}'.format(worker.worker_id, task['dir'], '' if file_names is None else ' ({} files)'.format(len(file_names))))
+
+    def _get_busy_workers(self):
+        """
+        Returns the workers which are currently busy (i.e. running an analysis).
+
+        @retval busy_workers - list of multiprocessing.Process objects as create by "_create_worker"
+        """
+        return [worker for worker in self._workers if not worker.is_idle]
+
+    def _get_idle_workers(self):
+        """
+        Returns the workers which are currently idle.
+
+        @retval busy_workers - list of multiprocessing.Process objects as create by "_create_worker"
+        """
+        return [worker for worker in self._workers if worker.is_idle]
+
+    def _run(self):
+        """
+        Main analysis loop.
+        Handles the distribution of work.
+        Returns when the analysis is complete.
+
+        @retval success - bool, True if the analysis is complete, False if it had to be cancelled
+        """
+        # init the analysis if necessary
+        if not (self._get_busy_workers() or self._task_queue):
+            # all workers idle  ->  set up the graft points: the base dir's handle refers to the root of
+            # the info tree, the dir infos to re-use are kept as "orphans" until their graft points are known
+            # (the workers get their handles instead of them)
+            self._handles = {}
+            self._orphans = {}
+            self._root_dirs = {}
+            self._task_failures = {}
+            handle = ('coordinator', next(self._handle_counter))
+            self._handles[handle] = (self._root_dirs, self.base_dir)
+            for dir_path, dir_info in list(self._dir_stock.items()):
+                stock_handle = ('coordinator', next(self._handle_counter))
+                self._orphans[stock_handle] = dir_info
+                self._dir_stock[dir_path] = stock_handle
+
+            # look up the base dir in the history of previous analyses: the entry counts of its subtrees
+            # are used to hand out the biggest subtrees first
+            self._weight_tree = self._get_weight_tree(self.base_dir)
+
+            # queue the base dir (for the first idle worker)
+            self._task_queue.append({'type': 'process', 'dir': self._get_base_dirs(), 'handle': handle, 'files': None,
+                                     'dir_exclude': dict(self._dir_stock),
+                                     'options': self._get_scan_options(), 'weights': self._weight_tree})
+
+        # prepare the sharing/hand-over mechanism:
+        # - only a single share request can be active at a time
+        # - define a time span after which a share request expires to avoid waiting infinitely
+        #   for a response to a share request (see "_share_request_timeout"); only the coordinator decides on the expiration (on its
+        #   monotonic clock), since the clocks of worker agents on other hosts may differ
+        # - requests carry an ID, which the workers echo in their responses: a late response to an
+        #   expired request is recognised as such, its dirs are queued nevertheless (the worker has
+        #   removed them from its analysis)
+        share_request_counter = itertools.count()   # counter for unique share-request IDs
+        pending_share_request = None    # set current share request to none
+        waiting_for_workers = False     # flag to log waiting for (remote) workers only once
+
+        # main loop: iterate until all workers are idle and no tasks are queued
+        while self._get_busy_workers() or self._task_queue:
+
+            if self._scan_stop.is_set():
+                # analysis cancelled (streaming consumer has stopped)
+                return False
+
+            self._add_agents()      # add any newly joined worker agents
+
+            for worker in list(self._workers):
+                # check if current worker is running
+                if not worker.is_alive():
+                    # worker has crashed (or its connection is lost)  ->  re-queue its task
+                    lost_worker = worker
+                else:
+                    lost_worker = None
+                    try:
+                        # current worker: check for and handle any messages
+                        while worker.connection.poll():
+                            handling_start = time.perf_counter()    # (for measuring the coordinator's saturation)
+                            message = worker.connection.recv()      # fetch message from connection
+
+                            if message['type'] == 'done':
+                                #---- worker has finished analysis
+                                dir_path = message['dir']   # fetch analysed path
+                                dir_info = message['info']      # fetch analysis result
+                                self._graft_result(message['handle'], dir_info, message['grafts'])     # graft analysis result into common info tree
+                                worker.is_idle = True       # set worker status to signalise idle
+                                worker.task = None
+                                worker.task_weight = 0
+                                worker.task_count += 1      # increase counter for accomplished missions
+                                logging.debug('Worker [{}] finished dir: {}'.format(worker.worker_id, dir_path))
+                                # logging.debug('Inserted beneath {}: {}'.format(dir_path, ', '.join(dir_info['dirs'].keys())))
+                                for reused_path in message['reused']:
+                                    self._dir_stock.pop(reused_path, None)  # dir infos the worker has encountered (grafted via their handles)
+                                self._n_analysed += message.get('n_entries', 0)
+                                if self._tuning is not None:
+                                    self._tuning['entries'] += message.get('n_entries', 0)
+
+                            elif message['type'] == 'share':
+                                #---- worker shares (hands over) dirs from its analysis queue
+                                logging.debug('Share response from worker [{}]: dirs={}'.format(worker.worker_id, message['dirs']))
+                                if (pending_share_request is not None) and (message.get('id') == pending_share_request['id']):
+                                    pending_share_request = None    # response to the pending request  ->  delete it (to permit handling of a new request)
+                                else:
+                                    logging.debug('Late response from worker [{}] to expired share request {}.'.format(worker.worker_id, message.get('id')))
+
+                                dir_list = message['dirs']      # fetch list of dirs to share/distribute, entries are (dir path, handle, file names) triples
+                                for dir_path, handle, file_names in list(dir_list):
+                                    if (dir_path in self._dir_stock) and (file_names is None):
+                                        # dir info to re-use is handed over  ->  re-use it under the dir's handle instead of distributing the dir
+                                        dir_list.remove((dir_path, handle, file_names))
+                                        self._orphans[handle] = self._orphans.pop(self._dir_stock.pop(dir_path))
+                                        logging.debug('Analysis re-use: Skipping dir: {}'.format(dir_path))
+
+                                for dir_path, handle, file_names in dir_list:
+                                    # queue the dir (or file chunk) for a currently idle worker, pass the dir's weight tree
+                                    weight_tree = self._find_weight_tree(dir_path) if file_names is None else None
+                                    self._task_queue.append({'type': 'process', 'dir': dir_path, 'handle': handle, 'files': file_names,
+                                                             'dir_exclude': dict(self._dir_stock),
+                                                             'options': self._get_scan_options(), 'weights': weight_tree})
+                                    if weight_tree is not None:
+                                        worker.task_weight = max(0, worker.task_weight - weight_tree[0])    # the sharing worker's remaining task shrinks
+
+                            elif message['type'] == 'records':
+                                #---- worker sends the records of analysed dirs (streaming mode)  ->  hand them over to the consumer
+                                self._stream_queue.put(message['records'])
+
+                            elif message['type'] == 'progress':
+                                #---- worker reports its progress (number of entries analysed since the last report)
+                                self._n_analysed += message['n_entries']
+                                if self._tuning is not None:
+                                    self._tuning['entries'] += message['n_entries']
+
+                            else:
+                                #---- unknown message type  ->  guru meditation
+                                raise TypeError('Unhandled message "{}" received from worker process [{}]'.format(message, worker.worker_id))
+
+                            if self._tuning is not None:
+                                self._tuning['busy'] += time.perf_counter() - handling_start
+
+                    except (EOFError, OSError):
+                        # connection lost  ->  re-queue the worker's task
+                        lost_worker = worker
+
+                if lost_worker is not None:
+                    if not self._drop_worker(lost_worker):
+                        return False
+                    if pending_share_request and (pending_share_request['worker'] == lost_worker.worker_id):
+                        pending_share_request = None    # no response to expect
+
+            # autotuning: note the share of idle workers (time-weighted), adapt the number of local workers to the measured throughput
+            if self._tuning is not None:
+                now = time.perf_counter()
+                if self._workers:
+                    self._tuning['idle'] += (now - self._tuning['sample_time']) * len(self._get_idle_workers()) / len(self._workers)
+                self._tuning['sample_time'] = now
+                self._tune_workers()
+                self._retire_workers()
+
+            # assign the queued tasks (dirs handed over by busy workers or of lost workers) to idle workers
+            self._assign_tasks()
+
+            if self._task_queue and not self._workers:
+                # no workers at all (worker agents only)  ->  wait for agents to join
+                if not waiting_for_workers:
+                    logging.warning('No workers available, waiting for worker agents to join.')
+                    waiting_for_workers = True
+                time.sleep(1)
+                continue
+            waiting_for_workers = False
+
+            # share-request management: if there are idle workers, a share request will be sent to the
+            # busy worker with the biggest (estimated) remaining task for sharing some work to employ the
+            # idle workers; without weights of a previous analysis this is the first busy worker;
+            # however, only a single share request is handled in general (queueing not considered usefull)
+            idle_workers = self._get_idle_workers()     # get list of idle workers (= number of dirs to request)
+            if idle_workers and not pending_share_request:      # there are idle workers and no pending share request
+                busy_workers = self._get_busy_workers()     # get list of busy workers
+                if busy_workers:
+                    # prepare a share request with an expiration time and send it to the chosen busy worker
+                    sharing_worker = max(busy_workers, key=lambda busy_worker: busy_worker.task_weight)
+                    pending_share_request = {'id': next(share_request_counter), 'n_dirs': len(idle_workers),
+                                             'expiration': time.monotonic() + self._share_request_timeout,
+                                             'worker': sharing_worker.worker_id}
+                    try:
+                        sharing_worker.connection.send({'type': 'share', 'id': pending_share_request['id'],
+                                                        'n_dirs': pending_share_request['n_dirs']})    # send share request to current worker
+                        logging.debug('Sent share request to worker [{}]: {} dirs'.format(sharing_worker.worker_id, pending_share_request['n_dirs']))
+                    except OSError:
+                        pending_share_request = None    # worker has been lost, it is dropped when checking its messages
+
+
+            # main loop (not worker loop): if there is a pending share request, check if it has expired
+            if pending_share_request and (time.monotonic() > pending_share_request['expiration']):
+                # expiration time of the share request has passed  ->  discard it (a late response is still handled)
+                logging.debug('Discarding expired share request to worker [{}] ({} dirs)'.format(pending_share_request['worker'], pending_share_request['n_dirs']))
+                pending_share_request = None    # delete share request
+
+            # check whether all workers are busy and wait a bit (or until a worker sends a message) before the next iteration if so
+            idle_workers = self._get_idle_workers()
+            if not idle_workers:
+                multiprocessing.connection.wait([worker.connection for worker in self._workers], timeout=1)
+
+        if self._handles or self._orphans:
+            logging.warning('Analysis finished with {} unresolved graft points and {} orphaned results.'.format(len(self._handles), len(self._orphans)))
+
+        self.base_dir_info = self._root_dirs[self.base_dir]     # fetch the root of the info tree
+
+        # final step: return True to signalise successfull analysis
+        return True
+
+    def _graft_result(self, handle, dir_info, grafts):
+        """
+        Grafts a worker's analysis result into the common info tree.
+        The result is put into the graft point registered for its handle; if the graft point
+        is not yet known (i.e. the result of the parent dir is still pending), the result is
+        kept as orphan until then. The graft points within the result (of dirs or file chunks
+        handed over by the worker) are registered or, if their results are already available,
+        filled.
+
+        @param handle - handle of the analysed dir (or file chunk)
+        @param dir_info - dir-info object (dict), analysis result
+        @param grafts - dict, graft points within the analysis result (keys are handles)
+        """
+        graft_point = self._handles.pop(handle, None)
+        if graft_point is None:
+            self._orphans[handle] = dir_info    # graft point not yet known  ->  keep as orphan
+        else:
+            self._graft_at(graft_point, dir_info)
+
+        for graft_handle, graft_point in grafts.items():
+            if graft_handle in self._orphans:
+                self._graft_at(graft_point, self._orphans.pop(graft_handle))
+            else:
+                self._handles[graft_handle] = graft_point
+
+    def _graft_at(self, graft_point, dir_info):
+        """
+        Grafts a dir-info object into the info tree at the specified graft point.
+
+        @param graft_point - (container of subdir infos, dir name) pair for a dir, which is put into
+            the container; or dir-info object for a file chunk, to which the chunk result is added
+        @param dir_info - dir-info object (dict), analysis result of the dir or file chunk
+        """
+        if isinstance(graft_point, tuple):
+            dirs, dir_name = graft_point
+            dirs[dir_name] = dir_info
+        else:
+            self._add_info(graft_point, dir_info)
+
+
+    def _set_dir(self, directory=None, _quiet=False):
+        """
+        Sets the directory to analyse and starts the analysis.
+
+        @param directory - [optional] string, path of directory to analyse; if not specified,
+            the currently set base dir will be used
+        @param _quiet - [optional] bool, True to not display the results and to log the status lines
+            instead of printing them (e.g. in the server)
+        """
+        time_start = datetime.datetime.now()    # record start time (just for debugging/info)
+
+        if directory:
+            self._set_base_dir(directory)     # set specified dir in main sizer object
+
+        self._start_workers()   # start the background workers
+        success = self._run()             # perform the analysis
+        self._stop_workers()    # stop the background workers
+
+        if success:
+            if self._autotune:
+                self._save_worker_count()   # start with the best number of workers next time
+
+            # delete any existing, re-used info object
+            self._dir_stock = {}
+
+            self._sum_sizes()     # calculate all directories' sizes
+            self._record_history()
+            self._record_scan()
+
+            time_end = datetime.datetime.now()      # record end time (just for debugging/info)
+            self._print_status('===== elapsed time:  {}'.format(time_end - time_start), _quiet)
+            self._print_status('===== total count: {} files, {} dirs]\n'.format(*self._get_counts(self.base_dir_info)), _quiet)
+
+            self.cdi(_quiet=_quiet)    # prepare for subdir changes, poss. display the results
+        else:
+            self.base_dir = None
+            self.base_dir_info = None
+            # raise SizerError('')
+
+    def iter_scan(self, directory):
+        """
+        Overloaded from base class.
+        The workers send the records of their dirs in batches, the coordinator runs in a background thread
+        and hands them over through a bounded queue (so a slow consumer slows the analysis down instead of
+        piling up records). In streaming mode, file chunks of huge dirs are not handed over between workers.
+        If a worker is lost, the records of its task may be emitted twice.
+
+        @param directory - string, path of the dir to analyse; or list of strings, paths of several dirs
+        @retval records - generator of dicts, dir records (see Sizer.iter_scan)
+        """
+        self._dir_stock = {}
+        self._set_base_dir(directory)
+        self._streaming = True
+        self._stream_queue = queue.Queue(maxsize=self._stream_queue_size)
+        self._stream_error = None
+        stream_thread = threading.Thread(target=self._stream_background, daemon=True)
+        stream_thread.start()
+        try:
+            while True:
+                records = self._stream_queue.get()
+                if records is None:
+                    break   # analysis finished (or failed)
+                yield from records
+            if self._stream_error is not None:
+                raise self._stream_error
+        finally:
+            # stop a still running analysis, keep emptying the queue until the thread is done
+            self._scan_stop.set()
+            while stream_thread.is_alive():
+                try:
+                    self._stream_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            stream_thread.join()
+            self._scan_stop.clear()
+            self._stream_queue = None
+            self._end_stream()
+
+    def _stream_background(self):
+        """
+        Runs the analysis in streaming mode (in a background thread, see "iter_scan"), signalises its
+        end by putting None into the stream queue.
+        """
+        try:
+            self._start_workers()
+            self._run()
+        except Exception as error:
+            self._stream_error = error
+        finally:
+            self._stop_workers()
+            self._stream_queue.put(None)
+
+    def _analyse_base_dir(self, _quiet=False):
+        """
+        Overloaded from base class.
+        Basically just raises a SizerError to signalise that a (new) background-multiprocess
+        analysis needs to be started.
+        (This class does not perform any analysis itself but distributes the task to background workers.)
+        """
+        # raise SizerError to signalise that (new) background-multiprocess analysis needs to be started
+        raise SizerError
+
+    def cd(self, directory=None, _quiet=False):
+        """
+        Overloaded from base class.
+        Changes to the specified directory and displays its info.
+
+        @param directory - [optional] string, path of the dir to analyse;
+            if not specified, changes to current base directory
+        """
+        try:
+            # call the base class' "cd" method
+            # (works if the specified dir is a subdir of the base dir)
+            super().cd(directory=directory, _quiet=_quiet)
+
+        except SizerError:
+            # SizerError signalises that specified dir is not a subdir of the base dir
+            # -> trigger new analysis
+            self._set_dir(_quiet=_quiet)
+
+
+def _worker_main(connection, worker_id, throttle=None, niceness=None, io_class=None):
+    """
+    Function which is passed to the multiprocessing.Process object to run a background sizer.
+
+    @param connection - multiprocessing.Connection object
+    @param worker_id - arbitrary object to use as ID in any displayed messages
+    @param throttle - [optional] _TokenBucket object, rate limiter for file-system operations (shared by the workers)
+    @param niceness - [optional] int, niceness increment of the process
+    @param io_class - [optional] string, I/O scheduling class of the process (see "_set_process_priority")
+    """
+    _set_process_priority(niceness, io_class)
+    sizer = _BackgroundSizer(connection, worker_id)     # create the background-sizer object
+    sizer._throttle = throttle
+    sizer.run()     # run the sizer
+
+
+def run_worker_agent(address, authkey, reconnect_delay=5.0, max_ops=None, niceness=None, io_class=None):
+    """
+    Runs a worker agent: connects to a MultiSizer which listens on the specified address and
+    works for it like a local worker process. The dirs to analyse must be accessible under the
+    same paths as on the coordinator's host.
+    When the MultiSizer's analysis is finished or the connection is lost, the agent connects
+    again (to join the next analysis), until it is interrupted.
+    The agent cannot share the token bucket of the MultiSizer's local workers, it is throttled
+    on its own (by the specified rate).
+
+    @param address - (host, port) tuple, address of the MultiSizer
+    @param authkey - bytes, authentication key (as specified for the MultiSizer)
+    @param reconnect_delay - [optional] float, time to wait before connecting again after a failure (in seconds)
+    @param max_ops - [optional] float, max. number of file-system operations per second of the agent; default: unlimited
+    @param niceness - [optional] int, niceness increment of the agent process
+    @param io_class - [optional] string, I/O scheduling class of the agent process (see "_set_process_priority")
+    """
+    _set_process_priority(niceness, io_class)
+    throttle = _TokenBucket(max_ops) if max_ops else None
+    connection_counter = itertools.count()  # counter for unique worker IDs (IDs are part of the handles)
+    while True:
+        try:
+            connection = multiprocessing.connection.Client(address, authkey=authkey)
+        except multiprocessing.AuthenticationError:
+            logging.error('Authentication at {}:{} failed.'.format(*address))
+            return
+        except OSError:
+            # coordinator not (yet) listening  ->  try again later
+            time.sleep(reconnect_delay)
+            continue
+
+        worker_id = '{}:{}/{}'.format(socket.gethostname(), os.getpid(), next(connection_counter))
+        logging.info('Worker agent [{}] connected to {}:{}.'.format(worker_id, *address))
+        try:
+            _worker_main(connection, worker_id, throttle)
+        except (EOFError, OSError):
+            logging.warning('Worker agent [{}] lost connection to {}:{}.'.format(worker_id, *address))
+            time.sleep(reconnect_delay)
+        finally:
+            connection.close()
+
+
+def _parse_address(address):
+    """
+    Converts a "host:port" string into an address for socket connections.
+
+    @param address - string, "host:port"
+    @retval address - (host, port) tuple
+    """
+    host, _, port = address.rpartition(':')
+    return (host or 'localhost', int(port))
+
+
+#===========================================================================
+
+
+class TreeIndex:
+    """
+    Read-only index of an analysed info tree for answering queries quickly.
+
+    The dirs are numbered in breadth-first order (the children of a dir are consecutive and
+    come after it), their attributes are kept in flat lists (indexed by these numbers).
+    The aggregates of each dir (total size & counts, incompleteness of the subtree) and the
+    order of its subdirs by size are precomputed, so looking up a dir takes O(depth) and
+    listing its k biggest subdirs O(k).
+    For searching dirs ("find"), all dirs sorted by size, a map of dir names to dirs and the
+    pre-order numbers of the dirs (a subtree is a range of pre-order numbers) are precomputed.
+    """
+    def __init__(self, base_dir, base_dir_info, roots=None):
+        """
+        Initialisation: builds the index.
+
+        @param base_dir - string, path of the base dir (or _VIRTUAL_ROOT)
+        @param base_dir_info - dir-info object (dict) of the base dir, with complete subdir info
+        @param roots - [optional] list of strings, paths of the root dirs of a multi-root analysis
+        """
+        self.base_dir = base_dir
+        self._roots = roots
+
+        # number the dirs in breadth-first order
+        self._infos, self._names, self._parents, level_starts = _flatten_tree(base_dir_info)     # dir-info objects, names, numbers of parent dirs
+        self._names[0] = base_dir
+        self._node_ids = {id(dir_info): node_id for node_id, dir_info in enumerate(self._infos)}    # numbers of the dirs, keys are the IDs of their info objects
+        self._depths = []   # dir levels below the base dir
+        for level in range(len(level_starts) - 1):
+            self._depths += [level] * (level_starts[level + 1] - level_starts[level])
+        self._first_children = [len(self._infos)] * len(self._infos)    # numbers of the first subdirs
+        for node_id in range(len(self._infos) - 1, 0, -1):
+            self._first_children[self._parents[node_id]] = node_id
+
+        # aggregate bottom-up (see "_sum_bottom_up")
+        parents = self._parents
+        if (numpy is not None) and (len(self._infos) >= _NUMPY_MIN_LEVEL_WIDTH * (len(level_starts) - 1)):
+            parents = numpy.array(parents)  # (convert once for all aggregates)
+        self._sizes = _sum_bottom_up([dir_info['files_size'] for dir_info in self._infos], parents, level_starts)   # total sizes
+        self._file_counts = _sum_bottom_up([dir_info['file_count'] for dir_info in self._infos], parents, level_starts)   # total numbers of files
+        self._dir_counts = [dir_count - 1 for dir_count in _sum_bottom_up([1] * len(self._infos), parents, level_starts)]   # total numbers of dirs
+        self._incomplete = [n_incomplete > 0 for n_incomplete in _sum_bottom_up([int(dir_info['incomplete']) for dir_info in self._infos], parents, level_starts)]   # incompleteness of the subtrees
+
+        # sort the subdirs of each dir by size
+        self._sorted_children = {}  # numbers of the subdirs sorted by size (descending), keys are the dirs' numbers
+        for node_id, dir_info in enumerate(self._infos):
+            if dir_info['dirs']:
+                first_child = self._first_children[node_id]
+                self._sorted_children[node_id] = sorted(range(first_child, first_child + len(dir_info['dirs'])),
+                                                        key=self._sizes.__getitem__, reverse=True)
+
+        # search indexes: all dirs sorted by size, dirs by name (sorted by size), pre-order numbers
+        self._size_order = sorted(range(len(self._infos)), key=self._sizes.__getitem__, reverse=True)
+        self._size_keys = [-self._sizes[node_id] for node_id in self._size_order]    # negated sizes (ascending, for bisecting)
+        self._name_map = {}     # lists of numbers of dirs, keys are dir names
+        for node_id in self._size_order:
+            self._name_map.setdefault(self._names[node_id], []).append(node_id)
+        self._preorder = [0] * len(self._infos)     # pre-order numbers (the subtree of a dir has the range [number, number + dir count])
+        stack = [0]
+        preorder = 0
+        while stack:
+            node_id = stack.pop()
+            self._preorder[node_id] = preorder
+            preorder += 1
+            first_child = self._first_children[node_id]
+            stack.extend(range(first_child + len(self._infos[node_id]['dirs']) - 1, first_child - 1, -1))
+
+    def __len__(self):
+        """
+        Returns the number of dirs in the index.
+        """
+        return len(self._infos)
+
+    def lookup(self, dir_path):
+        """
+        Determines the number of the specified dir in the index.
+
+        @param dir_path - string, full path of the dir
+        @retval node_id - int, number of the dir; None if the dir is not in the index
+        """
+        dir_names = _split_path(self.base_dir, self._roots, dir_path)
+        if dir_names is None:
+            return None
+
+        dir_info = self._infos[0]
+        for dir_name in dir_names:
+            dir_info = dir_info['dirs'].get(dir_name)
+            if dir_info is None:
+                return None
+
+        return self._node_ids[id(dir_info)]
+
+    def get_path(self, node_id):
+        """
+        Assembles the full path of a dir in the index.
+
+        @param node_id - int, number of the dir
+        @retval dir_path - string, full path of the dir
+        """
+        dir_names = []
+        while node_id >= 0:
+            dir_names.append(self._names[node_id])
+            node_id = self._parents[node_id]
+
+        return os.path.join(*reversed(dir_names))   # (root dirs of a multi-root analysis are absolute paths and replace the virtual root)
+
+    def get_summary(self, node_id):
+        """
+        Assembles the precomputed aggregates of a dir in the index.
+
+        @param node_id - int, number of the dir
+        @retval summary - dict, keys: 'path', 'size', 'files_size', 'file_count', 'dir_count', 'depth', 'incomplete'
+        """
+        return {'path': self.get_path(node_id), 'size': self._sizes[node_id],
+                'files_size': self._infos[node_id]['files_size'], 'file_count': self._file_counts[node_id],
+                'dir_count': self._dir_counts[node_id], 'depth': self._depths[node_id], 'incomplete': self._incomplete[node_id]}
+
+    def get_children(self, node_id, n=None):
+        """
+        Determines the biggest subdirs of a dir in the index.
+
+        @param node_id - int, number of the dir
+        @param n - [optional] int, max. number of subdirs; default: all
+        @retval children - list of ints, numbers of the subdirs, sorted by size (descending)
+        """
+        return self._sorted_children.get(node_id, [])[:n]
+
+    def find(self, dir_path=None, name=None, min_size=None, max_size=None, min_files=None, max_files=None,
+             min_dirs=None, max_dirs=None, min_depth=None, max_depth=None, incomplete=None, limit=None):
+        """
+        Searches the dirs matching all specified predicates (unspecified predicates match any dir).
+        The candidates are taken from the size index (range of sizes) or the name index (whichever
+        yields fewer), the other predicates are checked for the candidates only.
+
+        @param dir_path - [optional] string, full path of the dir to search in (including the dir itself); default: base dir
+        @param name - [optional] string, shell-style pattern (see fnmatch) for the dir names
+        @param min_size, max_size - [optional] float, range of the total dir size (in bytes)
+        @param min_files, max_files - [optional] int, range of the total number of files
+        @param min_dirs, max_dirs - [optional] int, range of the total number of subdirs
+        @param min_depth, max_depth - [optional] int, range of the dir level below the dir to search in
+        @param incomplete - [optional] bool, required incompleteness of the subtree
+        @param limit - [optional] int, max. number of results; default: all
+        @retval node_ids - list of ints, numbers of the matching dirs, sorted by size (descending)
+        """
+        root_id = 0 if dir_path is None else self.lookup(dir_path)
+        if root_id is None:
+            return []
+
+        # candidates from the size index: range of the size-sorted dirs
+        start = 0 if max_size is None else bisect.bisect_left(self._size_keys, -max_size)
+        end = len(self._size_keys) if min_size is None else bisect.bisect_right(self._size_keys, -min_size)
+        candidates = (self._size_order[index] for index in range(start, end))
+        n_candidates = max(0, end - start)
+
+        if name is not None:
+            # candidates from the name index: names are matched once, not per dir
+            if any(char in name for char in '*?['):
+                node_lists = [self._name_map[dir_name] for dir_name in fnmatch.filter(self._name_map, name)]
+            else:
+                node_lists = [self._name_map.get(name, [])]
+            if sum(len(node_list) for node_list in node_lists) < n_candidates:
+                candidates = heapq.merge(*node_lists, key=self._sizes.__getitem__, reverse=True)
+                name = None     # all candidates match
+
+        # check the predicates for the candidates (which come sorted by size)
+        root_start = self._preorder[root_id]
+        root_end = root_start + self._dir_counts[root_id]
+        root_depth = self._depths[root_id]
+        name_match = None if name is None else re.compile(fnmatch.translate(name)).match
+        node_ids = []
+        for node_id in candidates:
+            if not (root_start <= self._preorder[node_id] <= root_end):
+                continue
+            if ((min_size is not None) and (self._sizes[node_id] < min_size)) or ((max_size is not None) and (self._sizes[node_id] > max_size)):
+                continue
+            if (name_match is not None) and not name_match(self._names[node_id]):
+                continue
+            if ((min_files is not None) and (self._file_counts[node_id] < min_files)) or ((max_files is not None) and (self._file_counts[node_id] > max_files)):
+                continue
+            if ((min_dirs is not None) and (self._dir_counts[node_id] < min_dirs)) or ((max_dirs is not None) and (self._dir_counts[node_id] > max_dirs)):
+                continue
+            depth = self._depths[node_id] - root_depth
+            if ((min_depth is not None) and (depth < min_depth)) or ((max_depth is not None) and (depth > max_depth)):
+                continue
+            if (incomplete is not None) and (self._incomplete[node_id] != incomplete):
+                continue
+
+            node_ids.append(node_id)
+            if len(node_ids) == limit:
+                break
+
+        return node_ids
+
+
+def _growth_rate(times, sizes):
+    """
+    Determines the growth rate of a size over time by a least-squares fit.
+
+    @param times - list of floats, times (in seconds)
+    @param sizes - list of numbers, sizes at these times
+    @retval rate - float, growth per second; None if there are less than two different times
+    """
+    if len(times) < 2:
+        return None
+    mean_time = sum(times) / len(times)
+    mean_size = sum(sizes) / len(sizes)
+    variance = sum((t - mean_time) ** 2 for t in times)
+    if variance <= 0:
+        return None
+    return sum((t - mean_time) * (size - mean_size) for t, size in zip(times, sizes)) / variance
+
+
+class ScanHistory:
+    """
+    History of analysis results in a SQLite database, for following the growth of dirs over time
+    without keeping full snapshots: for each complete analysis, the totals (size, counts,
+    incompleteness) of the dirs down to a certain depth are recorded.
+
+    Table "scans" has a row per recorded analysis (time, base dir), table "dirs" a row per dir and
+    analysis, indexed by path & time (for the trend of a dir) and by parent path & time (for the
+    trends of the subdirs of a dir). The rows of an analysis are inserted in a single transaction.
+    Each method opens its own connection, so the object can be used from several threads.
     """
-    def __init__(self):
+    def __init__(self, db_path):
         """
-        Initialisation.
-        """
-        super().__init__()  # init Sizer (base class)
-        self._workers = []  # init list of background workers
+        Initialisation: creates the database (tables & indexes) if it does not exist yet.
 
-    def __del__(self):
+        @param db_path - string, path of the database file
         """
-        Deconstruction.
-        Stops any running background workers.
+        if sqlite3 is None:
+            raise DirHunterError('Scan history not available: Python has been built without sqlite3.')
+
+        self.db_path = db_path
+        with self._connect() as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS scans (id INTEGER PRIMARY KEY, time REAL NOT NULL, base_dir TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS dirs (scan_id INTEGER NOT NULL REFERENCES scans(id), time REAL NOT NULL,
+                                                 path TEXT NOT NULL, parent TEXT, size REAL NOT NULL, file_count INTEGER NOT NULL,
+                                                 dir_count INTEGER NOT NULL, incomplete INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS dirs_path_time ON dirs (path, time);
+                CREATE INDEX IF NOT EXISTS dirs_parent_time ON dirs (parent, time);
+                """)
+
+    def _connect(self):
         """
-        self._stop_workers()
-        # super().__del__()
+        Opens a connection to the database (to be used as context manager, closes the connection).
 
-    def __enter__(self):
-        """
-        Context-manager initialisation:
-        Nothing special here, just returns itself.
+        @retval connection - sqlite3.Connection object, wrapped by contextlib.closing
         """
-        return self
+        return contextlib.closing(sqlite3.connect(self.db_path, timeout=60))
 
-    def __exit__(self, exc_type, exc_value, traceback):
+    def record(self, base_dir, base_dir_info, roots=None, max_depth=3, scan_time=None):
         """
-        Context-manager exit:
-        Stops any running background workers.
-        Passes any exception.
+        Records the totals of the dirs of an analysis result down to the specified depth.
+        The totals are aggregated over the whole tree level by level (see "_sum_bottom_up"), the
+        rows are inserted at once (executemany) in a single transaction.
+        In a multi-root analysis, the root dirs are recorded (at depth 0), not the virtual root dir.
+
+        @param base_dir - string, path of the base dir (or _VIRTUAL_ROOT)
+        @param base_dir_info - dir-info object (dict) of the base dir, with complete subdir info and summed sizes
+        @param roots - [optional] list of strings, paths of the root dirs of a multi-root analysis
+        @param max_depth - [optional] int, max. depth (below the base dir or the root dirs) of the recorded dirs
+        @param scan_time - [optional] float, time of the analysis (seconds since the epoch); default: now
+        @retval n_dirs - int, number of recorded dirs
         """
-        self._stop_workers()    # stop workers
-        return False        # signalise to raise any exception
+        if scan_time is None:
+            scan_time = time.time()
+
+        # aggregate the counts & incompleteness of all dirs (sizes are summed already)
+        infos, names, parents, level_starts = _flatten_tree(base_dir_info)
+        file_counts = _sum_bottom_up([dir_info['file_count'] for dir_info in infos], parents, level_starts)
+        dir_counts = _sum_bottom_up([1] * len(infos), parents, level_starts)
+        incomplete = _sum_bottom_up([int(dir_info['incomplete']) for dir_info in infos], parents, level_starts)
+
+        # assemble the rows of the dirs down to the max. depth (the levels below are not needed)
+        first_id = 1 if base_dir == _VIRTUAL_ROOT else 0    # (skip the virtual root dir)
+        end_level = min(len(level_starts) - 1, max_depth + 1 + first_id)
+        paths = [base_dir] + [None] * (level_starts[end_level] - 1)
+        rows = []
+        for node_id in range(level_starts[end_level]):
+            if node_id > 0:
+                paths[node_id] = os.path.join(paths[parents[node_id]], names[node_id])  # (root dirs: full paths)
+            if node_id >= first_id:
+                parent = paths[parents[node_id]] if parents[node_id] >= first_id else None
+                rows.append((scan_time, paths[node_id], parent, infos[node_id]['size'], file_counts[node_id],
+                             dir_counts[node_id] - 1, int(incomplete[node_id] > 0)))
+
+        with self._connect() as connection, connection:
+            scan_id = connection.execute('INSERT INTO scans (time, base_dir) VALUES (?, ?)',
+                                         (scan_time, base_dir if roots is None else os.pathsep.join(roots))).lastrowid
+            connection.executemany('INSERT INTO dirs (scan_id, time, path, parent, size, file_count, dir_count, incomplete) '
+                                   'VALUES ({}, ?, ?, ?, ?, ?, ?, ?)'.format(scan_id), rows)
+
+        return len(rows)
+
+    def get_trend(self, dir_path, since=None):
+        """
+        Returns the recorded totals of a dir over time.
 
-    def _create_worker(self, worker_id):
+        @param dir_path - string, full path of the dir
+        @param since - [optional] float, earliest time of the returned records (seconds since the epoch)
+        @retval records - list of (time, size, file count, dir count, incomplete flag) tuples, sorted by time
         """
-        Creates a new worker: a process prepared to run a _BackgroundSizer.
+        with self._connect() as connection:
+            return connection.execute('SELECT time, size, file_count, dir_count, incomplete FROM dirs '
+                                      'WHERE path = ? AND time >= ? ORDER BY time', (dir_path, since or 0.0)).fetchall()
 
-        @param worker_id - arbitrary object, used as identifier in any messages (debug, error, etc.)
-        @retval worker - multiprocessing.Process object with added attributes
+    def get_children_trends(self, dir_path, since=None):
         """
-        # create pipe for communication with worker process
-        connection_here, connection_there = multiprocessing.Pipe()
+        Returns the growth rates of the subdirs of a dir.
 
-        # create a new worker
-        worker = multiprocessing.Process(target=_worker_main, args=(connection_there, worker_id))
+        @param dir_path - string, full path of the dir
+        @param since - [optional] float, earliest time of the considered records (seconds since the epoch)
+        @retval trends - list of (path, growth per second, last size, number of records) tuples, sorted by
+            growth (descending); subdirs with a single record have a growth of 0
+        """
+        records = {}    # times & sizes, keys are subdir paths
+        with self._connect() as connection:
+            for path, record_time, size in connection.execute('SELECT path, time, size FROM dirs WHERE parent = ? AND time >= ? ORDER BY time',
+                                                              (dir_path, since or 0.0)):
+                records.setdefault(path, ([], []))
+                records[path][0].append(record_time)
+                records[path][1].append(size)
 
-        # set worker attributes
-        worker.worker_id = worker_id    # store ID (used in any messages)
-        worker.connection = connection_here     # store one end of the communication pipe
-        worker.is_idle = True   # set flag for indicating whether worker is idle
-        worker.task_count = 0   # set info counter for number of accomplished tasks
-        # worker.start()
+        trends = [(path, _growth_rate(times, sizes) or 0.0, sizes[-1], len(times)) for path, (times, sizes) in records.items()]
+        trends.sort(key=lambda trend : trend[1], reverse=True)
+        return trends
 
-        return worker
 
-    def _start_workers(self, n_workers=None):
-        """
-        Starts the background workers.
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server on a unix socket (threaded).
+    """
+    daemon_threads = True
 
-        @param n_workers - [optional] int, number of workers to start, default: multiprocessing.cpu_count()
+    def server_bind(self):
         """
-        self._stop_workers()    # stop any running workers at first
-
-        if n_workers is None:
-            # number of workers not specified  ->  use number of processors/cores
-            try:
-                n_workers = multiprocessing.cpu_count()
-            except:
-                n_workers = 2
+        Overloaded from base class: binds the socket, sets the attributes expected by BaseHTTPRequestHandler.
+        """
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
 
-        # create & start the workers
-        for i in range(n_workers):
-            worker = self._create_worker(i)     # create new worker
-            worker.start()      # start the worker's process
-            self._workers.append(worker)    # store worker in internal list
-            logging.debug('Started background worker [{}].'.format(worker.worker_id))
 
-    def _stop_workers(self):
+class _QueryHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles the JSON query requests of the DirHunterServer (see there).
+    """
+    def do_GET(self):
         """
-        Stops (ends) any running background workers.
+        Answers a query request.
         """
-        # send quit signal
-        for worker in self._workers:
-            if worker.is_alive():
-                worker.connection.send({'type': 'quit'})
+        url = urllib.parse.urlsplit(self.path)
+        parameters = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        try:
+            status, response = self.server.dirhunter.query(url.path, parameters)
+        except (ValueError, KeyError) as error:
+            status, response = 400, {'error': 'invalid request: {}'.format(error)}
+
+        body = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+        Overloaded from base class: logs requests via logging (unix sockets have no client address).
+        """
+        logging.debug('Query: ' + format % args)
 
-        # ensure workers have quit, terminate if still running
-        while self._workers:
-            worker = self._workers.pop()
-            if worker.is_alive():
-                worker.join(3)
-                worker.terminate()
 
-            logging.debug('Stopped background worker [{}], task count: {}.'.format(worker.worker_id, worker.task_count))
+class DirHunterServer:
+    """
+    Long-running server: keeps the analysis result of one or more dirs in memory, refreshes it
+    regularly and answers queries with JSON over a unix socket or HTTP (on localhost).
+
+    Queries (HTTP GET requests, parameters are URL-encoded):
+        /status                         - base dir, time & duration of the last analysis, number of dirs
+        /info[?path=P]                  - size & counts of dir P (default: base dir)
+        /children[?path=P][&n=N]        - size & counts of the N biggest subdirs of dir P
+        /find?PREDICATES[&limit=N]      - size & counts of the N biggest dirs matching the predicates, which are
+                                          the parameters of TreeIndex.find (e.g. "path=/home&name=cache&min_depth=6",
+                                          "min_size=100e9", "incomplete=1"); "/search" is an alias
+        /refresh                        - trigger a new analysis (answers immediately)
+    The queries are answered from an index with precomputed aggregates (see TreeIndex), which
+    is replaced after each analysis.
+    """
+    def __init__(self, directory, socket_path=None, address=None, interval=3600.0, n_workers=None, **sizer_options):
+        """
+        Initialisation. Opens the server socket; the analysis is started by "serve_forever".
+
+        @param directory - string, path of the dir to analyse, or list of paths (see Sizer.cd)
+        @param socket_path - [optional] string, path of the unix socket to listen on
+        @param address - [optional] (host, port) tuple, address to listen on for HTTP (alternative to socket_path)
+        @param interval - [optional] float, time between analyses (in seconds)
+        @param n_workers - [optional] int, number of worker processes (see MultiSizer)
+        @param sizer_options - [optional] keyword arguments for the MultiSizer, e.g. for throttling the
+            analyses (max_ops, niceness, io_class) or adapting the number of workers (autotune, ...)
+        """
+        self._directory = directory
+        self._interval = interval
+        self._sizer = MultiSizer(n_workers=n_workers, **sizer_options)   # sizer for the (repeated) analysis
+        self._index = None      # init attribute for the index of the last analysis result
+        self._analysis_time = None  # init attribute for the time of the last analysis
+        self._analysis_duration = None  # init attribute for the duration of the last analysis
+        self._refresh_event = threading.Event()     # event to trigger an analysis
+        self._stop_event = threading.Event()    # event to stop the analysis thread
+
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)  # remove stale socket
+            self._server = _UnixHTTPServer(socket_path, _QueryHandler)
+        else:
+            self._server = http.server.ThreadingHTTPServer(address or ('localhost', 0), _QueryHandler)
+        self._server.dirhunter = self   # make the server object available to the request handlers
+        self.address = self._server.server_address
 
-    def _get_busy_workers(self):
+    def serve_forever(self):
         """
-        Returns the workers which are currently busy (i.e. running an analysis).
+        Runs the server until "shutdown" is called: analyses the dir(s) in a background thread
+        and answers queries.
+        """
+        analysis_thread = threading.Thread(target=self._analyse_regularly, daemon=True)
+        analysis_thread.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop_event.set()
+            self._refresh_event.set()
+            analysis_thread.join()
+            self._sizer._stop_workers()
+            self._server.server_close()
+            if isinstance(self._server, _UnixHTTPServer):
+                os.remove(self.address)
+
+    def shutdown(self):
+        """
+        Stops the server (from another thread).
+        """
+        self._server.shutdown()
 
-        @retval busy_workers - list of multiprocessing.Process objects as create by "_create_worker"
+    def _analyse_regularly(self):
         """
-        return [worker for worker in self._workers if not worker.is_idle]
+        Analyses the dir(s) repeatedly (run in a background thread): after each interval or
+        when triggered, until stopped. Builds the index of each analysis result.
+        """
+        while not self._stop_event.is_set():
+            time_start = datetime.datetime.now()
+            self._sizer._set_dir(self._directory, _quiet=True)
+            if self._sizer.base_dir_info is not None:
+                index = TreeIndex(self._sizer.base_dir, self._sizer.base_dir_info, self._sizer._roots)
+                self._index, self._analysis_time = index, time_start    # replace the index (queries use either the old or the new one)
+                self._analysis_duration = datetime.datetime.now() - time_start
+                logging.info('Analysis finished: {} dirs indexed in {}.'.format(len(index), self._analysis_duration))
+
+            self._refresh_event.wait(self._interval)
+            self._refresh_event.clear()
+
+    def query(self, query_path, parameters):
+        """
+        Answers a query (see class description).
 
-    def _get_idle_workers(self):
+        @param query_path - string, query path, e.g. "/info"
+        @param parameters - dict, query parameters
+        @retval status, response - (int, dict) tuple, HTTP status code & JSON-serialisable response
         """
-        Returns the workers which are currently idle.
+        if query_path == '/refresh':
+            self._refresh_event.set()
+            return 202, {'refresh': True}
 
-        @retval busy_workers - list of multiprocessing.Process objects as create by "_create_worker"
+        index = self._index     # (use the same index for the whole query)
+        if query_path == '/status':
+            return 200, {'base_dir': (index._roots or index.base_dir) if index else self._directory, 'dirs': len(index) if index else 0,
+                         'analysis_time': self._analysis_time and self._analysis_time.isoformat(),
+                         'analysis_duration': self._analysis_duration and self._analysis_duration.total_seconds()}
+
+        if index is None:
+            return 503, {'error': 'analysis in progress'}
+
+        if query_path in ('/info', '/children'):
+            dir_path = parameters.get('path', index.base_dir)   # default: base dir
+            if dir_path != _VIRTUAL_ROOT:
+                dir_path = os.path.abspath(dir_path)
+            node_id = index.lookup(dir_path)
+            if node_id is None:
+                return 404, {'error': 'dir not found: {}'.format(dir_path)}
+            if query_path == '/info':
+                return 200, index.get_summary(node_id)
+            n = int(parameters['n']) if 'n' in parameters else None
+            return 200, {'children': [index.get_summary(child_id) for child_id in index.get_children(node_id, n)]}
+
+        if query_path in ('/find', '/search'):
+            predicates = {'dir_path': parameters.get('path'), 'name': parameters.get('name')}
+            for key, convert in (('min_size', float), ('max_size', float), ('min_files', int), ('max_files', int), ('min_dirs', int),
+                                 ('max_dirs', int), ('min_depth', int), ('max_depth', int), ('limit', int)):
+                if key in parameters:
+                    predicates[key] = convert(parameters[key])
+            if 'incomplete' in parameters:
+                predicates['incomplete'] = parameters['incomplete'].lower() in ('1', 'true', 'yes')
+            if (predicates['dir_path'] is not None) and (predicates['dir_path'] != _VIRTUAL_ROOT):
+                predicates['dir_path'] = os.path.abspath(predicates['dir_path'])
+            return 200, {'dirs': [index.get_summary(node_id) for node_id in index.find(**predicates)]}
+
+        return 404, {'error': 'unknown query: {}'.format(query_path)}
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection via a unix socket.
+    """
+    def __init__(self, socket_path, timeout=10.0):
         """
-        return [worker for worker in self._workers if worker.is_idle]
+        Initialisation.
 
-    def _run(self):
+        @param socket_path - string, path of the unix socket
+        @param timeout - [optional] float, timeout for the connection (in seconds)
         """
-        Main analysis loop.
-        Handles the distribution of work.
-        Returns when the analysis is complete.
+        super().__init__('localhost', timeout=timeout)
+        self._socket_path = socket_path
+
+    def connect(self):
         """
-        # init the analysis if necessary
-        if not self._get_busy_workers():
-            # all workers idle  ->  assign the base dir to the first worker
-            self._workers[0].connection.send({'type': 'process', 'dir': self.base_dir, 'dir_exclude': self._dir_stock})
-            self._workers[0].is_idle = False
+        Overloaded from base class: connects to the unix socket.
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
 
-        # prepare the sharing/hand-over mechanism:
-        # - only a single share request can be active at a time
-        # - define a time span after which a share request expires to avoid waiting infinitely
-        #   for a response to a share request
-        share_request_expiration = datetime.timedelta(seconds=5)    # time span for expiration
-        pending_share_request = None    # set current share request to none
 
-        # main loop: iterate until all workers are idle
-        while self._get_busy_workers():
+def query_server(request, socket_path=None, address=None):
+    """
+    Sends a query to a DirHunterServer.
 
-            for worker in self._workers:
-                # check if current worker is running
-                if not worker.is_alive():
-                    # worker has crashed  ->  cancel
-                    logging.error('Worker [{}] has terminated unexpectedly. Cancelling analysis.'.format(worker.worker_id))
-                    return False
-
-                # current worker: check for and handle any messages
-                while worker.connection.poll():
-                    message = worker.connection.recv()      # fetch message from connection
-
-                    if message['type'] == 'done':
-                        #---- worker has finished analysis
-                        dir_path = message['dir']   # fetch analysed path
-                        dir_info = message['info']      # fetch analysis result
-                        dir_exclude_path = message['dir_exclude']   # fetch path to exclude
-
-                        self._insert_info(dir_info, dir_path)   # insert analysis result into common info tree
-                        worker.is_idle = True       # set worker status to signalise idle
-                        worker.task_count += 1      # increase counter for accomplished missions
-                        logging.debug('Worker [{}] finished dir: {}'.format(worker.worker_id, dir_path))
-                        # logging.debug('Inserted beneath {}: {}'.format(dir_path, ', '.join(dir_info['dirs'].keys())))
-                        self._dir_stock = dir_exclude_path      # update stock path with sent exclude path (if worker encountered exclude path it sends back empty path)
-
-                    elif message['type'] == 'share':
-                        #---- worker shares (hands over) dirs from its analysis queue
-                        logging.debug('Share response from worker [{}]: dirs={}'.format(worker.worker_id, message['dirs']))
-                        assert pending_share_request is not None, 'Internal inconsistency: Got share response from worker [{}] without pending_share_request being set.'.format(worker.worker_id)
-
-                        dir_list = message['dirs']      # fetch list of dirs to share/distribute
-                        if self._dir_stock in dir_list:
-                            dir_list.remove(self._dir_stock)
-                            logging.debug('Analysis re-use: Skipping dir: {}'.format(self._dir_stock))
-
-                        if dir_list:
-                            idle_workers = self._get_idle_workers()     # fetch list of workers which can be assigned to a dir
-                            assert (len(dir_list) <= len(idle_workers)), 'Internal inconsistency: More dirs to distribute than idle workers.'
-                            for worker, dir_path in zip(idle_workers, dir_list):
-                                # assign a currently idle worker to a dir
-                                worker.connection.send({'type': 'process', 'dir': dir_path, 'dir_exclude': self._dir_stock})
-                                worker.is_idle = False
-                                logging.debug('Worker [{}] assigned to dir: {}'.format(worker.worker_id, dir_path))
-                        pending_share_request = None    # finally delete the share request (to permit handling of a new request)
+    @param request - string, query path with parameters, e.g. "/children?path=/home&n=10"
+    @param socket_path - [optional] string, path of the server's unix socket
+    @param address - [optional] (host, port) tuple, HTTP address of the server (alternative to socket_path)
+    @retval response - dict, JSON response
+    """
+    if socket_path is not None:
+        connection = _UnixHTTPConnection(socket_path)
+    else:
+        connection = http.client.HTTPConnection(*address, timeout=10.0)
+    try:
+        connection.request('GET', request)
+        response = connection.getresponse()
+        return json.loads(response.read().decode())
+    finally:
+        connection.close()
 
-                    else:
-                        #---- unknown message type  ->  guru meditation
-                        raise TypeError('Unhandled message "{}" received from worker process [{}]'.format(message, worker.worker_id))
-
-                # # current worker: if worker is doing something and there is no currently pending
-                # # share request then send a share request to the current worker
-                # if not worker.is_idle and not pending_share_request:
-                #     idle_workers = self._get_idle_workers()     # determine number of idle workers (= number of requested dirs)
-                #     if idle_workers:
-                #         # there are idle workers  ->  prepare a shar request with an expiration time
-                #         # and send it to the current worker
-                #         pending_share_request = {'type': 'share', 'n_dirs': len(idle_workers),
-                #                                  'expiration': (datetime.datetime.now() + share_request_expiration),
-                #                                  'expired': False,
-                #                                  'worker': worker.worker_id}
-                #         worker.connection.send(pending_share_request)       # send share request to current worker
-                #         logging.debug('Sent share request to worker [{}]: {} dirs'.format(worker.worker_id, pending_share_request['n_dirs']))
 
 
-            # share-request management: if there are idle workers, a share request will be sent to the
-            # first busy worker for sharing some work to employ the idle workers;
-            # however, only a single share request is handled in general (queueing not considered usefull)
-            idle_workers = self._get_idle_workers()     # get list of idle workers (= number of dirs to request)
-            if idle_workers and not pending_share_request:      # there are idle workers and no pending share request
-                busy_workers = self._get_busy_workers()     # get list of busy workers
-                if busy_workers:
-                    # prepare a share request with an expiration time and send it to the first busy worker
-                    pending_share_request = {'type': 'share', 'n_dirs': len(idle_workers),
-                                             'expiration': (datetime.datetime.now() + share_request_expiration),
-                                             'expired': False,
-                                             'worker': busy_workers[0].worker_id}
-                    busy_workers[0].connection.send(pending_share_request)       # send share request to current worker
-                    logging.debug('Sent share request to worker [{}]: {} dirs'.format(busy_workers[0].worker_id, pending_share_request['n_dirs']))
+#===========================================================================
 
 
-            # main loop (not worker loop): if there is a pending share request, check if it has expired
-            if pending_share_request:
-                if pending_share_request['expired']:
-                    # share request has already expired  ->  discard it
-                    logging.debug('Discarding share request to worker [{}] ({} dirs)'.format(pending_share_request['worker'], pending_share_request['n_dirs']))
-                    pending_share_request = None    # delete share request
-                elif datetime.datetime.now() > pending_share_request['expiration']:
-                    # expiration time of the share request has passed  ->  flag it to be expired
-                    logging.debug('Expiring share request to worker [{}] ({} dirs)'.format(pending_share_request['worker'], pending_share_request['n_dirs']))
-                    pending_share_request['expired'] = True     # indicate expired share request
-
-            # check whether all workers are busy and wait a bit before the next iteration if so
-            idle_workers = self._get_idle_workers()
-            if not idle_workers:
-                time.sleep(1)
+class AsyncScan:
+    """
+    An analysis started by AsyncSizer.start_scan, running in a thread (off the event loop).
+    Awaiting it returns the sizer holding the analysis result; iterating over it ("async for")
+    yields progress reports until the analysis has finished; cancelling it stops the analysis
+    (and the worker processes) before the cancellation is propagated.
+    """
+    def __init__(self, sizer, directory, semaphore, interval=1.0):
+        """
+        Initialisation. Starts the analysis as soon as the semaphore permits (requires a running event loop).
 
-        # final step: return True to signalise successfull analysis
-        return True
+        @param sizer - Sizer or MultiSizer object to run the analysis with (exclusively used by this scan)
+        @param directory - string, path of the dir to analyse; or list of strings, paths of several dirs
+        @param semaphore - asyncio.Semaphore object, limit of the number of concurrent analyses
+        @param interval - [optional] float, time between progress reports (in seconds)
+        """
+        self.sizer = sizer
+        self.directory = directory
+        self._semaphore = semaphore
+        self._interval = interval
+        self._time_start = None     # init attribute for start time of the analysis (after waiting for the semaphore)
+        self._time_end = None       # init attribute for end time of the analysis
+        self._task = asyncio.ensure_future(self._run())
 
+    def __await__(self):
+        return self._task.__await__()
 
-    def _set_dir(self, directory=None, _quiet=False):
+    def __aiter__(self):
+        return self._iterate_progress()
+
+    def cancel(self):
         """
-        Sets the directory to analyse and starts the analysis.
+        Cancels the analysis.
+        """
+        self._task.cancel()
 
-        @param directory - [optional] string, path of directory to analyse; if not specified,
-            the currently set base dir will be used
+    def done(self):
         """
-        time_start = datetime.datetime.now()    # record start time (just for debugging/info)
+        Checks whether the analysis has ended (finished, failed or cancelled).
 
-        if directory:
-            self._set_base_dir(directory)     # set specified dir in main sizer object
+        @retval done - bool
+        """
+        return self._task.done()
 
-        self._start_workers()   # start the background workers
-        success = self._run()             # perform the analysis
-        self._stop_workers()    # stop the background workers
+    def get_progress(self):
+        """
+        Assembles a progress report of the analysis.
 
-        if success:
-            # delete any existing, re-used info object
-            self._dir_stock = ''
-            self._info_stock = None
+        @retval progress - dict
+            key 'directory' - string (or list of strings), path of the analysed dir
+            key 'state' - string, "waiting" (for a free slot), "running", "finished", "failed" or "cancelled"
+            key 'n_entries' - int, number of entries (files & dirs) analysed so far
+            key 'elapsed' - float, time since the start of the analysis (in seconds)
+        """
+        if self._time_start is None:
+            state = 'waiting'
+        elif not self._task.done():
+            state = 'running'
+        elif self._task.cancelled():
+            state = 'cancelled'
+        elif self._task.exception() is not None:
+            state = 'failed'
+        else:
+            state = 'finished'
 
-            self._sum_sizes()     # calculate all directories' sizes
+        if self._time_start is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._time_end or time.perf_counter()) - self._time_start
 
-            time_end = datetime.datetime.now()      # record end time (just for debugging/info)
-            print('===== elapsed time: ', str(time_end - time_start))
-            print('===== insertion cache: {} hits, {} misses'.format(self._last_counter[1], self._last_counter[0]))
-            print('===== total count: {} files, {} dirs]\n'.format(*self._get_counts(self.base_dir_info)))
-            self._last_counter = [0, 0]    # just for debugging/info: init counters for insertion cache misses & hits
+        return {'directory': self.directory, 'state': state, 'n_entries': self.sizer._n_analysed, 'elapsed': elapsed}
 
-            self.cdi(_quiet=_quiet)    # prepare for subdir changes, poss. display the results
-        else:
-            self.base_dir = None
-            self.base_dir_info = None
-            # raise SizerError('')
+    async def _iterate_progress(self):
+        """
+        Yields a progress report regularly (see "get_progress") until the analysis has ended,
+        then a final one.
+        """
+        while not self._task.done():
+            yield self.get_progress()
+            await asyncio.wait([self._task], timeout=self._interval)
+        yield self.get_progress()
 
-    def _analyse_base_dir(self):
+    async def _run(self):
         """
-        Overloaded from base class.
-        Basically just raises a SizerError to signalise that a (new) background-multiprocess
-        analysis needs to be started.
-        (This class does not perform any analysis itself but distributes the task to background workers.)
+        Runs the analysis in a thread once the semaphore permits. On cancellation, tells the sizer to
+        stop and waits until it has (so that no worker processes are left behind).
+
+        @retval sizer - Sizer or MultiSizer object holding the analysis result
+        """
+        async with self._semaphore:
+            self._time_start = time.perf_counter()
+            future = asyncio.get_running_loop().run_in_executor(None, self._scan)
+            try:
+                await asyncio.shield(future)
+            except asyncio.CancelledError:
+                self.sizer._scan_stop.set()
+                await future    # (the analysis stops within a fraction of a second)
+                raise
+            finally:
+                self._time_end = time.perf_counter()
+
+        if self.sizer.base_dir_info is None:
+            raise DirHunterError('Analysis of {} failed.'.format(self.directory))
+        return self.sizer
+
+    def _scan(self):
+        """
+        Performs the analysis (in the thread).
         """
-        # set up re-using of an existing info object (if there is any)
-        if self._dir_stock:
-            # insert the existing info object into the info tree (initialises the tree if necessary)
-            self._insert_info(self._info_stock, self._dir_stock)
+        if isinstance(self.sizer, MultiSizer):
+            self.sizer._track_progress = True
+            with self.sizer:
+                self.sizer.cd(self.directory, _quiet=True)    # (the workers are stopped afterwards)
+        else:
+            self.sizer.cd(self.directory, _quiet=True)
+            if self.sizer._scan_thread is not None:
+                # progressive mode: the analysis continues in a background thread (which checks the stop event as well)
+                self.sizer._scan_thread.join()
 
-        # raise SizerError to signalise that (new) background-multiprocess analysis needs to be started
-        raise SizerError
 
-    def cd(self, directory=None, _quiet=False):
+class AsyncSizer:
+    """
+    Non-blocking (asyncio) interface for running analyses in services: each analysis runs with its own
+    sizer in a thread, so the event loop is not blocked; several analyses can run at once, limited by
+    a shared number of slots.
+
+    Usage:
+        async_sizer = AsyncSizer(max_scans=2, max_ops=5000)
+        sizer = await async_sizer.scan('/srv/projects')     # sizer holding the result (base_dir_info, find, ...)
+
+        scan = async_sizer.start_scan('/srv/archive')
+        async for progress in scan:
+            print(progress['n_entries'])
+        sizer = await scan
+    """
+    def __init__(self, max_scans=1, multiprocess=True, progress_interval=1.0, **sizer_options):
         """
-        Overloaded from base class.
-        Changes to the specified directory and displays its info.
+        Initialisation.
 
-        @param directory - [optional] string, path of the dir to analyse;
-            if not specified, changes to current base directory
+        @param max_scans - [optional] int, max. number of analyses running at once (further ones wait)
+        @param multiprocess - [optional] bool, flag to analyse with worker processes (MultiSizer) instead
+            of a single-process Sizer
+        @param progress_interval - [optional] float, time between progress reports (in seconds)
+        @param sizer_options - [optional] keyword arguments for the Sizer/MultiSizer of each analysis,
+            e.g. n_workers (MultiSizer only), max_ops, count_only
         """
-        try:
-            # call the base class' "cd" method
-            # (works if the specified dir is a subdir of the base dir)
-            super().cd(directory=directory)
+        self._max_scans = max_scans
+        self._multiprocess = multiprocess
+        self._progress_interval = progress_interval
+        self._sizer_options = sizer_options
+        self._semaphore = None  # init attribute for the semaphore limiting the analyses (created within the event loop)
 
-        except SizerError:
-            # SizerError signalises that specified dir is not a subdir of the base dir
-            # -> trigger new analysis
-            self._set_dir(_quiet=_quiet)
+    def start_scan(self, directory):
+        """
+        Starts the analysis of the specified dir(s) (as soon as a slot is free). Must be called
+        within a running event loop.
 
+        @param directory - string, path of the dir to analyse; or list of strings, paths of several dirs
+        @retval scan - AsyncScan object (awaitable, async iterable of progress reports, cancellable)
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_scans)
 
-def _worker_main(connection, worker_id):
-    """
-    Function which is passed to the multiprocessing.Process object to run a background sizer.
+        if self._multiprocess:
+            sizer = MultiSizer(**self._sizer_options)
+        else:
+            sizer = Sizer(**self._sizer_options)
+        return AsyncScan(sizer, directory, self._semaphore, self._progress_interval)
+
+    async def scan(self, directory):
+        """
+        Analyses the specified dir(s) without blocking the event loop.
+
+        @param directory - string, path of the dir to analyse; or list of strings, paths of several dirs
+        @retval sizer - Sizer or MultiSizer object holding the analysis result
+        """
+        return await self.start_scan(directory)
 
-    @param connection - multiprocessing.Connection object
-    @param worker_id - arbitrary object to use as ID in any displayed messages
-    """
-    sizer = _BackgroundSizer(connection, worker_id)     # create the background-sizer object
-    sizer.run()     # run the sizer
 
 
 #===========================================================================
@@ -1086,7 +4246,7 @@ class DirHunterShell(cmd.Cmd):
 
         @param sizer - Sizer object to use for the actual analysis, either instance
             of Sizer class or MultiSizer class
-        @param directory - [optional] string, path of directory to analyse
+        @param directory - [optional] string, path of directory to analyse (or list of paths, see Sizer.cd)
         """
         super().__init__()
         self.sizer = sizer
@@ -1150,9 +4310,29 @@ class DirHunterShell(cmd.Cmd):
 
     def do_ls(self, arg):
         """
-        Display analysis results of current directory.
+        Display analysis results of current directory: its largest subdirectories (by default the first 100).
+        Options: -n N (number of subdirs per page, 0 for all), -p/--page PAGE (page to display, default: 1),
+                 --min-size SIZE (only subdirs of at least this size, may have unit prefix)
+
+        Examples: "ls -n 20" lists the 20 largest subdirectories
+                  "ls -n 20 -p 2" lists the next 20 ones (ranks 20 to 39)
+                  "ls -n 0 --min-size 1G" lists all subdirectories of at least 1 GB
         """
-        self.sizer.ls()
+        parser = argparse.ArgumentParser(prog='ls', add_help=False)
+        parser.add_argument('-n', type=int)
+        parser.add_argument('-p', '--page', type=int, default=1)
+        parser.add_argument('--min-size', type=self.sizer._parse_size)
+        try:
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            # invalid arguments (message displayed by the parser)
+            return
+        if ((args.n is not None) and (args.n < 0)) or (args.page < 1):
+            print('Error: Invalid argument "{}"'.format(arg))
+            self.do_help('ls')
+            return
+
+        self.sizer.ls(n=args.n, page=args.page, min_size=args.min_size)
 
     def do_pwd(self, arg):
         """
@@ -1160,6 +4340,113 @@ class DirHunterShell(cmd.Cmd):
         """
         self.sizer.pwd()
 
+    def do_find(self, arg):
+        """
+        Search the dirs in the current directory (or in the specified one) and display them,
+        sorted by size.
+        Options: --name PATTERN, --min-size/--max-size SIZE, --min-files/--max-files N,
+                 --min-dirs/--max-dirs N, --min-depth/--max-depth N, --incomplete, --limit N (default: 50)
+        Depths are relative to the searched directory, sizes may have unit prefixes.
+
+        Examples: "find --min-size 100G" lists the dirs over 100 GB
+                  "find --name cache --min-depth 6" lists the "cache" dirs deeper than 5 levels
+        """
+        parser = argparse.ArgumentParser(prog='find', add_help=False)
+        parser.add_argument('directory', nargs='?')
+        parser.add_argument('--name')
+        parser.add_argument('--min-size', type=self.sizer._parse_size)
+        parser.add_argument('--max-size', type=self.sizer._parse_size)
+        for option in ('--min-files', '--max-files', '--min-dirs', '--max-dirs', '--min-depth', '--max-depth'):
+            parser.add_argument(option, type=int)
+        parser.add_argument('--incomplete', action='store_true', default=None)
+        parser.add_argument('--limit', type=int, default=50)
+        try:
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            # invalid arguments (message displayed by the parser)
+            return
+
+        predicates = vars(args)
+        dirs = self.sizer.find(predicates.pop('directory'), **predicates)
+        if not dirs:
+            print('  no matching directories')
+        for dir_summary in dirs:
+            print('{} {}  {}   [{} dirs, {} files]'.format(self.sizer._format_size(dir_summary['size']), '?' if dir_summary['incomplete'] else ' ',
+                                                        dir_summary['path'], dir_summary['dir_count'], dir_summary['file_count']))
+        if len(dirs) == args.limit:
+            print('  [first {} matches]'.format(args.limit))
+
+    def do_trend(self, arg):
+        """
+        Display the growth of the current directory (or of the specified one) according to the scan history
+        (see option --history-db): growth rate and recorded totals, or growth rates of its subdirectories.
+        Options: --days N (only the records of the last N days), --children (growth rates of the subdirectories),
+                 --limit N (number of subdirectories, default: 20)
+
+        Examples: "trend" displays the recorded totals of the current directory
+                  "trend projects/x --children --days 30" lists the fastest growing subdirectories of the last month
+        """
+        parser = argparse.ArgumentParser(prog='trend', add_help=False)
+        parser.add_argument('directory', nargs='?')
+        parser.add_argument('--days', type=float)
+        parser.add_argument('--children', action='store_true')
+        parser.add_argument('--limit', type=int, default=20)
+        try:
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            # invalid arguments (message displayed by the parser)
+            return
+
+        self.sizer.trend(args.directory, days=args.days, children=args.children, limit=args.limit)
+
+    def do_export(self, arg):
+        """
+        Export the analysis result of the current directory (or of the specified one) to a file:
+        "folded" writes folded stacks for flame-graph tools, "treemap" writes an HTML file with an SVG treemap.
+        Options: --dir DIRECTORY, --min-fraction F (min. size of the exported subtrees, relative to
+                 the exported directory, default: 0.0001)
+
+        Examples: "export treemap /tmp/report.html"
+                  "export folded /tmp/home.folded --min-fraction 0.001"
+        """
+        parser = argparse.ArgumentParser(prog='export', add_help=False)
+        parser.add_argument('format', choices=('folded', 'treemap'))
+        parser.add_argument('file')
+        parser.add_argument('--dir')
+        parser.add_argument('--min-fraction', type=float, default=0.0001)
+        try:
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            # invalid arguments (message displayed by the parser)
+            return
+
+        if args.format == 'folded':
+            n_lines = self.sizer.export_folded(args.file, args.dir, min_fraction=args.min_fraction)
+            print('  {} stacks written to {}'.format(n_lines, args.file))
+        else:
+            n_rects = self.sizer.export_treemap(args.file, args.dir, min_fraction=args.min_fraction)
+            print('  {} dirs written to {}'.format(n_rects, args.file))
+
+    def do_refine(self, arg):
+        """
+        Refine the estimated sizes (see option --estimate) by sampling more directories, then display the current directory.
+        Without a fraction, all remaining directories are analysed (exact result).
+
+        Examples: "refine 0.1" samples another 10% of the directories
+                  "refine" completes the analysis
+        """
+        fraction = None
+        try:
+            if arg:
+                fraction = float(arg)
+        except ValueError:
+            print('Error: Invalid argument "{}"'.format(arg))
+            self.do_help('refine')
+            return
+
+        self.sizer.refine(fraction)
+        self.sizer.ls()
+
     def do_x(self, arg):
         """
         Quit the shell.
@@ -1188,15 +4475,209 @@ def test_sizer(directory=None):
     return msizer
 
 
-def test_shell(directory=None):
+def test_worker_agents(directory=None, n_agents=3, share_request_timeout=None):
+    """
+    Analyses a dir with a MultiSizer whose only workers are worker agents on localhost (each in
+    its own process, connected via TCP like agents on other hosts) and compares the totals with
+    those of a single-process Sizer.
+
+    @param directory - [optional] string, path of the dir to analyse; default: home dir
+    @param n_agents - [optional] int, number of worker agents to start
+    @param share_request_timeout - [optional] float, expiration time of share requests (in seconds);
+        a very short time lets most responses arrive after their request has expired
+    @retval match - bool, True if the totals of both analyses are equal
+    """
+    if directory is None:
+        directory = os.path.expanduser('~')
+
+    authkey = os.urandom(16)
+    agents = []
+    with MultiSizer(address=('127.0.0.1', 0), authkey=authkey) as msizer:
+        if share_request_timeout is not None:
+            msizer._share_request_timeout = share_request_timeout
+        try:
+            for i in range(n_agents):
+                agent = multiprocessing.Process(target=run_worker_agent, args=(msizer._listener.address, authkey),
+                                                kwargs={'reconnect_delay': 0.2}, daemon=True)
+                agent.start()
+                agents.append(agent)
+
+            # wait for the agents to connect (so that all of them take part from the start)
+            time_limit = time.monotonic() + 10.0
+            while (msizer._new_connections.qsize() < n_agents) and (time.monotonic() < time_limit):
+                time.sleep(0.05)
+
+            msizer._set_dir(directory, _quiet=True)
+        finally:
+            for agent in agents:
+                agent.terminate()
+                agent.join()
+
+    sizer = Sizer()
+    sizer.cd(directory, _quiet=True)
+
+    totals = []
+    for name, result_sizer in (('worker agents', msizer), ('Sizer', sizer)):
+        if result_sizer.base_dir_info is None:
+            print('===== {}: analysis failed'.format(name))
+            return False
+        totals.append((result_sizer.base_dir_info['size'],) + result_sizer._get_counts(result_sizer.base_dir_info))
+        print('===== {}: {:.0f} B, {} files, {} dirs'.format(name, *totals[-1]))
+
+    return totals[0] == totals[1]
+
+
+def test_shell(directory=None, progressive=False, snapshot=None, n_workers=None, address=None, authkey=None,
+               max_ops=None, niceness=None, io_class=None, autotune=False, min_workers=1, max_workers=None, history_db=None, history_depth=3,
+               sample_fraction=None, cache_nodes=1000000, validate_cache=True, count_only=False):
     """
     """
     if directory is None:
         os.path.expanduser('~')
 
-    with MultiSizer() as sizer:
+    if progressive or sample_fraction:
+        # progressive or estimation mode  ->  single-process sizer (which continues the analysis in the background / samples the dirs)
+        _set_process_priority(niceness, io_class)
+        sizer = Sizer(progressive=progressive, max_ops=max_ops, history_db=history_db, history_depth=history_depth,
+                      sample_fraction=sample_fraction, cache_nodes=cache_nodes, validate_cache=validate_cache, count_only=count_only)
         shell = DirHunterShell(sizer, directory)
         shell.cmdloop()
+        if sizer._stop_scan() and (sizer._strata is None) and snapshot:
+            sizer.save_snapshot(snapshot)
+        return
+
+    with MultiSizer(n_workers=n_workers, address=address, authkey=authkey,
+                    max_ops=max_ops, niceness=niceness, io_class=io_class, autotune=autotune, min_workers=min_workers, max_workers=max_workers,
+                    history_db=history_db, history_depth=history_depth, cache_nodes=cache_nodes, validate_cache=validate_cache,
+                    count_only=count_only) as sizer:
+        if snapshot and os.path.isfile(snapshot):
+            sizer.load_snapshot(snapshot)   # previous result: hand out the biggest subtrees first
+        shell = DirHunterShell(sizer, directory)
+        shell.cmdloop()
+        if snapshot and (sizer.base_dir_info is not None):
+            sizer.save_snapshot(snapshot)
+
+
+def benchmark_worker_loop(directory=None, n_dirs=200000, max_ops=2000.0, n_requests=20):
+    """
+    Measures the worker loop of a background sizer: the time per dir (on a tree of empty dirs,
+    i.e. mostly loop overhead) and the latency of share requests while the worker is busy with
+    slow dirs (file-system operations throttled to max_ops per second, emulating a slow file system).
+
+    @param directory - [optional] string, path of the dir to analyse; if not specified, a temporary
+        tree with n_dirs empty dirs is created (and removed afterwards)
+    @param n_dirs - [optional] int, number of dirs to create in the temporary tree
+    @param max_ops - [optional] float, max. number of file-system operations per second for the latency measurement
+    @param n_requests - [optional] int, number of share requests for the latency measurement
+    """
+    temp_dir = None
+    if directory is None:
+        temp_dir = tempfile.mkdtemp(prefix='dirhunter_benchmark_')
+        directory = temp_dir
+        print('===== creating {} dirs in {}'.format(n_dirs, directory))
+        n_branches = 10     # wide dirs (long dir list)
+        for i in range(n_dirs):
+            os.makedirs(os.path.join(directory, 'd{:d}'.format(i % n_branches), 'd{:d}'.format(i)))
+
+    def start_task(connection):
+        connection.send({'type': 'process', 'dir': directory, 'dir_exclude': {}, 'handle': ('benchmark', 0),
+                         'options': Sizer()._get_scan_options()})
+
+    try:
+        for throttled in (False, True):
+            connection, worker_connection = multiprocessing.Pipe()
+            throttle = _TokenBucket(max_ops) if throttled else None
+            worker = multiprocessing.Process(target=_worker_main, args=(worker_connection, 'benchmark', throttle), daemon=True)
+            worker.start()
+            time_start = time.perf_counter()
+            start_task(connection)
+
+            if not throttled:
+                # per-dir overhead: wait for the result
+                message = connection.recv()
+                elapsed = time.perf_counter() - time_start
+                n_analysed = sum(1 for _ in _flatten_tree(message['info'])[0])
+                print('===== worker loop: {:.2f} s for {} dirs, {:.1f} us/dir'.format(elapsed, n_analysed, elapsed / n_analysed * 1e6))
+            else:
+                # share-response latency: request one dir at a time while the worker is busy
+                latencies = []
+                for i in range(n_requests):
+                    time.sleep(0.05)
+                    request_time = time.perf_counter()
+                    connection.send({'type': 'share', 'id': i, 'n_dirs': 1})
+                    while True:
+                        message = connection.recv()
+                        if message['type'] == 'share':
+                            break
+                    latencies.append(time.perf_counter() - request_time)
+                latencies.sort()
+                print('===== share latency at {:.0f} ops/s: median {:.1f} ms, max {:.1f} ms'.format(
+                    max_ops, latencies[len(latencies) // 2] * 1e3, latencies[-1] * 1e3))
+
+            connection.send({'type': 'quit'})
+            worker.join(3)
+            worker.terminate()
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir)
+
+
+
+def benchmark_aggregation(n_dirs=1000000, depth=100000):
+    """
+    Compares the former recursive size aggregation with the level-wise aggregation
+    (pure Python and, if available, NumPy) on synthetic info trees: a bushy tree and a
+    single chain of dirs (deeper than the recursion limit).
+
+    @param n_dirs - [optional] int, number of dirs of the bushy tree
+    @param depth - [optional] int, depth of the chain
+    """
+    def sum_sizes_recursive(dir_info):
+        # former implementation of Sizer._sum_sizes
+        subdirs_size = sum([sum_sizes_recursive(info) for info in dir_info['dirs'].values()])
+        dir_info['size'] = dir_info['files_size'] + subdirs_size
+        return dir_info['size']
+
+    def sum_sizes_level_wise(dir_info, use_numpy):
+        infos, names, parents, level_starts = _flatten_tree(dir_info)
+        sizes = _sum_bottom_up([info['files_size'] for info in infos], parents, level_starts, use_numpy=use_numpy)
+        for info, size in zip(infos, sizes):
+            info['size'] = size
+        return dir_info['size']
+
+    sizer = Sizer()
+
+    # bushy tree: each dir gets up to 10 subdirs, breadth first
+    bushy_info = sizer._create_info()
+    infos = [bushy_info]
+    for node_id in range(1, n_dirs):
+        dir_info = sizer._create_info()
+        dir_info['files_size'] = float(node_id % 1000)
+        infos[(node_id - 1) // 10]['dirs']['d{}'.format(node_id)] = dir_info
+        infos.append(dir_info)
+
+    # chain of dirs
+    chain_info = sizer._create_info()
+    dir_info = chain_info
+    for level in range(depth):
+        dir_info['files_size'] = 1.0
+        dir_info['dirs']['d'] = sizer._create_info()
+        dir_info = dir_info['dirs']['d']
+
+    methods = [('recursive', sum_sizes_recursive), ('level-wise', lambda info: sum_sizes_level_wise(info, False))]
+    if numpy is not None:
+        methods.append(('level-wise NumPy', lambda info: sum_sizes_level_wise(info, True)))
+
+    for tree_name, tree_info, n_tree_dirs in (('bushy tree', bushy_info, n_dirs), ('chain', chain_info, depth + 1)):
+        for method_name, method in methods:
+            time_start = time.perf_counter()
+            try:
+                size = method(tree_info)
+            except RecursionError:
+                print('===== {}, {}: RecursionError'.format(tree_name, method_name))
+                continue
+            elapsed = time.perf_counter() - time_start
+            print('===== {} ({} dirs), {}: {:.3f} s (size {:.0f})'.format(tree_name, n_tree_dirs, method_name, elapsed, size))
 
 
 
@@ -1206,10 +4687,77 @@ def test_shell(directory=None):
 
 if __name__ == '__main__':
 
-    try:
-        dir_path = sys.argv[1]
-    except IndexError:
-        dir_path = os.path.expanduser('~')
-
-    # sizer = test_sizer(dir_path)
-    test_shell(dir_path)
+    parser = argparse.ArgumentParser(description='Analyses and displays directory sizes.')
+    parser.add_argument('directory', nargs='*', default=[os.path.expanduser('~')], help='directory to analyse (default: home directory); several directories are analysed together below a virtual root')
+    parser.add_argument('-p', '--progressive', action='store_true', help='make the shell usable after analysing the top levels, continue the analysis in the background')
+    parser.add_argument('-e', '--estimate', type=float, metavar='FRACTION', help='analyse the top levels completely, estimate the sizes below from a random sample of this fraction of the dirs (refine with "refine" in the shell)')
+    parser.add_argument('-c', '--count-only', action='store_true', help='only count the entries, without stat calls for the files (for inode hunting): sizes are numbers of entries')
+    parser.add_argument('-s', '--snapshot', metavar='FILE', help='snapshot file of a previous analysis, used for scheduling the work (biggest subtrees first); the analysis result is saved to it on exit')
+    parser.add_argument('-j', '--workers', type=int, help='number of local worker processes (default: number of CPUs, 0 with --listen)')
+    parser.add_argument('--autotune', action='store_true', help='adapt the number of local workers to the measured throughput (start value: -j, or the number tuned for the file system before)')
+    parser.add_argument('--min-workers', type=int, default=1, help='min. number of local workers for --autotune (default: 1)')
+    parser.add_argument('--max-workers', type=int, help='max. number of local workers for --autotune (default: 4 * number of CPUs)')
+    parser.add_argument('--listen', metavar='HOST:PORT', help='accept worker agents (see --agent) on this address')
+    parser.add_argument('--agent', metavar='HOST:PORT', help='run as worker agent for the dir hunter listening on this address (instead of the shell)')
+    parser.add_argument('--authkey', help='authentication key for --listen/--agent (default: environment variable DIRHUNTER_AUTHKEY)')
+    parser.add_argument('--serve', metavar='ADDRESS', help='run as server (instead of the shell), answering JSON queries on this unix socket path or HOST:PORT (HTTP)')
+    parser.add_argument('--refresh', type=float, default=3600.0, metavar='SECONDS', help='time between analyses in server mode (default: 3600)')
+    parser.add_argument('--query', nargs=2, metavar=('ADDRESS', 'REQUEST'), help='send a query (e.g. "/children?path=/home&n=10") to a server and print the response')
+    parser.add_argument('--max-ops', type=float, metavar='N', help='max. number of file-system operations (dir openings & stat calls) per second of all workers together (of each agent with --agent)')
+    parser.add_argument('--nice', type=int, metavar='N', help='niceness increment of the worker processes')
+    parser.add_argument('--ionice', choices=sorted(_IOPRIO_CLASSES), help='I/O scheduling class of the worker processes (Linux only)')
+    parser.add_argument('--history-db', metavar='FILE', help='SQLite database in which the totals of the dirs are recorded after each complete analysis')
+    parser.add_argument('--history-depth', type=int, default=3, metavar='N', help='max. depth of the dirs recorded in the history database (default: 3)')
+    parser.add_argument('--cache-dirs', type=int, default=1000000, metavar='N', help='max. total number of dirs of the previous analysis results kept in memory for re-use (default: 1000000, roughly 0.5 kB each)')
+    parser.add_argument('--no-cache-validation', action='store_true', help='re-use cached analysis results without checking the modification times of their top-level dirs')
+    parser.add_argument('--trend', metavar='DIRECTORY', help='display the growth of this directory according to the history database and exit')
+    parser.add_argument('--days', type=float, help='with --trend: only consider the records of the last days')
+    parser.add_argument('--children', action='store_true', help='with --trend: display the growth rates of the subdirectories')
+    parser.add_argument('--export-folded', metavar='FILE', help='analyse, write folded stacks (for flame-graph tools) to this file and exit')
+    parser.add_argument('--export-treemap', metavar='FILE', help='analyse, write an HTML treemap to this file and exit')
+    parser.add_argument('--min-fraction', type=float, default=0.0001, help='min. size of the exported subtrees, relative to the whole analysis (default: 0.0001)')
+    args = parser.parse_args()
+
+    authkey = args.authkey or os.environ.get('DIRHUNTER_AUTHKEY')
+    if authkey is not None:
+        authkey = authkey.encode()
+
+    if args.agent:
+        run_worker_agent(_parse_address(args.agent), authkey, max_ops=args.max_ops, niceness=args.nice, io_class=args.ionice)
+    elif args.serve:
+        sizer_options = {'max_ops': args.max_ops, 'niceness': args.nice, 'io_class': args.ionice,
+                      'autotune': args.autotune, 'min_workers': args.min_workers, 'max_workers': args.max_workers,
+                      'history_db': args.history_db, 'history_depth': args.history_depth, 'count_only': args.count_only}
+        if os.sep in args.serve:
+            server = DirHunterServer(args.directory, socket_path=args.serve, interval=args.refresh, n_workers=args.workers, **sizer_options)
+        else:
+            server = DirHunterServer(args.directory, address=_parse_address(args.serve), interval=args.refresh, n_workers=args.workers, **sizer_options)
+        server.serve_forever()
+    elif args.query:
+        if os.sep in args.query[0]:
+            response = query_server(args.query[1], socket_path=args.query[0])
+        else:
+            response = query_server(args.query[1], address=_parse_address(args.query[0]))
+        print(json.dumps(response, indent=2))
+    elif args.trend:
+        if not args.history_db:
+            parser.error('--trend requires --history-db')
+        Sizer(history_db=args.history_db).trend(args.trend, days=args.days, children=args.children)
+    elif args.export_folded or args.export_treemap:
+        with MultiSizer(n_workers=args.workers,
+                        max_ops=args.max_ops, niceness=args.nice, io_class=args.ionice,
+                        autotune=args.autotune, min_workers=args.min_workers, max_workers=args.max_workers,
+                        history_db=args.history_db, history_depth=args.history_depth, count_only=args.count_only) as sizer:
+            sizer.cd(args.directory, _quiet=True)
+            if args.export_folded:
+                sizer.export_folded(args.export_folded, min_fraction=args.min_fraction)
+            if args.export_treemap:
+                sizer.export_treemap(args.export_treemap, min_fraction=args.min_fraction)
+    else:
+        # sizer = test_sizer(args.directory)
+        test_shell(args.directory, progressive=args.progressive, snapshot=args.snapshot,
+                   n_workers=args.workers, address=args.listen and _parse_address(args.listen), authkey=authkey,
+                   max_ops=args.max_ops, niceness=args.nice, io_class=args.ionice,
+                   autotune=args.autotune, min_workers=args.min_workers, max_workers=args.max_workers,
+                   history_db=args.history_db, history_depth=args.history_depth, sample_fraction=args.estimate,
+                   cache_nodes=args.cache_dirs, validate_cache=not args.no_cache_validation, count_only=args.count_only)